@@ -4,14 +4,27 @@ Ingest circuit JSON into Postgres + pgvector with mixed dimensions:
 - nets, functional_groups: 3072 dims (text-embedding-3-large)
 - components: 1536 dims (text-embedding-3-small) [optional]
 
+Embedding backends are selectable per table (see ../vectorize/embedding_backends.py),
+e.g. a local CPU model with no external calls:
+
 python ingest_vectors.py --json circuit_analysis.json
+python ingest_vectors.py --json circuit_analysis.json --components-backend st:all-MiniLM-L6-v2
+
+The stage-1 analysis keeps only refs per net; --netlist adds the parser's (ref, pin) pairs:
+
+python ingest_vectors.py --json circuit_analysis.json --netlist schematic_outputs/board.json
 """
 
+import io
 import os
+import sys
+import math
 import json
 import uuid
+import struct
+import hashlib
 import argparse
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 import psycopg2
 import psycopg2.extras
@@ -27,6 +40,20 @@ except ImportError:
     # fallback for older package name; but strongly recommend: pip install openai>=1.0.0 psycopg2-binary
     raise
 
+# Shared embedding backends live in data/vectorize, the netlist graph / circuit facts in data/search
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "vectorize"))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "search"))
+from embedding_backends import EmbeddingBackend, OpenAIBackend, get_backend
+from netlist_graph import NetlistGraph
+from circuit_facts import compute_facts
+
+# Local tokenizer for batch sizing (optional; falls back to a chars/token estimate)
+try:
+    import tiktoken
+    TIKTOKEN_AVAILABLE = True
+except ImportError:
+    TIKTOKEN_AVAILABLE = False
+
 # -----------------------
 # Embedding configuration
 # -----------------------
@@ -36,9 +63,40 @@ MODEL_SMALL = "text-embedding-3-small"   # 1536 dims
 DIMS_LARGE = 3072
 DIMS_SMALL = 1536
 
+# Per-request token budgets. The API caps a request at 300k tokens and 2048 inputs;
+# we stay well under so a bad estimate never trips the limit.
+TOKEN_BUDGETS = {
+    MODEL_LARGE: 100_000,
+    MODEL_SMALL: 100_000,
+}
+MAX_INPUTS_PER_REQUEST = 2048
+MAX_TOKENS_PER_INPUT = 8191
+CHARS_PER_TOKEN = 4  # fallback estimate when tiktoken is unavailable
+
 # Toggle whether to also store components (1536-D)
 INGEST_COMPONENTS = True
 
+# Toggle the shared (model, text hash) embedding cache table
+USE_EMBEDDING_CACHE = True
+
+# Vector storage: "full" (VECTOR only), "halfvec" (+ native HALFVEC column) or
+# "binary" (+ HALFVEC and binary-quantized BIT columns). None keeps whatever the tables have.
+VECTOR_STORAGE: Optional[str] = None
+# Keep full-precision VECTOR values (needed for re-ranking); False halves storage in halfvec mode
+STORE_FULL_VECTORS = True
+
+# Matryoshka: also store the first N dims (renormalized) in embedding_short for a small, fast
+# ANN index; search re-ranks those candidates with the full vectors. None = off.
+SHORT_DIMS: Optional[int] = None
+
+# Backend spec per table ("openai:<model>", "st:<model>", "onnx:<model>"); dims follow the backend
+TABLE_BACKENDS = {
+    "components": f"openai:{MODEL_SMALL}",
+    "nets": f"openai:{MODEL_LARGE}",
+    "functional_groups": f"openai:{MODEL_LARGE}",
+}
+TABLE_DIMS = {"components": DIMS_SMALL, "nets": DIMS_LARGE, "functional_groups": DIMS_LARGE}
+
 def pg_connect():
     db_url = os.getenv("DATABASE_URL")
     if db_url:
@@ -63,6 +121,11 @@ def pg_connect():
 
 
 def ensure_schema(conn):
+    """
+    Tables, btree/GIN indexes and the embedding cache. ANN indexes are deliberately not
+    created here: IVFFlat centroids trained on an empty table are useless, and HNSW is
+    cheaper to build once after loading. See build_ann_indexes().
+    """
     with conn.cursor() as cur:
         # Enable pgvector
         cur.execute("CREATE EXTENSION IF NOT EXISTS vector;")
@@ -71,6 +134,7 @@ def ensure_schema(conn):
             cur.execute(f"""
             CREATE TABLE IF NOT EXISTS components (
                 id UUID PRIMARY KEY,
+                board_id TEXT,
                 reference TEXT,
                 value TEXT,
                 description TEXT,
@@ -81,69 +145,85 @@ def ensure_schema(conn):
                 footprint TEXT,
                 library_id TEXT,
                 metadata JSONB,
-                embedding VECTOR({DIMS_SMALL})
+                content_hash TEXT,
+                embedding VECTOR({TABLE_DIMS["components"]})
             );
             """)
-            # Index for ANN
-            cur.execute("""
-            DO $$
-            BEGIN
-              IF NOT EXISTS (
-                SELECT 1 FROM pg_indexes WHERE indexname = 'components_embedding_ivfflat'
-              ) THEN
-                CREATE INDEX components_embedding_ivfflat ON components
-                USING ivfflat (embedding vector_l2_ops) WITH (lists = 100);
-              END IF;
-            END$$;
-            """)
+            cur.execute("ALTER TABLE components ADD COLUMN IF NOT EXISTS content_hash TEXT;")
+            cur.execute("ALTER TABLE components ADD COLUMN IF NOT EXISTS board_id TEXT;")
+            cur.execute("CREATE INDEX IF NOT EXISTS components_board_id ON components (board_id, reference);")
 
         cur.execute(f"""
         CREATE TABLE IF NOT EXISTS nets (
             id UUID PRIMARY KEY,
+            board_id TEXT,
             name TEXT,
             net_type TEXT,
             connected_components TEXT[],
             connection_points JSONB,
             metadata JSONB,
-            embedding VECTOR({DIMS_LARGE})
+            content_hash TEXT,
+            embedding VECTOR({TABLE_DIMS["nets"]})
         );
         """)
-        cur.execute("""
-        DO $$
-        BEGIN
-        IF NOT EXISTS (
-            SELECT 1 FROM pg_indexes WHERE indexname = 'nets_embedding_hnsw_halfvec'
-        ) THEN
-            CREATE INDEX nets_embedding_hnsw_halfvec
-            ON nets
-            USING hnsw ((embedding::halfvec(3072)) halfvec_l2_ops);
-        END IF;
-        END$$;
-        """)
+        cur.execute("ALTER TABLE nets ADD COLUMN IF NOT EXISTS content_hash TEXT;")
+        cur.execute("ALTER TABLE nets ADD COLUMN IF NOT EXISTS board_id TEXT;")
+        cur.execute("CREATE INDEX IF NOT EXISTS nets_board_id ON nets (board_id, name);")
 
         cur.execute(f"""
         CREATE TABLE IF NOT EXISTS functional_groups (
             id UUID PRIMARY KEY,
+            board_id TEXT,
             name TEXT,
             description TEXT,
             components TEXT[],
             function TEXT,
             metadata JSONB,
-            embedding VECTOR({DIMS_LARGE})
+            content_hash TEXT,
+            embedding VECTOR({TABLE_DIMS["functional_groups"]})
         );
         """)
-        cur.execute("""
-        DO $$
-        BEGIN
-        IF NOT EXISTS (
-            SELECT 1 FROM pg_indexes WHERE indexname = 'functional_groups_embedding_hnsw_halfvec'
-        ) THEN
-            CREATE INDEX functional_groups_embedding_hnsw_halfvec
-            ON functional_groups
-            USING hnsw ((embedding::halfvec(3072)) halfvec_l2_ops);
-        END IF;
-        END$$;
-        """)
+        cur.execute("ALTER TABLE functional_groups ADD COLUMN IF NOT EXISTS content_hash TEXT;")
+        cur.execute("ALTER TABLE functional_groups ADD COLUMN IF NOT EXISTS board_id TEXT;")
+        cur.execute("CREATE INDEX IF NOT EXISTS functional_groups_board_id ON functional_groups (board_id, name);")
+
+        # Native reduced-precision columns for halfvec / binary storage
+        added_storage: List[str] = []
+        for table, dims in TABLE_DIMS.items():
+            if table == "components" and not INGEST_COMPONENTS:
+                continue
+            before = vector_columns(conn, table)
+            existing = column_dims(conn, table, "embedding")
+            if existing and existing != dims:
+                raise ValueError(f"{table}.embedding has {existing} dims but the {TABLE_BACKENDS[table]} "
+                                 f"backend produces {dims}; use a matching backend or a fresh table")
+            if VECTOR_STORAGE in ("halfvec", "binary"):
+                cur.execute(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS embedding_half HALFVEC({dims});")
+            if VECTOR_STORAGE == "binary":
+                cur.execute(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS embedding_bin BIT({dims});")
+            if SHORT_DIMS and SHORT_DIMS < dims:
+                cur.execute(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS embedding_short VECTOR({SHORT_DIMS});")
+                existing = short_vector_dims(conn, table)
+                if existing != SHORT_DIMS:
+                    raise ValueError(f"{table}.embedding_short already has {existing} dims, not {SHORT_DIMS}")
+            if set(vector_columns(conn, table)) - set(before):
+                added_storage.append(table)
+        # Unchanged rows are skipped on re-ingest, so fill new storage columns from the
+        # vectors already stored; otherwise search on the new column would never return them
+        if added_storage:
+            backfill_vector_storage(conn, added_storage)
+
+        # Shared embedding cache: one row per (model, sha256(text)), reused across ingests
+        if USE_EMBEDDING_CACHE:
+            cur.execute("""
+            CREATE TABLE IF NOT EXISTS embedding_cache (
+                model TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                embedding VECTOR NOT NULL,
+                created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+                PRIMARY KEY (model, text_hash)
+            );
+            """)
 
         # Helpful GIN indexes for metadata filters
         if INGEST_COMPONENTS:
@@ -151,8 +231,296 @@ def ensure_schema(conn):
         cur.execute("CREATE INDEX IF NOT EXISTS nets_metadata_gin ON nets USING gin (metadata);")
         cur.execute("CREATE INDEX IF NOT EXISTS functional_groups_metadata_gin ON functional_groups USING gin (metadata);")
 
-        # ANALYZE for planner stats
-        cur.execute("ANALYZE;")
+        # GIN indexes on the membership arrays (serve @> / && containment, not = ANY)
+        cur.execute("CREATE INDEX IF NOT EXISTS nets_connected_components_gin ON nets USING gin (connected_components);")
+        cur.execute("CREATE INDEX IF NOT EXISTS functional_groups_components_gin ON functional_groups USING gin (components);")
+
+        # Normalized net membership: one row per (net, component, pin); pin is '' when unknown
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS net_members (
+            net_id UUID NOT NULL REFERENCES nets (id) ON DELETE CASCADE,
+            board_id TEXT,
+            component_ref TEXT NOT NULL,
+            pin TEXT NOT NULL DEFAULT '',
+            PRIMARY KEY (net_id, component_ref, pin)
+        );
+        """)
+        cur.execute("CREATE INDEX IF NOT EXISTS net_members_component ON net_members (component_ref, board_id);")
+        # Boards ingested before net_members existed (and not re-ingested since) have no member
+        # rows, and search / the netlist graph read only this table once it exists; seed them
+        # from the membership arrays (pins unknown until the board is re-ingested with --netlist)
+        cur.execute("""
+            INSERT INTO net_members (net_id, board_id, component_ref, pin)
+            SELECT DISTINCT n.id, n.board_id, ref, ''
+            FROM nets n CROSS JOIN LATERAL unnest(n.connected_components) AS ref
+            WHERE ref IS NOT NULL
+              AND NOT EXISTS (SELECT 1 FROM net_members m WHERE m.net_id = n.id)
+            ON CONFLICT DO NOTHING;
+        """)
+        if cur.rowcount:
+            print(f"net_members: backfilled {cur.rowcount} rows from nets.connected_components")
+        # Pin-level lookups ("pin 5 of J5", "SDA of U3") resolve to a net with one index probe
+        cur.execute("ALTER TABLE net_members ADD COLUMN IF NOT EXISTS pin_name TEXT;")
+        cur.execute("CREATE INDEX IF NOT EXISTS net_members_pin ON net_members (component_ref, pin);")
+        cur.execute("CREATE INDEX IF NOT EXISTS net_members_pin_name ON net_members (component_ref, upper(pin_name));")
+
+        # Ingest-time circuit analysis (see ../search/circuit_facts.py); the primary key is the lookup
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS circuit_facts (
+            board_id TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            subject TEXT NOT NULL,
+            fact JSONB NOT NULL,
+            PRIMARY KEY (board_id, kind, subject)
+        );
+        """)
+
+        ensure_lexical_indexes(conn)
+
+
+# -----------------------
+# Lexical (hybrid search) indexes
+# -----------------------
+# Full-text fields per table; 'simple' config so refs / MPNs / rails are not stemmed
+LEXICAL_FIELDS = {
+    "components": ["reference", "value", "mpn", "description"],
+    "nets": ["name", "net_type"],
+    "functional_groups": ["name", "function", "description"],
+}
+# Identifier columns matched exactly (upper-cased) and by trigram similarity
+IDENTIFIER_FIELDS = {
+    "components": ["reference", "mpn", "value"],
+    "nets": ["name"],
+    "functional_groups": ["name"],
+}
+
+
+def ensure_lexical_indexes(conn):
+    """
+    Generated search_tsv columns + GIN for full-text search, expression indexes for exact
+    identifier lookups, and trigram GIN indexes when the pg_trgm extension is available.
+    """
+    with conn.cursor() as cur:
+        cur.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm';")
+        trgm = cur.fetchone() is not None
+        if trgm:
+            cur.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm;")
+        for table, fields in LEXICAL_FIELDS.items():
+            if table == "components" and not INGEST_COMPONENTS:
+                continue
+            doc = " || ' ' || ".join(f"coalesce({f}, '')" for f in fields)
+            cur.execute(
+                f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS search_tsv TSVECTOR "
+                f"GENERATED ALWAYS AS (to_tsvector('simple'::regconfig, {doc})) STORED;"
+            )
+            cur.execute(f"CREATE INDEX IF NOT EXISTS {table}_search_tsv_gin ON {table} USING gin (search_tsv);")
+            for field in IDENTIFIER_FIELDS[table]:
+                cur.execute(f"CREATE INDEX IF NOT EXISTS {table}_{field}_upper ON {table} (upper({field}));")
+                if trgm:
+                    cur.execute(
+                        f"CREATE INDEX IF NOT EXISTS {table}_{field}_trgm ON {table} USING gin ({field} gin_trgm_ops);"
+                    )
+
+
+# -----------------------
+# ANN indexes
+# -----------------------
+# HNSW build parameters (pgvector defaults: m=16, ef_construction=64)
+HNSW_M = 16
+HNSW_EF_CONSTRUCTION = 64
+# Optional maintenance_work_mem for index builds, e.g. "2GB"; HNSW builds far faster in memory
+MAINTENANCE_WORK_MEM: Optional[str] = None
+
+# ANN method per table: IVFFlat for the (smaller) components table, HNSW for 3072-d tables
+TABLE_ANN_METHOD = {"components": "ivfflat", "nets": "hnsw", "functional_groups": "hnsw"}
+# Earlier L2 indexes; cosine (<=>) queries never used them, so they only cost write time
+LEGACY_ANN_INDEXES = [
+    "components_embedding_ivfflat",
+    "nets_embedding_hnsw_halfvec",
+    "functional_groups_embedding_hnsw_halfvec",
+]
+
+
+def vector_columns(conn, table: str) -> List[str]:
+    """Which of embedding / embedding_half / embedding_bin / embedding_short exist on `table`."""
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT column_name FROM information_schema.columns
+            WHERE table_schema = current_schema() AND table_name = %s
+              AND column_name IN ('embedding', 'embedding_half', 'embedding_bin', 'embedding_short');
+        """, (table,))
+        return [r[0] for r in cur.fetchall()]
+
+
+def column_dims(conn, table: str, column: str) -> Optional[int]:
+    """Declared dimension of a vector/halfvec/bit column (its typmod), or None."""
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT a.atttypmod FROM pg_attribute a
+            WHERE a.attrelid = to_regclass(%s) AND a.attname = %s AND NOT a.attisdropped;
+        """, (table, column))
+        row = cur.fetchone()
+        return row[0] if row and row[0] > 0 else None
+
+
+def short_vector_dims(conn, table: str) -> Optional[int]:
+    """Declared dimension of `table`.embedding_short, or None."""
+    return column_dims(conn, table, "embedding_short")
+
+
+def shorten(vec: List[float], dims: int) -> List[float]:
+    """Matryoshka truncation: first `dims` components, re-normalized to unit length."""
+    head = list(vec[:dims])
+    norm = math.sqrt(sum(x * x for x in head))
+    return [x / norm for x in head] if norm else head
+
+
+def ann_index_specs(conn, table: str) -> Dict[str, Tuple[str, str, str]]:
+    """
+    name -> (method, expression, opclass) for the table's current storage. Cosine opclasses
+    on exactly the column/expression the search queries order by, so the planner uses them.
+    """
+    cols = vector_columns(conn, table)
+    method = TABLE_ANN_METHOD[table]
+    if "embedding_half" in cols:
+        specs = {f"{table}_embedding_half_{method}": (method, "embedding_half", "halfvec_cosine_ops")}
+    else:
+        specs = {f"{table}_embedding_{method}_cos": (
+            method, f"(embedding::halfvec({TABLE_DIMS[table]}))", "halfvec_cosine_ops")}
+    if "embedding_bin" in cols:
+        specs[f"{table}_embedding_bin_hnsw"] = ("hnsw", "embedding_bin", "bit_hamming_ops")
+    if "embedding_short" in cols:
+        specs[f"{table}_embedding_short_hnsw"] = ("hnsw", "embedding_short", "vector_cosine_ops")
+    return specs
+
+
+def obsolete_ann_indexes(conn, table: str) -> List[str]:
+    # The expression index on the full column is redundant once a native halfvec column exists
+    if "embedding_half" in vector_columns(conn, table):
+        return [f"{table}_embedding_{TABLE_ANN_METHOD[table]}_cos"]
+    return []
+
+
+def ivfflat_lists(rows: int) -> int:
+    """pgvector guidance: rows / 1000 up to 1M rows, sqrt(rows) beyond."""
+    if rows <= 1_000_000:
+        return max(1, rows // 1000)
+    return int(math.sqrt(rows))
+
+
+def hnsw_options() -> str:
+    return f"m = {int(HNSW_M)}, ef_construction = {int(HNSW_EF_CONSTRUCTION)}"
+
+
+def _ann_tables() -> List[str]:
+    return [t for t in TABLE_ANN_METHOD if t != "components" or INGEST_COMPONENTS]
+
+
+def drop_ann_indexes(conn):
+    """Drop ANN indexes before a bulk load so inserts don't pay for graph/list maintenance."""
+    with conn.cursor() as cur:
+        for table in _ann_tables():
+            for name in ann_index_specs(conn, table):
+                cur.execute(f"DROP INDEX IF EXISTS {name};")
+
+
+def build_ann_indexes(conn, rebuild: bool = False):
+    """
+    Create missing ANN indexes once data is loaded. IVFFlat lists are sized from the
+    current row count (a table with no vectors is skipped until it has some);
+    rebuild=True re-trains IVFFlat / rebuilds HNSW with the current parameters.
+    """
+    with conn.cursor() as cur:
+        if MAINTENANCE_WORK_MEM:
+            cur.execute("SET maintenance_work_mem = %s;", (MAINTENANCE_WORK_MEM,))
+        for name in LEGACY_ANN_INDEXES:
+            cur.execute(f"DROP INDEX IF EXISTS {name};")
+
+        for table in _ann_tables():
+            for name in obsolete_ann_indexes(conn, table):
+                cur.execute(f"DROP INDEX IF EXISTS {name};")
+            for name, (method, expr, opclass) in ann_index_specs(conn, table).items():
+                if rebuild:
+                    cur.execute(f"DROP INDEX IF EXISTS {name};")
+                cur.execute("SELECT 1 FROM pg_indexes WHERE indexname = %s;", (name,))
+                if cur.fetchone():
+                    continue
+                if method == "ivfflat":
+                    cur.execute(f"SELECT count(*) FROM {table} WHERE {expr} IS NOT NULL;")
+                    rows = cur.fetchone()[0]
+                    if not rows:
+                        continue
+                    options = f"lists = {ivfflat_lists(rows)}"
+                else:
+                    options = hnsw_options()
+                print(f"Building {name} ({options})")
+                cur.execute(f"CREATE INDEX {name} ON {table} USING {method} ({expr} {opclass}) WITH ({options});")
+
+        if MAINTENANCE_WORK_MEM:
+            cur.execute("RESET maintenance_work_mem;")
+
+
+def analyze_tables(conn, tables: List[str]):
+    """Refresh planner stats only for the tables this run wrote to."""
+    with conn.cursor() as cur:
+        for table in tables:
+            cur.execute(f"ANALYZE {table};")
+
+
+def backfill_vector_storage(conn, tables: Optional[List[str]] = None):
+    """
+    Fill embedding_half / embedding_bin / embedding_short from the vectors already stored,
+    for rows written before the column existed. ensure_schema() runs this when it adds a
+    storage column; --migrate-storage re-runs it for every table.
+    """
+    with conn.cursor() as cur:
+        for table in tables or _ann_tables():
+            cols = vector_columns(conn, table)
+            dims = TABLE_DIMS[table]
+            if "embedding_half" in cols:
+                cur.execute(f"""
+                    UPDATE {table} SET embedding_half = embedding::halfvec({dims})
+                    WHERE embedding_half IS NULL AND embedding IS NOT NULL;
+                """)
+                print(f"{table}: backfilled {cur.rowcount} halfvec rows")
+            if "embedding_bin" in cols:
+                cur.execute(f"""
+                    UPDATE {table} SET embedding_bin = binary_quantize(embedding_half)::bit({dims})
+                    WHERE embedding_bin IS NULL AND embedding_half IS NOT NULL;
+                """)
+                print(f"{table}: backfilled {cur.rowcount} binary rows")
+            if "embedding_short" in cols:
+                # Full vectors may have been dropped (--drop-full-vectors); the halfvec has the same prefix
+                source = ("COALESCE(embedding, embedding_half::vector)" if "embedding_half" in cols
+                          else "embedding")
+                cur.execute(f"""
+                    UPDATE {table} SET embedding_short = l2_normalize(subvector({source}, 1, %s))
+                    WHERE embedding_short IS NULL AND {source} IS NOT NULL;
+                """, (short_vector_dims(conn, table),))
+                print(f"{table}: backfilled {cur.rowcount} short-vector rows")
+
+
+def migrate_vector_storage(conn):
+    """
+    Backfill the storage columns for rows written before the storage switch, and clear full
+    vectors when STORE_FULL_VECTORS is off. Space freed by clearing only returns to the OS
+    after VACUUM FULL (or pg_repack).
+    """
+    backfill_vector_storage(conn)
+    with conn.cursor() as cur:
+        for table in _ann_tables():
+            cols = vector_columns(conn, table)
+            if not STORE_FULL_VECTORS and "embedding_half" in cols:
+                cur.execute(f"""
+                    UPDATE {table} SET embedding = NULL
+                    WHERE embedding IS NOT NULL AND embedding_half IS NOT NULL;
+                """)
+                print(f"{table}: cleared {cur.rowcount} full-precision vectors (run VACUUM FULL to reclaim)")
+
+
+def binary_quantize(vec: List[float]) -> str:
+    """Sign bits of `vec` as a '0101...' BIT string, matching pgvector's binary_quantize()."""
+    return "".join("1" if x > 0 else "0" for x in vec)
 
 
 def build_component_text(c: Dict[str, Any]) -> str:
@@ -227,197 +595,702 @@ def embed_texts(client, texts, model):
     Return List[List[float]] (NOT Embedding objects / pydantic models).
     Handles both new (v1) and legacy OpenAI SDK shapes.
     """
-    if not texts:
-        return []
-    resp = client.embeddings.create(model=model, input=texts)
-
-    vecs = []
-    # New SDK: resp.data = list[openai.types.Embedding]
-    for item in getattr(resp, "data", []):
-        vec = getattr(item, "embedding", None)
-        if vec is None:
-            # Legacy shape: dict-like
+    return OpenAIBackend(model, client=client).embed(texts)
+
+
+_ENCODERS: Dict[str, Any] = {}
+
+def estimate_tokens(text: str, model: str) -> int:
+    """Token count for `text` under `model`'s tokenizer (estimated if tiktoken is missing)."""
+    if TIKTOKEN_AVAILABLE:
+        enc = _ENCODERS.get(model)
+        if enc is None:
             try:
-                vec = item["embedding"]
-            except Exception:
-                raise TypeError(f"Unexpected embedding payload item type: {type(item)}")
+                enc = tiktoken.encoding_for_model(model)
+            except KeyError:
+                enc = tiktoken.get_encoding("cl100k_base")
+            _ENCODERS[model] = enc
+        return len(enc.encode(text, disallowed_special=()))
+    return max(1, -(-len(text) // CHARS_PER_TOKEN))
 
-        # Ensure it's a plain python list[float]
-        if hasattr(vec, "tolist"):
-            vec = vec.tolist()
-        vec = list(vec)
 
-        # Optional sanity checks
-        if not vec or not isinstance(vec[0], (int, float)):
-            raise TypeError(f"Embedding is not numeric list: {type(vec)} first={type(vec[0])}")
-        vecs.append(vec)
+def token_batches(texts: List[str], model: str,
+                  token_budget: Optional[int] = None,
+                  max_items: int = MAX_INPUTS_PER_REQUEST) -> List[List[int]]:
+    """
+    Greedily pack text indices into batches whose estimated token total stays within
+    the model's budget, so each embeddings request carries as many inputs as allowed.
+    Order is preserved; a single text over budget gets a batch of its own.
+    """
+    budget = token_budget or TOKEN_BUDGETS.get(model, 100_000)
+    max_items = max(1, min(max_items, MAX_INPUTS_PER_REQUEST))
 
-    return vecs
+    batches: List[List[int]] = []
+    current: List[int] = []
+    current_tokens = 0
+    for i, text in enumerate(texts):
+        n = min(estimate_tokens(text, model), MAX_TOKENS_PER_INPUT)
+        if current and (current_tokens + n > budget or len(current) >= max_items):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(i)
+        current_tokens += n
+    if current:
+        batches.append(current)
+    return batches
 
 
-def upsert_components(conn, rows: List[Dict[str, Any]]):
+def as_float_list(v: Any) -> List[float]:
+    """Plain list[float] from a numpy array, pgvector Vector, or sequence."""
+    if hasattr(v, "tolist"):
+        return v.tolist()
+    if hasattr(v, "to_list"):
+        return v.to_list()
+    return list(v)
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Persistent embedding cache in the `embedding_cache` table, keyed by model + SHA-256 of
+    the text. Identical component/net/group texts across boards are embedded only once.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, model: str, hashes: List[str]) -> Dict[str, List[float]]:
+        if not hashes:
+            return {}
+        with self.conn.cursor() as cur:
+            cur.execute(
+                "SELECT text_hash, embedding FROM embedding_cache WHERE model = %s AND text_hash = ANY(%s);",
+                (model, list(hashes)),
+            )
+            found = {h: as_float_list(emb) for h, emb in cur.fetchall()}
+        self.hits += len(found)
+        self.misses += len(hashes) - len(found)
+        return found
+
+    def put_many(self, model: str, items: Dict[str, List[float]]):
+        if not items:
+            return
+        with self.conn.cursor() as cur:
+            psycopg2.extras.execute_batch(cur, """
+                INSERT INTO embedding_cache (model, text_hash, embedding)
+                VALUES (%s, %s, %s::vector)
+                ON CONFLICT (model, text_hash) DO NOTHING
+            """, [(model, h, emb) for h, emb in items.items()])
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+def embed_all(backend: EmbeddingBackend, texts: List[str],
+              token_budget: Optional[int] = None,
+              max_items: int = MAX_INPUTS_PER_REQUEST,
+              cache: Optional[EmbeddingCache] = None) -> List[List[float]]:
+    """
+    Embed every text using token-budgeted batches; results are in input order.
+    Duplicate texts are embedded once, and cached vectors are reused when a cache is given.
+    """
+    model = backend.name
+    hashes = [text_hash(t) for t in texts]
+    unique: Dict[str, str] = {}
+    for h, t in zip(hashes, texts):
+        unique.setdefault(h, t)
+
+    known = cache.get_many(model, list(unique)) if cache else {}
+    pending = [h for h in unique if h not in known]
+    pending_texts = [unique[h] for h in pending]
+
+    fresh: Dict[str, List[float]] = {}
+    batches = token_batches(pending_texts, model, token_budget, min(max_items, backend.max_batch))
+    for batch in batches:
+        embs = backend.embed([pending_texts[i] for i in batch])
+        for i, emb in zip(batch, embs):
+            fresh[pending[i]] = emb
+    if cache:
+        cache.put_many(model, fresh)
+
+    print(f"Embedded {len(pending)}/{len(texts)} texts with {model} in {len(batches)} request(s)")
+    known.update(fresh)
+    return [known[h] for h in hashes]
+
+
+# -----------------------
+# Deterministic IDs / change detection
+# -----------------------
+# Fixed namespace so the same board + entity always maps to the same UUID
+ENTITY_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, "https://bedroq.ai/schematics")
+
+
+def derive_board_id(analysis: Dict[str, Any], json_path: str) -> str:
+    """Board identity from schematic metadata (company/title/revision), else the JSON file name."""
+    meta = analysis.get("metadata") or {}
+    parts = [str(meta[k]) for k in ("company", "title", "revision") if meta.get(k)]
+    if parts:
+        return "/".join(parts)
+    return meta.get("original_filename") or os.path.splitext(os.path.basename(json_path))[0]
+
+
+def entity_id(board_id: str, entity_type: str, key: str) -> uuid.UUID:
+    """UUIDv5 from board id + entity type + reference/name, stable across re-ingests."""
+    return uuid.uuid5(ENTITY_NAMESPACE, f"{board_id}/{entity_type}/{key}")
+
+
+def unique_keys(keys: List[Optional[str]]) -> List[str]:
+    """Disambiguate repeated/missing references or names by occurrence (R1, R1#1, ...)."""
+    seen: Dict[str, int] = {}
+    out = []
+    for k in keys:
+        k = k or ""
+        n = seen.get(k, 0)
+        seen[k] = n + 1
+        out.append(k if n == 0 else f"{k}#{n}")
+    return out
+
+
+def content_hash(entity: Dict[str, Any], model: str) -> str:
+    """Hash of the source entity plus embedding model; any change forces a re-embed."""
+    payload = json.dumps({"model": model, "entity": entity}, sort_keys=True, default=str)
+    return text_hash(payload)
+
+
+def changed_row_indexes(conn, table: str, rows: List[Dict[str, Any]]) -> List[int]:
+    """Indexes of rows that are new or whose content_hash (or board) differs from the stored one."""
     if not rows:
-        return
+        return []
     with conn.cursor() as cur:
-        psycopg2.extras.execute_batch(cur, """
-            INSERT INTO components (id, reference, value, description, mpn, datasheet,
-                                    position, rating, footprint, library_id, metadata, embedding)
-            VALUES (%(id)s, %(reference)s, %(value)s, %(description)s, %(mpn)s, %(datasheet)s,
-                    %(position)s, %(rating)s, %(footprint)s, %(library_id)s, %(metadata)s, %(embedding)s)
-            ON CONFLICT (id) DO UPDATE SET
-                reference = EXCLUDED.reference,
-                value = EXCLUDED.value,
-                description = EXCLUDED.description,
-                mpn = EXCLUDED.mpn,
-                datasheet = EXCLUDED.datasheet,
-                position = EXCLUDED.position,
-                rating = EXCLUDED.rating,
-                footprint = EXCLUDED.footprint,
-                library_id = EXCLUDED.library_id,
-                metadata = EXCLUDED.metadata,
-                embedding = EXCLUDED.embedding
-        """, rows)
+        cur.execute(
+            f"SELECT id, content_hash, board_id FROM {table} WHERE id = ANY(%s);",
+            ([r["id"] for r in rows],),
+        )
+        stored = {row_id: (h, b) for row_id, h, b in cur.fetchall()}
+    return [i for i, r in enumerate(rows)
+            if stored.get(r["id"]) != (r["content_hash"], r["board_id"])]
 
 
-def upsert_nets(conn, rows: List[Dict[str, Any]]):
-    if not rows:
-        return
+def prune_board_rows(conn, table: str, board_id: str, keep_ids: List[uuid.UUID]) -> int:
+    """Delete this board's rows that are no longer present in the source JSON."""
     with conn.cursor() as cur:
-        psycopg2.extras.execute_batch(cur, """
-            INSERT INTO nets (id, name, net_type, connected_components, connection_points, metadata, embedding)
-            VALUES (%(id)s, %(name)s, %(net_type)s, %(connected_components)s, %(connection_points)s, %(metadata)s, %(embedding)s)
+        cur.execute(
+            f"DELETE FROM {table} WHERE board_id = %s AND NOT (id = ANY(%s));",
+            (board_id, list(keep_ids)),
+        )
+        return cur.rowcount
+
+
+def pin_pairs(pins: Any) -> List[Tuple[str, str]]:
+    """[ref, pin] pairs (as the schematic parser writes them) -> (ref, pin) tuples; pin '' when unknown."""
+    return [(str(p[0]), str(p[1] or "")) for p in pins or []
+            if isinstance(p, (list, tuple)) and len(p) == 2 and p[0]]
+
+
+def load_netlist_pins(path: str) -> Tuple[Dict[str, List[Tuple[str, str]]], Dict[Tuple[str, str], str]]:
+    """
+    Pin-level connectivity from a schematic_ingest.py output JSON (stage 0), which the
+    stage-1 analysis drops: net name -> (ref, pin number) pairs, and (ref, pin number) -> pin name.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    nets = data.get("nets") or {}
+    if isinstance(nets, dict):
+        nets = [dict(n, name=n.get("name") or name) for name, n in nets.items()]
+    net_pins = {n["name"]: pin_pairs(n.get("pins")) for n in nets if n.get("name")}
+
+    # Pin names from the instance, else from its library symbol ("~" = unnamed in KiCad)
+    pin_names: Dict[Tuple[str, str], str] = {}
+    symbols = data.get("library_symbols") or {}
+    components = data.get("components") or {}
+    if isinstance(components, dict):
+        components = list(components.values())
+    for c in components:
+        lib_id = c.get("library_id")
+        lib_id = lib_id[-1] if isinstance(lib_id, list) and lib_id else lib_id
+        lib_pins = ((symbols.get(lib_id) if isinstance(lib_id, str) else None) or {}).get("pins") or {}
+        for number, pin in {**lib_pins, **(c.get("pins") or {})}.items():
+            name = (pin or {}).get("name") or (lib_pins.get(number) or {}).get("name")
+            if c.get("reference") and number and name and name != "~":
+                pin_names[(c["reference"], str(number))] = name
+    return net_pins, pin_names
+
+
+def net_members(net: Dict[str, Any], pins: Optional[List[Tuple[str, str]]] = None) -> List[Tuple[str, str]]:
+    """
+    (component_ref, pin) pairs of a net: `pins` from the parser netlist, else the net's own
+    [ref, pin] pairs, else its refs with pin ''.
+    """
+    pairs = pins or pin_pairs(net.get("pins"))
+    if not pairs:
+        pairs = [(ref, "") for ref in net.get("connected_components") or [] if ref]
+    return list(dict.fromkeys(pairs))
+
+
+def sync_net_members(conn, board_id: str, members: Dict[uuid.UUID, List[Tuple[str, str]]],
+                     pin_names: Optional[Dict[Tuple[str, str], str]] = None) -> Tuple[int, bool]:
+    """
+    Replace the net_members rows of the given nets (pruned nets cascade away). Returns the
+    row count and whether anything differed from the stored rows (unchanged rows are kept).
+    """
+    pin_names = pin_names or {}
+    rows = [(net_id, board_id, ref, pin, pin_names.get((ref, pin)))
+            for net_id, pairs in members.items() for ref, pin in pairs]
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT net_id, board_id, component_ref, pin, pin_name FROM net_members WHERE net_id = ANY(%s);",
+            (list(members),),
+        )
+        if sorted(cur.fetchall(), key=str) == sorted(rows, key=str):
+            return len(rows), False
+        cur.execute("DELETE FROM net_members WHERE net_id = ANY(%s);", (list(members),))
+        psycopg2.extras.execute_batch(
+            cur,
+            "INSERT INTO net_members (net_id, board_id, component_ref, pin, pin_name) VALUES (%s, %s, %s, %s, %s);",
+            rows,
+            page_size=1000,
+        )
+        return len(rows), True
+
+
+def has_circuit_facts(conn, board_id: str) -> bool:
+    with conn.cursor() as cur:
+        cur.execute("SELECT 1 FROM circuit_facts WHERE board_id = %s LIMIT 1;", (board_id,))
+        return cur.fetchone() is not None
+
+
+def sync_circuit_facts(conn, board_id: str) -> int:
+    """Recompute the board's circuit facts from its loaded rows and replace them."""
+    facts = compute_facts(NetlistGraph.from_db(conn, board_id))
+    with conn.cursor() as cur:
+        cur.execute("DELETE FROM circuit_facts WHERE board_id = %s;", (board_id,))
+        psycopg2.extras.execute_batch(
+            cur,
+            "INSERT INTO circuit_facts (board_id, kind, subject, fact) VALUES (%s, %s, %s, %s);",
+            [(board_id, kind, subject, json.dumps(fact)) for kind, subject, fact in facts],
+            page_size=1000,
+        )
+    return len(facts)
+
+
+# -----------------------
+# Per-board ANN indexes
+# -----------------------
+def board_index_name(table: str, board_id: str) -> str:
+    # Board ids are free text; hash them into a short, valid identifier
+    return f"{table}_hnsw_board_{hashlib.sha1(board_id.encode('utf-8')).hexdigest()[:12]}"
+
+
+def ensure_board_indexes(conn, board_id: str):
+    """
+    Partial HNSW indexes restricted to one board. Board-scoped searches then walk a small
+    graph instead of filtering the global index. Only worth it for large boards; small
+    boards are served well by the (board_id, ...) btree plus an exact sort.
+    """
+    with conn.cursor() as cur:
+        for table in _ann_tables():
+            # Same column/opclass as the table's primary ANN index, but always HNSW
+            _method, expr, opclass = next(iter(ann_index_specs(conn, table).values()))
+            cur.execute(
+                f"CREATE INDEX IF NOT EXISTS {board_index_name(table, board_id)} ON {table} "
+                f"USING hnsw ({expr} {opclass}) WITH ({hnsw_options()}) WHERE board_id = %s;",
+                (board_id,),
+            )
+
+
+# -----------------------
+# Upserts
+# -----------------------
+# Column specs drive both the execute_batch and the binary COPY paths.
+# Kinds: uuid, text, jsonb, text[], vector, halfvec, bit
+COMPONENT_COLUMNS = [
+    ("id", "uuid"), ("board_id", "text"), ("reference", "text"), ("value", "text"), ("description", "text"),
+    ("mpn", "text"), ("datasheet", "text"), ("position", "jsonb"), ("rating", "text"),
+    ("footprint", "text"), ("library_id", "text"), ("metadata", "jsonb"), ("content_hash", "text"),
+    ("embedding", "vector"),
+]
+NET_COLUMNS = [
+    ("id", "uuid"), ("board_id", "text"), ("name", "text"), ("net_type", "text"), ("connected_components", "text[]"),
+    ("connection_points", "jsonb"), ("metadata", "jsonb"), ("content_hash", "text"),
+    ("embedding", "vector"),
+]
+FUNCTIONAL_GROUP_COLUMNS = [
+    ("id", "uuid"), ("board_id", "text"), ("name", "text"), ("description", "text"), ("components", "text[]"),
+    ("function", "text"), ("metadata", "jsonb"), ("content_hash", "text"),
+    ("embedding", "vector"),
+]
+
+# Optional reduced-precision columns, written only when present on the table
+STORAGE_COLUMNS = [("embedding_half", "halfvec"), ("embedding_bin", "bit"), ("embedding_short", "vector")]
+
+# Use COPY ... FROM STDIN (FORMAT binary) into a staging table, then one merge statement
+USE_COPY_UPSERT = True
+
+_PGCOPY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack("!ii", 0, 0)
+_PGCOPY_TRAILER = struct.pack("!h", -1)
+_TEXT_OID = 25
+
+
+def _encode_text(v: Any) -> bytes:
+    return str(v).encode("utf-8")
+
+
+def _encode_field(kind: str, v: Any) -> bytes:
+    """Encode one value in Postgres binary COPY format (length prefix included)."""
+    if v is None:
+        return struct.pack("!i", -1)
+    if kind == "uuid":
+        payload = (v if isinstance(v, uuid.UUID) else uuid.UUID(str(v))).bytes
+    elif kind == "text":
+        payload = _encode_text(v)
+    elif kind == "jsonb":
+        # jsonb binary format: version byte (1) followed by the JSON text
+        payload = b"\x01" + _encode_text(v if isinstance(v, str) else json.dumps(v))
+    elif kind == "text[]":
+        items = list(v)
+        if not items:
+            payload = struct.pack("!iii", 0, 0, _TEXT_OID)
+        else:
+            has_null = any(x is None for x in items)
+            parts = [struct.pack("!iiiii", 1, int(has_null), _TEXT_OID, len(items), 1)]
+            for x in items:
+                if x is None:
+                    parts.append(struct.pack("!i", -1))
+                else:
+                    b = _encode_text(x)
+                    parts.append(struct.pack("!i", len(b)) + b)
+            payload = b"".join(parts)
+    elif kind in ("vector", "halfvec"):
+        # pgvector binary format: int16 dim, int16 unused, float4[dim] (float2[dim] for halfvec)
+        vals = as_float_list(v)
+        fmt = "f" if kind == "vector" else "e"
+        payload = struct.pack(f"!hh{len(vals)}{fmt}", len(vals), 0, *vals)
+    elif kind == "bit":
+        # bit binary format: int32 bit length, then bits packed MSB-first
+        bits = str(v)
+        nbytes = (len(bits) + 7) // 8
+        payload = struct.pack("!i", len(bits)) + int(bits.ljust(nbytes * 8, "0") or "0", 2).to_bytes(nbytes, "big")
+    else:
+        raise ValueError(f"Unsupported COPY column kind: {kind}")
+    return struct.pack("!i", len(payload)) + payload
+
+
+def _copy_rows(rows: List[Dict[str, Any]], columns: List[Tuple[str, str]]) -> Iterator[bytes]:
+    yield _PGCOPY_HEADER
+    head = struct.pack("!h", len(columns))
+    for row in rows:
+        yield head + b"".join(_encode_field(kind, row.get(name)) for name, kind in columns)
+    yield _PGCOPY_TRAILER
+
+
+class _CopyStream(io.RawIOBase):
+    """File-like view over a bytes generator so COPY streams without building one big buffer."""
+
+    def __init__(self, chunks: Iterator[bytes]):
+        self._chunks = chunks
+        self._buf = b""
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        while not self._buf:
+            try:
+                self._buf = next(self._chunks)
+            except StopIteration:
+                return 0
+        n = min(len(b), len(self._buf))
+        b[:n] = self._buf[:n]
+        self._buf = self._buf[n:]
+        return n
+
+
+def _batch_upsert(conn, table: str, columns: List[Tuple[str, str]], rows: List[Dict[str, Any]]):
+    names = [name for name, _ in columns]
+    updates = ",\n                ".join(f"{n} = EXCLUDED.{n}" for n in names if n != "id")
+    with conn.cursor() as cur:
+        psycopg2.extras.execute_batch(cur, f"""
+            INSERT INTO {table} ({", ".join(names)})
+            VALUES ({", ".join(f"%({n})s" for n in names)})
             ON CONFLICT (id) DO UPDATE SET
-                name = EXCLUDED.name,
-                net_type = EXCLUDED.net_type,
-                connected_components = EXCLUDED.connected_components,
-                connection_points = EXCLUDED.connection_points,
-                metadata = EXCLUDED.metadata,
-                embedding = EXCLUDED.embedding
+                {updates}
         """, rows)
 
 
-def upsert_functional_groups(conn, rows: List[Dict[str, Any]]):
+def _copy_upsert(conn, table: str, columns: List[Tuple[str, str]], rows: List[Dict[str, Any]]):
+    names = [name for name, _ in columns]
+    col_list = ", ".join(names)
+    updates = ",\n                ".join(f"{n} = EXCLUDED.{n}" for n in names if n != "id")
+    stage = f"_stage_{table}"
+    with conn.cursor() as cur:
+        cur.execute(f"DROP TABLE IF EXISTS {stage};")
+        cur.execute(f"CREATE TEMP TABLE {stage} (LIKE {table} INCLUDING DEFAULTS);")
+        try:
+            stream = io.BufferedReader(_CopyStream(_copy_rows(rows, columns)), buffer_size=1 << 20)
+            cur.copy_expert(f"COPY {stage} ({col_list}) FROM STDIN (FORMAT binary)", stream)
+            # DISTINCT ON keeps a single row per id so the merge never hits the same key twice
+            cur.execute(f"""
+                INSERT INTO {table} ({col_list})
+                SELECT DISTINCT ON (id) {col_list} FROM {stage}
+                ON CONFLICT (id) DO UPDATE SET
+                {updates}
+            """)
+        finally:
+            cur.execute(f"DROP TABLE IF EXISTS {stage};")
+
+
+def _upsert(conn, table: str, columns: List[Tuple[str, str]], rows: List[Dict[str, Any]]):
     if not rows:
         return
-    with conn.cursor() as cur:
-        psycopg2.extras.execute_batch(cur, """
-            INSERT INTO functional_groups (id, name, description, components, function, metadata, embedding)
-            VALUES (%(id)s, %(name)s, %(description)s, %(components)s, %(function)s, %(metadata)s, %(embedding)s)
-            ON CONFLICT (id) DO UPDATE SET
-                name = EXCLUDED.name,
-                description = EXCLUDED.description,
-                components = EXCLUDED.components,
-                function = EXCLUDED.function,
-                metadata = EXCLUDED.metadata,
-                embedding = EXCLUDED.embedding
-        """, rows)
+    present = vector_columns(conn, table)
+    columns = columns + [(name, kind) for name, kind in STORAGE_COLUMNS if name in present]
+    if USE_COPY_UPSERT:
+        _copy_upsert(conn, table, columns, rows)
+    else:
+        _batch_upsert(conn, table, columns, rows)
+
+
+def upsert_components(conn, rows: List[Dict[str, Any]]):
+    _upsert(conn, "components", COMPONENT_COLUMNS, rows)
+
+
+def upsert_nets(conn, rows: List[Dict[str, Any]]):
+    _upsert(conn, "nets", NET_COLUMNS, rows)
+
+
+def upsert_functional_groups(conn, rows: List[Dict[str, Any]]):
+    _upsert(conn, "functional_groups", FUNCTIONAL_GROUP_COLUMNS, rows)
 
 
 def main():
+    global INGEST_COMPONENTS, USE_EMBEDDING_CACHE, USE_COPY_UPSERT
+    global HNSW_M, HNSW_EF_CONSTRUCTION, MAINTENANCE_WORK_MEM
+    global VECTOR_STORAGE, STORE_FULL_VECTORS, SHORT_DIMS
+
     parser = argparse.ArgumentParser(description="Ingest circuit JSON into pgvector")
     parser.add_argument("--json", default="/mnt/data/circuit_analysis.json",
                         help="Path to JSON file (default: /mnt/data/circuit_analysis.json)")
+    parser.add_argument("--netlist", default=None,
+                        help="schematic_ingest.py output JSON of the same board; adds pin-level net membership")
     parser.add_argument("--skip-components", action="store_true",
                         help="Skip ingesting components")
-    parser.add_argument("--batch", type=int, default=64,
-                        help="Embedding batch size (default 64)")
+    parser.add_argument("--batch", type=int, default=MAX_INPUTS_PER_REQUEST,
+                        help=f"Max texts per embedding request (default {MAX_INPUTS_PER_REQUEST})")
+    parser.add_argument("--token-budget-small", type=int, default=TOKEN_BUDGETS[MODEL_SMALL],
+                        help=f"Token budget per request for {MODEL_SMALL}")
+    parser.add_argument("--token-budget-large", type=int, default=TOKEN_BUDGETS[MODEL_LARGE],
+                        help=f"Token budget per request for {MODEL_LARGE}")
+    parser.add_argument("--components-backend", default=TABLE_BACKENDS["components"],
+                        help="Embedding backend for components (openai:<model>, st:<model>, onnx:<model>)")
+    parser.add_argument("--nets-backend", default=TABLE_BACKENDS["nets"],
+                        help="Embedding backend for nets")
+    parser.add_argument("--groups-backend", default=TABLE_BACKENDS["functional_groups"],
+                        help="Embedding backend for functional groups")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Bypass the shared embedding cache table")
+    parser.add_argument("--no-copy", action="store_true",
+                        help="Upsert with execute_batch instead of binary COPY + merge")
+    parser.add_argument("--board-id", default=None,
+                        help="Stable board identifier used to derive row IDs "
+                             "(default: from JSON metadata, else the file name)")
+    parser.add_argument("--board-index", action="store_true",
+                        help="Also build partial HNSW indexes scoped to this board (for large boards)")
+    parser.add_argument("--bulk-load", action="store_true",
+                        help="Drop ANN indexes before loading and rebuild them afterwards")
+    parser.add_argument("--reindex", action="store_true",
+                        help="Rebuild ANN indexes after loading (re-sizes IVFFlat lists)")
+    parser.add_argument("--hnsw-m", type=int, default=HNSW_M,
+                        help=f"HNSW m build parameter (default {HNSW_M})")
+    parser.add_argument("--hnsw-ef-construction", type=int, default=HNSW_EF_CONSTRUCTION,
+                        help=f"HNSW ef_construction build parameter (default {HNSW_EF_CONSTRUCTION})")
+    parser.add_argument("--maintenance-work-mem", default=None,
+                        help="maintenance_work_mem for index builds, e.g. 2GB")
+    parser.add_argument("--storage", choices=["full", "halfvec", "binary"], default=None,
+                        help="Add native halfvec (and binary-quantized) columns; default keeps current tables")
+    parser.add_argument("--drop-full-vectors", action="store_true",
+                        help="Store only halfvec/binary columns (no re-rank against full precision)")
+    parser.add_argument("--migrate-storage", action="store_true",
+                        help="Backfill halfvec/binary columns for existing rows")
+    parser.add_argument("--short-dims", type=int, default=None,
+                        help="Also store a truncated, renormalized N-dim vector (e.g. 256/512) for fast ANN")
+    parser.add_argument("--force", action="store_true",
+                        help="Re-embed and upsert every row even if its content hash is unchanged")
     args = parser.parse_args()
+    if args.drop_full_vectors and args.storage not in ("halfvec", "binary"):
+        parser.error("--drop-full-vectors requires --storage halfvec or binary")
 
-    global INGEST_COMPONENTS
+    TOKEN_BUDGETS[MODEL_SMALL] = args.token_budget_small
+    TOKEN_BUDGETS[MODEL_LARGE] = args.token_budget_large
+
+    HNSW_M = args.hnsw_m
+    HNSW_EF_CONSTRUCTION = args.hnsw_ef_construction
+    MAINTENANCE_WORK_MEM = args.maintenance_work_mem
     if args.skip_components:
         INGEST_COMPONENTS = False
+    if args.no_cache:
+        USE_EMBEDDING_CACHE = False
+    if args.no_copy:
+        USE_COPY_UPSERT = False
+    VECTOR_STORAGE = args.storage
+    STORE_FULL_VECTORS = not args.drop_full_vectors
+    SHORT_DIMS = args.short_dims
 
     with open(args.json, "r", encoding="utf-8") as f:
         data = json.load(f)
     
     analysis = data.get("analysis", {})
-    components = analysis.get("components", []) if INGEST_COMPONENTS else []
-    nets = analysis.get("nets", [])
-    functional_groups = analysis.get("functional_groups", [])
+    components = (analysis.get("components") or []) if INGEST_COMPONENTS else []
+    nets = analysis.get("nets") or []
+    functional_groups = analysis.get("functional_groups") or []
+    board_id = args.board_id or derive_board_id(analysis, args.json)
+    print(f"Board: {board_id}")
+
+    TABLE_BACKENDS.update({
+        "components": args.components_backend,
+        "nets": args.nets_backend,
+        "functional_groups": args.groups_backend,
+    })
+    backends = {table: get_backend(spec) for table, spec in TABLE_BACKENDS.items()}
+    for table, backend in backends.items():
+        if table != "components" or INGEST_COMPONENTS:
+            TABLE_DIMS[table] = backend.dims
 
-    client = get_openai_client()
     conn = pg_connect()
     ensure_schema(conn)
+    if args.migrate_storage:
+        migrate_vector_storage(conn)
+    if args.bulk_load:
+        drop_ann_indexes(conn)
+    cache = EmbeddingCache(conn) if USE_EMBEDDING_CACHE else None
+    written: List[str] = []
+
+    # Runs for every table even when the board's list is empty, so emptied lists prune old rows
+    def ingest(table: str, rows: List[Dict[str, Any]], texts: List[str], upsert):
+        pruned = prune_board_rows(conn, table, board_id, [r["id"] for r in rows])
+        if pruned:
+            print(f"{table}: removed {pruned} rows no longer on the board")
+        if not args.force:
+            keep = changed_row_indexes(conn, table, rows)
+            print(f"{table}: {len(rows) - len(keep)} unchanged, {len(keep)} new or changed")
+            rows = [rows[i] for i in keep]
+            texts = [texts[i] for i in keep]
+        if not rows and not pruned:
+            return
+        written.append(table)
+        if not rows:
+            return
+        # Batch by token budget to comply with API limits
+        embs = embed_all(backends[table], texts, max_items=args.batch, cache=cache)
+        short = short_vector_dims(conn, table)
+        for row, emb in zip(rows, embs):
+            row["embedding_short"] = shorten(emb, short) if short else None
+            row["embedding"] = emb if STORE_FULL_VECTORS else None
+            row["embedding_half"] = emb
+            row["embedding_bin"] = binary_quantize(emb)
+        upsert(conn, rows)
 
     # -------------------------
     # Ingest components (1536)
     # -------------------------
-    if INGEST_COMPONENTS and components:
-        texts = [build_component_text(c) for c in components]
+    if INGEST_COMPONENTS:
+        keys = unique_keys([c.get("reference") for c in components])
         rows: List[Dict[str, Any]] = []
-        # Batch to comply with API limits
-        for i in range(0, len(texts), args.batch):
-            chunk = texts[i:i + args.batch]
-            embs = embed_texts(client, chunk, MODEL_SMALL)
-            for j, emb in enumerate(embs):
-                c = components[i + j]
-                rows.append({
-                    "id": uuid.uuid4(),
-                    "reference": c.get("reference"),
-                    "value": c.get("value"),
-                    "description": c.get("description"),
-                    "mpn": c.get("mpn"),
-                    "datasheet": c.get("datasheet"),
-                    "position": json.dumps(c.get("position") or {}),
-                    "rating": c.get("rating"),
-                    "footprint": c.get("footprint"),
-                    "library_id": c.get("library_id"),
-                    "metadata": json.dumps({k: v for k, v in c.items() if k not in {
-                        "reference", "value", "description", "mpn", "datasheet", "position",
-                        "rating", "footprint", "library_id"
-                    }}),
-                    "embedding": emb,
-                })
-        upsert_components(conn, rows)
+        for c, key in zip(components, keys):
+            rows.append({
+                "id": entity_id(board_id, "component", key),
+                "board_id": board_id,
+                "reference": c.get("reference"),
+                "value": c.get("value"),
+                "description": c.get("description"),
+                "mpn": c.get("mpn"),
+                "datasheet": c.get("datasheet"),
+                "position": json.dumps(c.get("position") or {}),
+                "rating": c.get("rating"),
+                "footprint": c.get("footprint"),
+                "library_id": c.get("library_id"),
+                "metadata": json.dumps({k: v for k, v in c.items() if k not in {
+                    "reference", "value", "description", "mpn", "datasheet", "position",
+                    "rating", "footprint", "library_id"
+                }}),
+                "content_hash": content_hash(c, backends["components"].name),
+            })
+        ingest("components", rows, [build_component_text(c) for c in components], upsert_components)
 
     # -------------------------
     # Ingest nets (3072)
     # -------------------------
-    if nets:
-        texts = [build_net_text(n) for n in nets]
-        rows = []
-        for i in range(0, len(texts), args.batch):
-            chunk = texts[i:i + args.batch]
-            embs = embed_texts(client, chunk, MODEL_LARGE)
-            for j, emb in enumerate(embs):
-                n = nets[i + j]
-                rows.append({
-                    "id": uuid.uuid4(),
-                    "name": n.get("name"),
-                    "net_type": n.get("net_type"),
-                    "connected_components": n.get("connected_components") or [],
-                    "connection_points": json.dumps(n.get("connection_points") or []),
-                    "metadata": json.dumps({k: v for k, v in n.items() if k not in {
-                        "name", "net_type", "connected_components", "connection_points"
-                    }}),
-                    "embedding": emb,
-                })
-        upsert_nets(conn, rows)
+    keys = unique_keys([n.get("name") for n in nets])
+    rows = []
+    for n, key in zip(nets, keys):
+        rows.append({
+            "id": entity_id(board_id, "net", key),
+            "board_id": board_id,
+            "name": n.get("name"),
+            "net_type": n.get("net_type"),
+            "connected_components": n.get("connected_components") or [],
+            "connection_points": json.dumps(n.get("connection_points") or []),
+            "metadata": json.dumps({k: v for k, v in n.items() if k not in {
+                "name", "net_type", "connected_components", "connection_points"
+            }}),
+            "content_hash": content_hash(n, backends["nets"].name),
+        })
+    ingest("nets", rows, [build_net_text(n) for n in nets], upsert_nets)
+    # Cheap, so resync every net of the board (also backfills boards ingested before net_members)
+    net_pins, pin_names = load_netlist_pins(args.netlist) if args.netlist else ({}, {})
+    if args.netlist:
+        matched = sum(1 for n in nets if net_pins.get(n.get("name")))
+        print(f"netlist: pins for {matched}/{len(nets)} nets, {len(pin_names)} named pins")
+    members = {r["id"]: net_members(n, net_pins.get(n.get("name"))) for r, n in zip(rows, nets)}
+    count, members_changed = sync_net_members(conn, board_id, members, pin_names)
+    print(f"net_members: {count} rows{'' if members_changed else ' (unchanged)'}")
+    if members_changed:
+        written.append("net_members")
 
     # -------------------------
     # Ingest functional groups (3072)
     # -------------------------
-    if functional_groups:
-        texts = [build_functional_group_text(g) for g in functional_groups]
-        rows = []
-        for i in range(0, len(texts), args.batch):
-            chunk = texts[i:i + args.batch]
-            embs = embed_texts(client, chunk, MODEL_LARGE)
-            for j, emb in enumerate(embs):
-                g = functional_groups[i + j]
-                rows.append({
-                    "id": uuid.uuid4(),
-                    "name": g.get("name"),
-                    "description": g.get("description"),
-                    "components": g.get("components") or [],
-                    "function": g.get("function"),
-                    "metadata": json.dumps({k: v for k, v in g.items() if k not in {
-                        "name", "description", "components", "function"
-                    }}),
-                    "embedding": emb,
-                })
-        upsert_functional_groups(conn, rows)
+    keys = unique_keys([g.get("name") for g in functional_groups])
+    rows = []
+    for g, key in zip(functional_groups, keys):
+        rows.append({
+            "id": entity_id(board_id, "functional_group", key),
+            "board_id": board_id,
+            "name": g.get("name"),
+            "description": g.get("description"),
+            "components": g.get("components") or [],
+            "function": g.get("function"),
+            "metadata": json.dumps({k: v for k, v in g.items() if k not in {
+                "name", "description", "components", "function"
+            }}),
+            "content_hash": content_hash(g, backends["functional_groups"].name),
+        })
+    ingest("functional_groups", rows, [build_functional_group_text(g) for g in functional_groups],
+           upsert_functional_groups)
+
+    # Facts depend on components, nets and pins together: recompute when any of them changed
+    if (args.force or {"components", "nets", "net_members"} & set(written)
+            or (nets and not has_circuit_facts(conn, board_id))):
+        print(f"circuit_facts: {sync_circuit_facts(conn, board_id)} rows")
+        written.append("circuit_facts")
+
+    # Index build is deferred until the data is in (IVFFlat lists sized from row count)
+    build_ann_indexes(conn, rebuild=args.reindex)
+    if args.board_index:
+        ensure_board_indexes(conn, board_id)
+    analyze_tables(conn, written)
 
+    if cache:
+        print(f"Embedding cache: {cache.stats()}")
     print("✅ Ingestion complete.")
 
 
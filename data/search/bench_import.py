@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Import-time benchmark for the search modules.
+
+Each run imports the module in a fresh interpreter with OPENAI_API_KEY / DATABASE_URL unset,
+so it also checks that importing needs no key and opens no client or connection. Reports the
+median wall time and the slowest imports (cumulative, from `python -X importtime`), and fails
+if a heavy optional dependency was pulled in at import.
+
+python bench_import.py
+python bench_import.py --module qa_service --runs 20
+"""
+
+import os
+import sys
+import argparse
+import statistics
+import subprocess
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Must not be imported just by importing the search modules
+DEFERRED = ("openai", "sentence_transformers", "torch", "pgvector", "dotenv", "numpy")
+
+PROBE = """
+import sys, time
+t0 = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - t0
+loaded = [m for m in {deferred!r} if m in sys.modules]
+client = getattr(sys.modules["search_vector_schematics"], "CLIENT", None)
+pool = getattr(sys.modules["search_vector_schematics"], "_POOL", None)
+print(elapsed, ",".join(loaded), client is None and pool is None, sep="|")
+"""
+
+
+def run_once(module: str, importtime: bool = False) -> subprocess.CompletedProcess:
+    env = {k: v for k, v in os.environ.items() if k not in ("OPENAI_API_KEY", "DATABASE_URL")}
+    cmd = [sys.executable]
+    if importtime:
+        cmd += ["-X", "importtime"]
+    cmd += ["-c", PROBE.format(module=module, deferred=DEFERRED)]
+    return subprocess.run(cmd, cwd=HERE, env=env, capture_output=True, text=True, check=True)
+
+
+def slowest_imports(stderr: str, top: int) -> list:
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative_us), name.rstrip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark import time of the search modules")
+    parser.add_argument("--module", default="search_vector_schematics")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--top", type=int, default=10, help="Slowest imports to list")
+    args = parser.parse_args()
+
+    times = []
+    for _ in range(args.runs):
+        elapsed, loaded, lazy = run_once(args.module).stdout.strip().splitlines()[-1].split("|")
+        times.append(float(elapsed))
+
+    print(f"{args.module}: median {statistics.median(times) * 1000:.1f} ms, "
+          f"min {min(times) * 1000:.1f} ms over {args.runs} runs")
+    print("Slowest imports (cumulative):")
+    for us, name in slowest_imports(run_once(args.module, importtime=True).stderr, args.top):
+        print(f"  {us / 1000:8.1f} ms  {name}")
+
+    if loaded:
+        raise SystemExit(f"Deferred dependencies imported eagerly: {loaded}")
+    if lazy != "True":
+        raise SystemExit("Import created an OpenAI client or DB pool")
+    print("OK: no key needed, no client / pool created, heavy deps deferred")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,407 @@
+#!/usr/bin/env python3
+"""
+Recall / latency benchmark for vsearch_nets / vsearch_groups / vsearch_components.
+
+Loads a corpus into a throwaway Postgres + pgvector with ingest_vectors.py's own schema,
+upserts and ANN index builds, then times the real vsearch_* calls across HNSW ef_search,
+IVFFlat probes, vector storage (full VECTOR column with a halfvec expression index, native
+HALFVEC column, + binary-quantized column) and full-precision re-ranking. Every run is scored
+against exact cosine kNN computed with NumPy; "exact" rows time the same query with index
+scans disabled.
+
+Database: --database-url (a scratch schema "vsearch_bench" is created in it and dropped after),
+else a local cluster started and removed by the harness: pgserver if installed and its bundled
+pgvector is new enough, else initdb / pg_ctl from PATH. No docker. Needs pgvector >= 0.7 (halfvec):
+upstream pgserver bundles 0.6.2, so install pixeltable-pgserver (bundles 0.8.x), or pass
+--database-url / put an initdb whose pgvector is >= 0.7 on PATH.
+
+Corpus: synthetic clustered unit vectors (--rows, --dims), or recorded embeddings from a .npy
+file of shape (rows, dims) (--corpus). Queries are corpus vectors plus noise, served by a stub
+embedding backend, so no embedding API is called.
+
+python bench_search.py --table nets --rows 20000 --dims 3072
+python bench_search.py --table components --corpus components.npy --probes 1,4,16,32
+python bench_search.py --storage full,halfvec --rerank --json results.json
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import shutil
+import socket
+import argparse
+import tempfile
+import subprocess
+from contextlib import contextmanager, nullcontext
+from importlib import import_module
+from importlib.util import find_spec
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import psycopg2
+
+# Local cluster without docker or a system install. pixeltable-pgserver bundles pgvector 0.8.x;
+# upstream pgserver's 0.6.2 has no halfvec and is only used to fall back to initdb.
+PGSERVER_MODULE = next((m for m in ("pixeltable_pgserver", "pgserver") if find_spec(m)), None)
+
+# halfvec (storage and expression indexes) arrived in pgvector 0.7
+MIN_PGVECTOR = (0, 7)
+PGVECTOR_HINT = ("pip install pixeltable-pgserver, pass --database-url, or put an initdb / pg_ctl "
+                 "with pgvector >= 0.7 on PATH")
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "data-ingest"))
+
+BENCH_SCHEMA = "vsearch_bench"
+BENCH_BOARD = "bench"
+STUB_SPEC = "stub:bench"
+
+# Name column per table (rows get "<prefix><i>" names)
+NAME_COLUMNS = {"nets": ("name", "N"), "functional_groups": ("name", "G"), "components": ("reference", "U")}
+
+
+# =========================
+# Database
+# =========================
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@contextmanager
+def bench_database(url: Optional[str]):
+    """Yield a DATABASE_URL: `url` as given, else a local cluster started here and removed on exit."""
+    if url:
+        yield url
+        return
+    tmp = tempfile.mkdtemp(prefix="vsbench-")
+    server, pg_ctl, data = None, None, os.path.join(tmp, "data")
+    try:
+        if PGSERVER_MODULE:
+            server = import_module(PGSERVER_MODULE).get_server(data, cleanup_mode="delete")
+            available = available_pgvector(server.get_uri())
+            if available and version_tuple(available) >= MIN_PGVECTOR:
+                yield server.get_uri()
+                return
+            print(f"{PGSERVER_MODULE} bundles pgvector {available}; trying initdb / pg_ctl",
+                  file=sys.stderr)
+            server.cleanup()
+            server = None
+            shutil.rmtree(data, ignore_errors=True)
+        initdb, pg_ctl = shutil.which("initdb"), shutil.which("pg_ctl")
+        if not (initdb and pg_ctl):
+            raise SystemExit(f"No local Postgres with pgvector >= 0.7: {PGVECTOR_HINT}")
+        port = _free_port()
+        subprocess.run([initdb, "-D", data, "-U", "postgres", "-A", "trust", "--no-sync"],
+                       check=True, capture_output=True)
+        subprocess.run([pg_ctl, "-D", data, "-l", os.path.join(tmp, "postgres.log"), "-w",
+                        "-o", f"-p {port} -k {tmp} -c listen_addresses=''", "start"],
+                       check=True, capture_output=True)
+        yield f"postgresql://postgres@/postgres?host={tmp}&port={port}"
+    finally:
+        if server is not None:
+            server.cleanup()
+        elif pg_ctl and os.path.isdir(data):
+            subprocess.run([pg_ctl, "-D", data, "-m", "immediate", "stop"], capture_output=True)
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def available_pgvector(url: str) -> Optional[str]:
+    """pgvector version the server would install, None if it ships none."""
+    conn = psycopg2.connect(url)
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT default_version FROM pg_available_extensions WHERE name = 'vector';")
+            row = cur.fetchone()
+            return row[0] if row else None
+    finally:
+        conn.close()
+
+
+def reset_schema(url: str, drop_only: bool = False) -> str:
+    """(Re)create the scratch schema; returns the pgvector version."""
+    conn = psycopg2.connect(url, options="-c search_path=public")
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cur:
+            cur.execute("CREATE EXTENSION IF NOT EXISTS vector;")
+            cur.execute(f"DROP SCHEMA IF EXISTS {BENCH_SCHEMA} CASCADE;")
+            if not drop_only:
+                cur.execute(f"CREATE SCHEMA {BENCH_SCHEMA};")
+            cur.execute("SELECT extversion FROM pg_extension WHERE extname = 'vector';")
+            return cur.fetchone()[0]
+    finally:
+        conn.close()
+
+
+def version_tuple(version: str) -> Tuple[int, ...]:
+    return tuple(int(p) for p in version.split(".") if p.isdigit())
+
+
+# =========================
+# Corpus / stub backend
+# =========================
+def synthetic_corpus(rows: int, dims: int, clusters: int, seed: int) -> np.ndarray:
+    """Unit vectors around `clusters` random centers (embedding-like structure, unlike uniform noise)."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dims)).astype(np.float32)
+    X = centers[rng.integers(0, clusters, rows)] + 0.6 * rng.standard_normal((rows, dims)).astype(np.float32)
+    return X / np.linalg.norm(X, axis=1, keepdims=True)
+
+
+def make_queries(X: np.ndarray, n: int, noise: float, seed: int) -> np.ndarray:
+    """Perturbed corpus vectors: each query has a true neighborhood but is not itself in the corpus."""
+    rng = np.random.default_rng(seed + 1)
+    base = X[rng.choice(len(X), size=n, replace=len(X) < n)]
+    g = rng.standard_normal(base.shape).astype(np.float32)
+    Q = base + noise * g / np.linalg.norm(g, axis=1, keepdims=True)
+    return Q / np.linalg.norm(Q, axis=1, keepdims=True)
+
+
+def exact_knn(X: np.ndarray, Q: np.ndarray, k: int, chunk: int = 256) -> np.ndarray:
+    """Indices of the k nearest rows of X (cosine; rows are unit length) for every query."""
+    out = np.empty((len(Q), k), dtype=np.int64)
+    for lo in range(0, len(Q), chunk):
+        sims = Q[lo:lo + chunk] @ X.T
+        top = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+        order = np.take_along_axis(sims, top, axis=1).argsort(axis=1)[:, ::-1]
+        out[lo:lo + chunk] = np.take_along_axis(top, order, axis=1)
+    return out
+
+
+def stub_backend(queries: Dict[str, List[float]], dims: int):
+    """EmbeddingBackend serving precomputed query vectors by text."""
+    from embedding_backends import EmbeddingBackend
+
+    class StubBackend(EmbeddingBackend):
+        name = STUB_SPEC
+
+        @property
+        def dims(self) -> int:
+            return dims
+
+        def embed(self, texts: List[str]) -> List[List[float]]:
+            return [queries[t] for t in texts]
+
+    return StubBackend()
+
+
+# =========================
+# Load + index
+# =========================
+def load_corpus(iv, table: str, X: np.ndarray, storage: str, chunk: int = 2000) -> Dict[str, int]:
+    """Schema, upserts and ANN indexes exactly as ingest_vectors.py builds them; id -> row index."""
+    iv.INGEST_COMPONENTS = table == "components"
+    iv.USE_EMBEDDING_CACHE = False
+    iv.VECTOR_STORAGE = None if storage == "full" else storage
+    iv.STORE_FULL_VECTORS = True
+    # Sibling tables stay empty; same dims keeps their (empty) ANN indexes trivially valid
+    for t in iv.TABLE_DIMS:
+        iv.TABLE_DIMS[t] = X.shape[1]
+
+    conn = iv.pg_connect()
+    try:
+        iv.ensure_schema(conn)
+        name_col, prefix = NAME_COLUMNS[table]
+        columns = {"components": iv.COMPONENT_COLUMNS, "nets": iv.NET_COLUMNS,
+                   "functional_groups": iv.FUNCTIONAL_GROUP_COLUMNS}[table]
+        upsert = {"components": iv.upsert_components, "nets": iv.upsert_nets,
+                  "functional_groups": iv.upsert_functional_groups}[table]
+        ids: Dict[str, int] = {}
+        t0 = time.perf_counter()
+        for lo in range(0, len(X), chunk):
+            rows = []
+            for i in range(lo, min(lo + chunk, len(X))):
+                vec = X[i].tolist()
+                row: Dict[str, Any] = {name: None for name, _ in columns}
+                row.update({
+                    "id": uuid.uuid5(uuid.NAMESPACE_URL, f"{BENCH_BOARD}/{table}/{i}"),
+                    "board_id": BENCH_BOARD,
+                    name_col: f"{prefix}{i}",
+                    "embedding": vec,
+                    "embedding_half": vec,
+                    "embedding_bin": iv.binary_quantize(vec),
+                    "embedding_short": None,
+                })
+                ids[str(row["id"])] = i
+                rows.append(row)
+            upsert(conn, rows)
+        load_s = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        iv.build_ann_indexes(conn)
+        build_s = time.perf_counter() - t0
+        iv.analyze_tables(conn, [table])
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT pg_table_size(%s), COALESCE(sum(pg_relation_size(indexrelid)), 0) "
+                "FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+                "WHERE i.indrelid = %s::regclass AND c.relam IN (SELECT oid FROM pg_am WHERE amname IN ('hnsw', 'ivfflat'));",
+                (table, table),
+            )
+            table_bytes, index_bytes = cur.fetchone()
+    finally:
+        conn.close()
+    print(f"[{storage}] loaded {len(X)} rows in {load_s:.1f} s, ANN build {build_s:.1f} s, "
+          f"table {table_bytes / 2**20:.1f} MB, ANN indexes {index_bytes / 2**20:.1f} MB")
+    return ids
+
+
+# =========================
+# Measure
+# =========================
+@contextmanager
+def seqscan_connection(svs):
+    """
+    A fresh connection with index scans off. Fresh because vsearch_* statements are prepared
+    per connection and a cached plan would keep using the ANN index.
+    """
+    conn = svs.connect()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SET enable_indexscan = off;")
+        yield conn
+    finally:
+        conn.close()
+
+
+def run_config(svs, conn, table: str, texts: List[str], truth: np.ndarray, ids: Dict[str, int], k: int,
+               warmup: int, **opts) -> Dict[str, Any]:
+    search = svs.VSEARCH[table]
+    for text in texts[:warmup]:
+        search(conn, text, k, **opts)
+    latencies, recalls = [], []
+    for text, expected in zip(texts, truth):
+        t0 = time.perf_counter()
+        rows = search(conn, text, k, **opts)
+        latencies.append((time.perf_counter() - t0) * 1000.0)
+        got = {ids[str(r[0])] for r in rows}
+        recalls.append(len(got & set(expected.tolist())) / k)
+    lat = np.asarray(latencies)
+    return {
+        f"recall@{k}": round(float(np.mean(recalls)), 4),
+        "mean_ms": round(float(lat.mean()), 3),
+        "p50_ms": round(float(np.percentile(lat, 50)), 3),
+        "p95_ms": round(float(np.percentile(lat, 95)), 3),
+        "p99_ms": round(float(np.percentile(lat, 99)), 3),
+    }
+
+
+def int_list(text: str) -> List[int]:
+    return [int(v) for v in text.split(",") if v.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark recall / latency of vsearch_* on a local pgvector")
+    parser.add_argument("--table", choices=["nets", "functional_groups", "components"], default="nets")
+    parser.add_argument("--corpus", default=None, help="Recorded embeddings (.npy, rows x dims); default synthetic")
+    parser.add_argument("--rows", type=int, default=10000, help="Synthetic corpus size")
+    parser.add_argument("--dims", type=int, default=None,
+                        help="Synthetic dimensions (default: the table's production dims)")
+    parser.add_argument("--clusters", type=int, default=100, help="Synthetic cluster count")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--query-noise", type=float, default=0.5, help="Perturbation of queries from corpus rows")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--method", choices=["hnsw", "ivfflat"], default=None,
+                        help="ANN index type (default: ingest_vectors.TABLE_ANN_METHOD)")
+    parser.add_argument("--storage", default="full,halfvec",
+                        help="Comma list of full / halfvec / binary (binary also runs quantized search)")
+    parser.add_argument("--ef-search", type=int_list, default=[10, 20, 40, 80, 160, 320])
+    parser.add_argument("--probes", type=int_list, default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--rerank", action="store_true", help="Also run with full-precision re-ranking")
+    parser.add_argument("--no-exact", action="store_true", help="Skip the index-less baseline")
+    parser.add_argument("--hnsw-m", type=int, default=None)
+    parser.add_argument("--hnsw-ef-construction", type=int, default=None)
+    parser.add_argument("--warmup", type=int, default=10, help="Untimed queries per configuration")
+    parser.add_argument("--database-url", default=None,
+                        help="Existing database to use (scratch schema); default: start a local cluster")
+    parser.add_argument("--json", default=None, help="Also write the results here")
+    args = parser.parse_args()
+
+    storages = [s.strip() for s in args.storage.split(",") if s.strip()]
+    unknown = set(storages) - {"full", "halfvec", "binary"}
+    if unknown:
+        parser.error(f"unknown storage: {', '.join(sorted(unknown))}")
+
+    import ingest_vectors as iv
+    if args.method:
+        iv.TABLE_ANN_METHOD[args.table] = args.method
+    if args.hnsw_m:
+        iv.HNSW_M = args.hnsw_m
+    if args.hnsw_ef_construction:
+        iv.HNSW_EF_CONSTRUCTION = args.hnsw_ef_construction
+    method = iv.TABLE_ANN_METHOD[args.table]
+
+    if args.corpus:
+        X = np.load(args.corpus).astype(np.float32)
+        X /= np.linalg.norm(X, axis=1, keepdims=True)
+    else:
+        X = synthetic_corpus(args.rows, args.dims or iv.TABLE_DIMS[args.table], args.clusters, args.seed)
+    Q = make_queries(X, args.queries, args.query_noise, args.seed)
+    t0 = time.perf_counter()
+    truth = exact_knn(X, Q, args.k)
+    print(f"Corpus {X.shape[0]} x {X.shape[1]}, {len(Q)} queries, NumPy ground truth in "
+          f"{time.perf_counter() - t0:.2f} s")
+
+    texts = [f"q{i}" for i in range(len(Q))]
+    from embedding_backends import register_backend
+    register_backend(STUB_SPEC, stub_backend(dict(zip(texts, Q.tolist())), X.shape[1]))
+
+    results: List[Dict[str, Any]] = []
+    with bench_database(args.database_url) as url:
+        version = reset_schema(url)
+        if version_tuple(version) < MIN_PGVECTOR:
+            raise SystemExit(f"pgvector {version} has no halfvec; the search path needs >= 0.7: "
+                             f"{PGVECTOR_HINT}")
+        # Every connection (ingest and search) lands in the scratch schema
+        os.environ["DATABASE_URL"] = url
+        os.environ["PGOPTIONS"] = f"-c search_path={BENCH_SCHEMA},public"
+        import search_vector_schematics as svs
+        svs.TABLE_BACKENDS[args.table] = STUB_SPEC
+
+        try:
+            for storage in storages:
+                reset_schema(url)
+                svs.SCHEMA_CACHE.clear()
+                ids = load_corpus(iv, args.table, X, storage)
+
+                settings = args.ef_search if method == "hnsw" else args.probes
+                key = "ef_search" if method == "hnsw" else "probes"
+                runs: List[Tuple[str, Dict[str, Any], bool]] = []
+                for rerank in ([False, True] if args.rerank else [False]):
+                    for quantized in ([False, True] if storage == "binary" else [False]):
+                        opts = {"rerank": rerank, "quantized": quantized}
+                        runs += [(f"{key}={v}", dict(opts, **{key: v}), False) for v in settings]
+                        if not args.no_exact and not quantized:
+                            runs.append(("exact", opts, True))
+
+                conn = svs.connect()
+                try:
+                    for setting, opts, exact in runs:
+                        row = {"storage": storage, "index": "seqscan" if exact else method, "setting": setting,
+                               "rerank": opts["rerank"], "quantized": opts["quantized"]}
+                        with seqscan_connection(svs) if exact else nullcontext(conn) as run_conn:
+                            row.update(run_config(svs, run_conn, args.table, texts, truth, ids, args.k,
+                                                  args.warmup, **opts))
+                        results.append(row)
+                        print(f"  {storage:8} {row['index']:8} {setting:14} rerank={row['rerank']!s:5} "
+                              f"quantized={row['quantized']!s:5} recall@{args.k} {row[f'recall@{args.k}']:.4f}  "
+                              f"p50 {row['p50_ms']:7.3f} ms  p95 {row['p95_ms']:7.3f} ms  p99 {row['p99_ms']:7.3f} ms")
+                finally:
+                    conn.close()
+        finally:
+            reset_schema(url, drop_only=True)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"table": args.table, "rows": int(X.shape[0]), "dims": int(X.shape[1]),
+                       "queries": len(Q), "k": args.k, "pgvector": version, "results": results}, f, indent=2)
+        print(f"Wrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+Ingest-time circuit facts over a board's NetlistGraph.
+
+The question-time heuristics of search_vector_schematics.py (RC filters, pull-up voltages)
+plus pull-up / pull-down resistors, decoupling capacitors per IC and resistor dividers are
+computed once per board and stored in the circuit_facts table, keyed by
+(board_id, kind, subject), so answering them is one primary-key lookup.
+
+kind          subject     fact
+rc_filter     ref         detect_filter_near_component() answer
+pullup        ref         infer_pullup_voltage_for_component() answer
+pull          ref         pull-up / pull-down resistors on each net of the ref
+decoupling    IC ref      capacitors from the IC's supply nets to GND
+divider       tap net     two resistors from a rail to GND meeting at the net
+
+Power symbols (#PWR*, #FLG*) are not subjects, and rail nets (GND, +3V3, ...) touching a subject
+are named in its facts without their member lists: those nets reach every part of the board.
+ingest_vectors.py recomputes a board's facts when its components, nets or pins change; this
+CLI prints them for a stage-1 JSON:
+
+python circuit_facts.py --json ../data-ingest/circuit_analysis.json --kind divider
+"""
+
+import re
+import json
+import weakref
+from itertools import combinations
+from typing import Any, Dict, List, Tuple, Optional
+
+from netlist_graph import NetlistGraph, RAIL_VALUES
+
+PULLUP_RAIL_VALUES = ("+3V3", "+5V")
+GROUND_NAMES = ("GND", "GNDA", "GNDD", "AGND", "DGND", "VSS")
+
+# "+3V3" -> 3.3, "+5V" -> 5, "1V8" -> 1.8, "+12V" -> 12
+VOLTAGE_RE = re.compile(r"^\+?(\d+)(?:V(\d*)|\.(\d+)V)$", re.IGNORECASE)
+# "10k", "4k7", "4.7k", "100R", "1M", "220"
+RESISTANCE_RE = re.compile(r"^(\d+(?:\.\d+)?)\s*([RKM]?)(\d*)\s*(?:ohms?|Ω)?$", re.IGNORECASE)
+MULTIPLIERS = {"": 1.0, "r": 1.0, "k": 1e3, "m": 1e6}
+
+Fact = Tuple[str, str, Dict[str, Any]]  # (kind, subject, fact)
+
+
+def parse_voltage(name: Optional[str]) -> Optional[float]:
+    """Rail voltage from a rail value / net name; 0.0 for ground, None when unknown."""
+    if not name:
+        return None
+    name = name.strip().lstrip("/")  # hierarchical net names
+    if name.upper() in GROUND_NAMES:
+        return 0.0
+    m = VOLTAGE_RE.match(name)
+    if not m:
+        return None
+    whole, frac_v, frac_dot = m.groups()
+    return float(f"{whole}.{frac_v or frac_dot or 0}")
+
+
+def parse_resistance(value: Optional[str]) -> Optional[float]:
+    """Ohms from a resistor value like 10k / 4k7 / 100R; None when unparseable."""
+    if not value:
+        return None
+    m = RESISTANCE_RE.match(value.strip())
+    if not m:
+        return None
+    number, unit, tail = m.groups()
+    if tail and ("." in number or not unit):
+        return None
+    return float(f"{number}.{tail}" if tail else number) * MULTIPLIERS[unit.lower()]
+
+
+# =========================
+# Net classification
+# =========================
+# Per-graph tables filled on first use (graphs are immutable): rail lookups on a net like GND
+# would otherwise rescan its whole member list for every part that touches it.
+_RAILS: "weakref.WeakKeyDictionary[NetlistGraph, Dict[Tuple[str, ...], List[List[Tuple[str, str]]]]]" = \
+    weakref.WeakKeyDictionary()
+_VOLTAGES: "weakref.WeakKeyDictionary[NetlistGraph, List[Optional[float]]]" = weakref.WeakKeyDictionary()
+
+
+def net_rails(graph: NetlistGraph, net: int, values: Tuple[str, ...] = RAIL_VALUES) -> List[Tuple[str, str]]:
+    by_values = _RAILS.setdefault(graph, {})
+    table = by_values.get(values)
+    if table is None:
+        table = by_values[values] = [
+            [(c["reference"], c["value"]) for c in graph.component_rows_on_net_index(n) if c["value"] in values]
+            for n in range(len(graph.net_names))
+        ]
+    return table[net]
+
+
+def net_voltage(graph: NetlistGraph, net: int) -> Optional[float]:
+    """Voltage of a rail net: from power symbols on it, else from its name."""
+    voltages = _VOLTAGES.get(graph)
+    if voltages is None:
+        voltages = _VOLTAGES[graph] = [_net_voltage(graph, n) for n in range(len(graph.net_names))]
+    return voltages[net]
+
+
+def _net_voltage(graph: NetlistGraph, net: int) -> Optional[float]:
+    for _, value in net_rails(graph, net):
+        v = parse_voltage(value)
+        if v is not None:
+            return v
+    return parse_voltage(graph.net_names[net])
+
+
+def is_power_symbol(ref: str) -> bool:
+    """#PWR / #FLG schematic symbols: rail markers, not parts."""
+    return ref.startswith("#")
+
+
+def other_nets(graph: NetlistGraph, ref: str, net: int) -> List[int]:
+    """Nets of a (two-terminal) part other than `net`."""
+    return [n for n in graph.nets_of(ref) if n != net]
+
+
+def refs_on(graph: NetlistGraph, net: int, prefix: str) -> List[str]:
+    return [ref for ref in graph.refs_on_net_index(net) if ref.startswith(prefix)]
+
+
+def value_of(graph: NetlistGraph, ref: str) -> Optional[str]:
+    return next((row["value"] for row in graph.rows_by_ref.get(ref, [])), None)
+
+
+# =========================
+# Question-time heuristics (shared with search_vector_schematics.py)
+# =========================
+def filter_rows(graph: NetlistGraph, ref: str,
+                expand_rails: bool = True) -> List[Tuple[str, List[str], List[Tuple[str, str]]]]:
+    """
+    (net, component refs, rails) for every net touching `ref`, ordered by net name.
+    expand_rails=False leaves rail nets' refs and rails empty (no filter finding on them).
+    """
+    rows = []
+    for n in graph.nets_of(ref):
+        if not expand_rails and net_voltage(graph, n) is not None:
+            rows.append((graph.net_names[n], [], []))
+            continue
+        comps = graph.component_rows_on_net_index(n)
+        rows.append((graph.net_names[n], [c["reference"] for c in comps],
+                     [(c["reference"], c["value"]) for c in comps if c["value"] in RAIL_VALUES]))
+    return rows
+
+
+def pullup_rows(graph: NetlistGraph, ref: str,
+                expand_rails: bool = True) -> List[Tuple[str, List[str], List[Tuple[str, str]]]]:
+    """
+    (resistor, resistor nets, +3V3/+5V rails on those nets) for resistors sharing a net with `ref`.
+    expand_rails=False skips resistors reached only through a rail net of `ref` and keeps one
+    power symbol per rail value of a net.
+    """
+    rows = []
+    for n in graph.nets_of(ref):
+        if not expand_rails and net_voltage(graph, n) is not None:
+            continue
+        for comp in graph.component_rows_on_net_index(n):
+            r_ref = comp["reference"]
+            if not r_ref.startswith("R"):
+                continue
+            r_nets = graph.nets_of(r_ref)
+            rails = []
+            for rn in r_nets:
+                net_rail = net_rails(graph, rn, PULLUP_RAIL_VALUES)
+                if not expand_rails:
+                    firsts: Dict[str, Tuple[str, str]] = {}
+                    for rail in net_rail:
+                        firsts.setdefault(rail[1], rail)
+                    net_rail = list(firsts.values())
+                rails.extend(net_rail)
+            rows.append((r_ref, [graph.net_names[rn] for rn in r_nets], rails))
+    return rows
+
+
+def filter_answer(ref: str, rows: List[Tuple[str, List[str], List[Tuple[str, str]]]]) -> Dict[str, Any]:
+    """
+    If any net touching 'ref' also contains both a resistor (R*) and a capacitor (C*),
+    or a capacitor and a GND rail, report a likely RC shunt/noise filter.
+    (We cannot confirm series vs. shunt without pin-level connectivity.)
+    """
+    nets, findings = [], []
+    for net, refs, rails in rows:
+        nets.append(net)
+        has_r = any(r.startswith("R") for r in refs)
+        has_c = any(c.startswith("C") for c in refs)
+        has_gnd = any(v == "GND" for _, v in rails)
+        if (has_r and has_c) or (has_c and has_gnd):
+            findings.append({
+                "net": net,
+                "components": refs,
+                "rails": rails,
+                "note": "Likely RC filter (heuristic)"
+            })
+    return {"ref": ref, "nets_checked": nets, "filter_hits": findings}
+
+
+def pullup_answer(ref: str, rows: List[Tuple[str, List[str], List[Tuple[str, str]]]]) -> Dict[str, Any]:
+    """Resistors sharing a net with 'ref' whose other nets carry +3V3/+5V give the pull-up voltage."""
+    candidate_voltages = set()
+    details = []
+    for r_ref, r_nets, v_rails in rows:
+        candidate_voltages.update(v for _, v in v_rails)
+        details.append({"resistor": r_ref, "resistor_nets": r_nets, "rails": v_rails})
+    return {
+        "component": ref,
+        "candidate_pullup_voltages": sorted(candidate_voltages),
+        "evidence": details,
+    }
+
+
+# =========================
+# Board-wide analysis
+# =========================
+def pull_resistors(graph: NetlistGraph, ref: str) -> Dict[str, Any]:
+    """Per net of `ref`: resistors tying it to a supply rail (pull-up) or to ground (pull-down)."""
+    nets = []
+    for n in graph.nets_of(ref):
+        if net_voltage(graph, n) is not None:
+            continue  # the rail itself
+        ups, downs = [], []
+        for r_ref in refs_on(graph, n, "R"):
+            for rn in other_nets(graph, r_ref, n):
+                v = net_voltage(graph, rn)
+                if v:
+                    ups.append({"resistor": r_ref, "rail": graph.net_names[rn], "voltage": v})
+                elif v == 0.0:
+                    downs.append({"resistor": r_ref, "rail": graph.net_names[rn]})
+        if ups or downs:
+            nets.append({"net": graph.net_names[n], "pullups": ups, "pulldowns": downs})
+    return {"component": ref, "nets": nets}
+
+
+def decoupling(graph: NetlistGraph, ref: str) -> Dict[str, Any]:
+    """Capacitors between a supply net of IC `ref` and ground."""
+    caps = []
+    for n in graph.nets_of(ref):
+        v = net_voltage(graph, n)
+        if not v:
+            continue
+        for c_ref in refs_on(graph, n, "C"):
+            if any(net_voltage(graph, cn) == 0.0 for cn in other_nets(graph, c_ref, n)):
+                caps.append({"capacitor": c_ref, "value": value_of(graph, c_ref),
+                             "net": graph.net_names[n], "voltage": v})
+    return {"component": ref, "supply_nets": sorted({c["net"] for c in caps}), "capacitors": caps}
+
+
+def dividers(graph: NetlistGraph) -> List[Dict[str, Any]]:
+    """Two resistors meeting at a non-rail net, one to a supply rail and one to ground."""
+    found = []
+    for n, name in enumerate(graph.net_names):
+        if net_voltage(graph, n) is not None:
+            continue
+        ends = {}
+        for r_ref in refs_on(graph, n, "R"):
+            others = other_nets(graph, r_ref, n)
+            if len(others) == 1:
+                ends[r_ref] = (others[0], net_voltage(graph, others[0]))
+        for a, b in combinations(sorted(ends), 2):
+            (na, va), (nb, vb) = ends[a], ends[b]
+            if va is None or vb is None or (va == 0.0) == (vb == 0.0):
+                continue
+            upper, lower = (a, b) if va else (b, a)
+            v_in = max(va, vb)
+            r_upper, r_lower = parse_resistance(value_of(graph, upper)), parse_resistance(value_of(graph, lower))
+            ratio = r_lower / (r_upper + r_lower) if r_upper and r_lower else None
+            found.append({
+                "net": name,
+                "upper": upper,
+                "lower": lower,
+                "input_rail": graph.net_names[na if va else nb],
+                "input_voltage": v_in,
+                "ratio": round(ratio, 6) if ratio is not None else None,
+                "output_voltage": round(v_in * ratio, 4) if ratio is not None else None,
+            })
+    return found
+
+
+def compute_facts(graph: NetlistGraph) -> List[Fact]:
+    """Every fact of one board as (kind, subject, fact) rows."""
+    facts: List[Fact] = []
+    for ref in graph.refs:
+        if is_power_symbol(ref):
+            continue
+        facts.append(("rc_filter", ref, filter_answer(ref, filter_rows(graph, ref, expand_rails=False))))
+        facts.append(("pullup", ref, pullup_answer(ref, pullup_rows(graph, ref, expand_rails=False))))
+        facts.append(("pull", ref, pull_resistors(graph, ref)))
+        if ref.startswith("U"):
+            facts.append(("decoupling", ref, decoupling(graph, ref)))
+    # Several dividers can share a tap net
+    by_net: Dict[str, List[Dict[str, Any]]] = {}
+    for d in dividers(graph):
+        by_net.setdefault(d["net"], []).append(d)
+    facts.extend(("divider", net, {"net": net, "dividers": ds}) for net, ds in by_net.items())
+    return facts
+
+
+if __name__ == "__main__":
+    import argparse
+    from pprint import pprint
+
+    parser = argparse.ArgumentParser(description="Print the circuit facts of a stage-1 JSON")
+    parser.add_argument("--json", required=True, help="Path to circuit_analysis.json")
+    parser.add_argument("--kind", default=None, help="Only this kind (rc_filter, pullup, pull, decoupling, divider)")
+    parser.add_argument("--subject", default=None, help="Only this ref / net")
+    args = parser.parse_args()
+
+    with open(args.json, "r") as f:
+        data = json.load(f)
+    facts = compute_facts(NetlistGraph.from_analysis(data.get("analysis", data)))
+    counts: Dict[str, int] = {}
+    for kind, subject, fact in facts:
+        counts[kind] = counts.get(kind, 0) + 1
+        if (args.kind or args.subject) and args.kind in (None, kind) and args.subject in (None, subject):
+            pprint(fact, width=110)
+    print(counts)
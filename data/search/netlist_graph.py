@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""
+In-memory netlist graph for structured circuit queries.
+
+One NetlistGraph per board holds CSR adjacency between nets and components (with the pin
+of every net/component edge when known) plus component -> functional group membership,
+so traversals like "nets touching J5" or "components on +3V3" are list lookups instead of
+`= ANY(connected_components)` scans in Postgres.
+
+Graphs load from the DB (nets / components / functional_groups rows of one board) or from
+a stage-1 analysis JSON (circuit_analysis.json), and are cached per board by GRAPHS. A
+cached graph is re-validated against the board's content hashes at most every
+NETLIST_GRAPH_REFRESH seconds, so re-ingesting a board invalidates it; invalidate() drops
+entries explicitly. At most NETLIST_GRAPH_CACHE_SIZE boards are kept (least recently used
+go first), and boards with no nets are not cached at all.
+
+python netlist_graph.py --json ../data-ingest/circuit_analysis.json --ref J407
+"""
+
+import os
+import json
+import time
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Any, Dict, List, Tuple, Optional
+
+# Columns components_on_net() returns, matching the SQL helper in search_vector_schematics.py
+COMPONENT_FIELDS = ("reference", "value", "description", "mpn", "footprint", "library_id", "rating")
+RAIL_VALUES = ("+3V3", "+5V", "GND")
+
+NETLIST_GRAPH_REFRESH = float(os.getenv("NETLIST_GRAPH_REFRESH", "30"))
+NETLIST_GRAPH_CACHE_SIZE = int(os.getenv("NETLIST_GRAPH_CACHE_SIZE", "64"))
+
+
+def _csr(rows: List[List[int]], n: int) -> Tuple[array, array]:
+    """CSR (indptr, indices) for adjacency lists `rows` over n nodes."""
+    indptr = array("l", [0])
+    indices = array("l")
+    for i in range(n):
+        indices.extend(rows[i])
+        indptr.append(len(indices))
+    return indptr, indices
+
+
+class NetlistGraph:
+    """
+    Immutable bipartite net <-> component graph of one board.
+
+    components: dicts with COMPONENT_FIELDS (one per component row; refs may repeat)
+    nets:       (name, [(ref, pin or None), ...]) in connection order
+    groups:     (id, name, function, components) tuples
+    """
+
+    def __init__(self, components: List[Dict[str, Any]],
+                 nets: List[Tuple[str, List[Tuple[str, Optional[str]]]]],
+                 groups: List[Tuple] = ()):
+        # Node tables. Refs seen only on nets still get a node (nets_for_component works for
+        # them) but have no component rows, like the SQL join.
+        self.refs: List[str] = []
+        self.ref_index: Dict[str, int] = {}
+        self.rows_by_ref: Dict[str, List[Dict[str, Any]]] = {}
+        for comp in components:
+            row = {f: comp.get(f) for f in COMPONENT_FIELDS}
+            self._ref_node(row["reference"])
+            self.rows_by_ref.setdefault(row["reference"], []).append(row)
+
+        self.net_names: List[str] = []
+        self.net_index: Dict[str, List[int]] = {}
+        net_rows: List[List[int]] = []
+        self.edge_pins: List[Optional[str]] = []  # aligned with net_indices
+        for name, members in nets:
+            self.net_index.setdefault(name, []).append(len(self.net_names))
+            self.net_names.append(name)
+            seen = set()
+            row = []
+            for ref, pin in members:
+                if not ref:
+                    continue
+                key = (ref, pin)
+                if key in seen:
+                    continue
+                seen.add(key)
+                row.append(self._ref_node(ref))
+                self.edge_pins.append(pin)
+            net_rows.append(row)
+
+        # net -> components and its transpose component -> nets
+        self.net_indptr, self.net_indices = _csr(net_rows, len(self.net_names))
+        comp_rows: List[List[int]] = [[] for _ in self.refs]
+        for net, row in enumerate(net_rows):
+            for c in row:
+                if not comp_rows[c] or comp_rows[c][-1] != net:
+                    comp_rows[c].append(net)
+        self.comp_indptr, self.comp_indices = _csr(comp_rows, len(self.refs))
+
+        # component -> functional groups
+        self.groups: List[Tuple] = [tuple(g) for g in groups]
+        group_rows: List[List[int]] = [[] for _ in self.refs]
+        for gi, group in enumerate(self.groups):
+            for ref in group[3] or []:
+                i = self.ref_index.get(ref)
+                if i is not None and gi not in group_rows[i]:
+                    group_rows[i].append(gi)
+        self.group_indptr, self.group_indices = _csr(group_rows, len(self.refs))
+
+    def _ref_node(self, ref: str) -> int:
+        i = self.ref_index.get(ref)
+        if i is None:
+            i = self.ref_index[ref] = len(self.refs)
+            self.refs.append(ref)
+        return i
+
+    # ---- construction ----
+    @classmethod
+    def from_analysis(cls, analysis: Dict[str, Any]) -> "NetlistGraph":
+        """Build from a stage-1 analysis dict (components / nets / functional_groups lists)."""
+        components = [c for c in analysis.get("components", []) if c.get("reference")]
+        nets = []
+        for net in analysis.get("nets", []):
+            # Pin-level nets carry [ref, pin] pairs; otherwise fall back to the ref list
+            pins = [tuple(p) for p in net.get("pins") or [] if isinstance(p, (list, tuple)) and len(p) == 2]
+            members = pins or [(ref, None) for ref in net.get("connected_components") or []]
+            nets.append((net.get("name"), members))
+        groups = [
+            (None, g.get("name"), g.get("function"), list(g.get("components") or []))
+            for g in analysis.get("functional_groups", [])
+        ]
+        return cls(components, nets, groups)
+
+    @classmethod
+    def from_db(cls, conn, board_id: str) -> "NetlistGraph":
+        """Load one board's nets (with net_members pins when present) / components / functional_groups rows."""
+        with conn.cursor() as cur:
+            cur.execute("SELECT to_regclass('net_members') IS NOT NULL;")
+            if cur.fetchone()[0]:
+                # Pin-level membership from the normalized table ('' pin = unknown)
+                cur.execute(
+                    """
+                    SELECT n.name,
+                           COALESCE(array_agg(m.component_ref ORDER BY m.component_ref, m.pin)
+                                    FILTER (WHERE m.component_ref IS NOT NULL), '{}'),
+                           COALESCE(array_agg(m.pin ORDER BY m.component_ref, m.pin)
+                                    FILTER (WHERE m.component_ref IS NOT NULL), '{}')
+                    FROM nets n
+                    LEFT JOIN net_members m ON m.net_id = n.id
+                    WHERE n.board_id = %s
+                    GROUP BY n.id, n.name
+                    ORDER BY n.name, n.id;
+                    """,
+                    (board_id,),
+                )
+                nets = [(name, [(ref, pin or None) for ref, pin in zip(refs, pins)])
+                        for name, refs, pins in cur.fetchall()]
+            else:
+                cur.execute(
+                    "SELECT name, connected_components FROM nets WHERE board_id = %s ORDER BY name, id;",
+                    (board_id,),
+                )
+                nets = [(name, [(ref, None) for ref in refs or []]) for name, refs in cur.fetchall()]
+            components = []
+            cur.execute("SELECT to_regclass('components') IS NOT NULL;")
+            if cur.fetchone()[0]:
+                cur.execute(
+                    f"SELECT {', '.join(COMPONENT_FIELDS)} FROM components WHERE board_id = %s ORDER BY reference, id;",
+                    (board_id,),
+                )
+                components = [dict(zip(COMPONENT_FIELDS, r)) for r in cur.fetchall()]
+            cur.execute(
+                "SELECT id, name, function, components FROM functional_groups WHERE board_id = %s ORDER BY id;",
+                (board_id,),
+            )
+            groups = cur.fetchall()
+        return cls(components, nets, groups)
+
+    # ---- traversals (same shapes as the SQL helpers) ----
+    def nets_of(self, ref: str) -> List[int]:
+        """Net indices touching `ref`, ordered by net name."""
+        i = self.ref_index.get(ref)
+        if i is None:
+            return []
+        nets = self.comp_indices[self.comp_indptr[i]:self.comp_indptr[i + 1]]
+        return sorted(nets, key=self.net_names.__getitem__)
+
+    def _members(self, net: int) -> List[int]:
+        return list(self.net_indices[self.net_indptr[net]:self.net_indptr[net + 1]])
+
+    def nets_for_component(self, ref: str) -> List[str]:
+        return [self.net_names[n] for n in self.nets_of(ref)]
+
+    def refs_on_net_index(self, net: int) -> List[str]:
+        """Distinct refs on net index `net` (with or without component rows), sorted."""
+        return sorted({self.refs[c] for c in self._members(net)})
+
+    def component_rows_on_net_index(self, net: int) -> List[Dict[str, Any]]:
+        """Component rows on net index `net`, ordered by reference."""
+        return [dict(row) for ref in self.refs_on_net_index(net) for row in self.rows_by_ref.get(ref, [])]
+
+    def components_on_net(self, net_name: str) -> List[Dict[str, Any]]:
+        rows = [row for n in self.net_index.get(net_name, []) for row in self.component_rows_on_net_index(n)]
+        return sorted(rows, key=lambda r: r["reference"])
+
+    def rails_on_net(self, net_name: str, values: Tuple[str, ...] = RAIL_VALUES) -> List[Tuple[str, str]]:
+        return [(r["reference"], r["value"]) for r in self.components_on_net(net_name) if r["value"] in values]
+
+    def groups_touching_net(self, net_name: str) -> List[Tuple]:
+        hits: List[int] = []
+        for n in self.net_index.get(net_name, []):
+            for c in self._members(n):
+                for g in self.group_indices[self.group_indptr[c]:self.group_indptr[c + 1]]:
+                    if g not in hits:
+                        hits.append(g)
+        return [self.groups[g] for g in sorted(hits)]
+
+    def pins_on_net(self, net_name: str) -> List[Tuple[str, Optional[str]]]:
+        """(ref, pin) pairs on the net; pin is None when only ref-level connectivity is known."""
+        out = []
+        for n in self.net_index.get(net_name, []):
+            lo, hi = self.net_indptr[n], self.net_indptr[n + 1]
+            out.extend((self.refs[self.net_indices[e]], self.edge_pins[e]) for e in range(lo, hi))
+        return out
+
+    def stats(self) -> Dict[str, int]:
+        return {"nets": len(self.net_names), "components": len(self.rows_by_ref),
+                "edges": len(self.net_indices), "groups": len(self.groups)}
+
+
+def board_signature(conn, board_id: str) -> Tuple:
+    """Cheap fingerprint of a board's rows; changes whenever ingest rewrites any of them."""
+    tables = ["nets", "functional_groups"]
+    with conn.cursor() as cur:
+        cur.execute("SELECT to_regclass('components') IS NOT NULL;")
+        if cur.fetchone()[0]:
+            tables.append("components")
+        parts = [
+            f"SELECT '{t}', count(*), md5(string_agg(COALESCE(content_hash, id::text), ',' ORDER BY id)) "
+            f"FROM {t} WHERE board_id = %s"
+            for t in tables
+        ]
+        cur.execute("SELECT to_regclass('net_members') IS NOT NULL;")
+        if cur.fetchone()[0]:
+            # Pins can change (ingest --netlist) while the nets' content hashes don't
+            parts.append(
+                "SELECT 'net_members', count(*), md5(string_agg(component_ref || ':' || pin, ',' "
+                "ORDER BY net_id, component_ref, pin)) FROM net_members WHERE board_id = %s"
+            )
+        cur.execute(" UNION ALL ".join(parts) + ";", (board_id,) * len(parts))
+        return tuple(cur.fetchall())
+
+
+class GraphCache:
+    """
+    Per-board NetlistGraph LRU of up to `maxsize` boards, re-validated against
+    board_signature() every `refresh` s.
+    """
+
+    def __init__(self, refresh: float = NETLIST_GRAPH_REFRESH, maxsize: int = NETLIST_GRAPH_CACHE_SIZE):
+        self.refresh = refresh
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[str, Tuple[Tuple, float, NetlistGraph]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, conn, board_id: str) -> Optional[NetlistGraph]:
+        """The board's graph; None (not cached) when the board has no nets, e.g. unknown or not yet ingested."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(board_id)
+            if entry is not None:
+                self._entries.move_to_end(board_id)
+        if entry is not None and now - entry[1] < self.refresh:
+            return entry[2]
+        sig = board_signature(conn, board_id)
+        if not any(count for table, count, _ in sig if table == "nets"):
+            self.invalidate(board_id)
+            return None
+        if entry is not None and entry[0] == sig:
+            graph = entry[2]
+        else:
+            graph = NetlistGraph.from_db(conn, board_id)
+        self._store(board_id, (sig, now, graph))
+        return graph
+
+    def put(self, board_id: str, graph: NetlistGraph) -> None:
+        """Seed a board from a non-DB source (e.g. stage-1 JSON); never re-validated."""
+        self._store(board_id, ((), float("inf"), graph))
+
+    def _store(self, board_id: str, entry: Tuple[Tuple, float, NetlistGraph]) -> None:
+        with self._lock:
+            self._entries[board_id] = entry
+            self._entries.move_to_end(board_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, board_id: Optional[str] = None) -> None:
+        with self._lock:
+            if board_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(board_id, None)
+
+
+GRAPHS = GraphCache()
+
+
+if __name__ == "__main__":
+    import argparse
+    from pprint import pprint
+
+    parser = argparse.ArgumentParser(description="Inspect the in-memory netlist graph of a stage-1 JSON")
+    parser.add_argument("--json", required=True, help="Path to circuit_analysis.json")
+    parser.add_argument("--ref", default=None, help="Component reference to traverse from")
+    args = parser.parse_args()
+
+    with open(args.json, "r") as f:
+        data = json.load(f)
+    graph = NetlistGraph.from_analysis(data.get("analysis", data))
+    print(graph.stats())
+    if args.ref:
+        for net in graph.nets_for_component(args.ref):
+            pprint({"net": net, "components": [c["reference"] for c in graph.components_on_net(net)],
+                    "rails": graph.rails_on_net(net), "groups": graph.groups_touching_net(net)}, width=110)
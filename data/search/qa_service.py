@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+Async HTTP QA service around search_vector_schematics.
+
+One long-running process keeps the DB pool (with its prepared statements), the netlist
+graphs, embedding clients / local models and the query-embedding cache warm, and answers
+many questions concurrently instead of paying import + client + connection setup per --ask.
+
+Endpoints (JSON):
+  POST /ask              {"question", "board_id"?, "rerank"?, "quantized"?, "short"?, "hybrid"?}
+  POST /search/{table}   {"text", "k"? (1..100), "board_id"?, "rerank"?, "quantized"?, "short"?, "hybrid"?}
+                         table: nets | functional_groups | components
+  GET  /metrics          per-stage latency: count, mean / p50 / p95 / p99 ms
+  GET  /health
+
+Responses carry "timings_ms" for the stages they ran (structured, exact, embed, search, total).
+
+Env: as search_vector_schematics.py; PG_POOL_MAX also bounds concurrent DB work here
+(and sizes the search fan-out pool unless SEARCH_FANOUT_WORKERS is set).
+
+python qa_service.py --port 8080
+curl -s localhost:8080/ask -d '{"question": "USB D+ protection", "hybrid": true}'
+"""
+
+import os
+import json
+import time
+import asyncio
+import functools
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from importlib.util import find_spec
+from typing import Any, Dict, List, Optional
+
+try:
+    from aiohttp import web
+    AIOHTTP_AVAILABLE = True
+except ImportError:
+    AIOHTTP_AVAILABLE = False
+
+# Imported when the first OpenAI query embedding is needed
+ASYNC_OPENAI_AVAILABLE = find_spec("openai") is not None
+
+import search_vector_schematics as svs
+from embedding_backends import EmbeddingBackend, OpenAIBackend
+
+
+# =========================
+# Metrics
+# =========================
+class StageMetrics:
+    """Rolling latency samples per stage (last `window` requests)."""
+
+    def __init__(self, window: int = 2048):
+        self.window = window
+        self._samples: Dict[str, deque] = {}
+
+    @contextmanager
+    def time(self, stage: str, timings: Dict[str, float]):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            ms = (time.perf_counter() - t0) * 1000.0
+            timings[stage] = round(ms, 3)
+            self._samples.setdefault(stage, deque(maxlen=self.window)).append(ms)
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        out = {}
+        for stage, samples in self._samples.items():
+            ordered = sorted(samples)
+            pct = lambda p: ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+            out[stage] = {
+                "count": len(ordered),
+                "mean_ms": round(sum(ordered) / len(ordered), 3),
+                "p50_ms": round(pct(0.50), 3),
+                "p95_ms": round(pct(0.95), 3),
+                "p99_ms": round(pct(0.99), 3),
+            }
+        return out
+
+
+# =========================
+# Async DB / embedding facades
+# =========================
+class AsyncDB:
+    """
+    Awaitable access to the psycopg2 pool: blocking DB work runs on a dedicated executor sized
+    to the pool, so the event loop never blocks and at most PG_POOL_MAX queries are in flight.
+    """
+
+    def __init__(self, workers: Optional[int] = None):
+        svs.load_env()  # PG_POOL_MAX may come from env.dev
+        self.executor = ThreadPoolExecutor(max_workers=workers or svs.PG_POOL_MAX, thread_name_prefix="qa-db")
+
+    @staticmethod
+    def _with_conn(fn, args, kwargs):
+        with svs.pooled() as conn:
+            return fn(conn, *args, **kwargs)
+
+    async def run(self, fn, *args, **kwargs):
+        """fn(conn, *args, **kwargs) on a pooled connection."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self._with_conn, fn, args, kwargs)
+
+    async def call(self, fn, *args, **kwargs):
+        """fn(*args, **kwargs) for helpers that borrow their own connections (semantic_search)."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(fn, *args, **kwargs))
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+        if svs._POOL is not None:
+            svs._POOL.closeall()
+
+
+class AsyncEmbedder:
+    """
+    Fills svs.QUERY_CACHE ahead of the (synchronous) searches: OpenAI backends through the
+    async client, local backends on a worker thread. Searches then embed from the cache.
+    """
+
+    def __init__(self):
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            from openai import AsyncOpenAI
+            self._client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        return self._client
+
+    async def embed(self, backend: EmbeddingBackend, text: str) -> List[float]:
+        key = (backend.name, text)
+        vec = svs.QUERY_CACHE.get(key)
+        if vec is not None:
+            return vec
+        if isinstance(backend, OpenAIBackend) and ASYNC_OPENAI_AVAILABLE:
+            resp = await self.client.embeddings.create(model=backend.model, input=[text])
+            vec = list(resp.data[0].embedding)
+        else:
+            loop = asyncio.get_running_loop()
+            vec = (await loop.run_in_executor(None, backend.embed, [text]))[0]
+        svs.QUERY_CACHE.put(key, vec)
+        return vec
+
+    async def warm(self, text: str, tables: Optional[List[str]] = None):
+        """Embed `text` once per distinct backend of `tables` (default: all searched tables)."""
+        tables = tables or [table for _, table, _, _, _ in svs.SEMANTIC_SEARCHES]
+        distinct = {b.name: b for b in (svs.backend_for(t) for t in tables)}
+        await asyncio.gather(*(self.embed(b, text) for b in distinct.values()))
+
+
+METRICS = StageMetrics()
+
+# Upper bound on /search "k"
+MAX_K = 100
+
+
+def _dumps(obj: Any) -> str:
+    # UUIDs, tuples from psycopg2 rows
+    return json.dumps(obj, default=str)
+
+
+def _text_field(body: Dict[str, Any], name: str) -> str:
+    value = body.get(name)
+    if not isinstance(value, str) or not value.strip():
+        raise web.HTTPBadRequest(text=f"'{name}' must be a non-empty string")
+    return value
+
+
+def _search_opts(body: Dict[str, Any]) -> Dict[str, Any]:
+    if not isinstance(body.get("board_id"), (str, type(None))):
+        raise web.HTTPBadRequest(text="'board_id' must be a string")
+    return {
+        "board_id": body.get("board_id"),
+        "rerank": bool(body.get("rerank", False)),
+        "quantized": bool(body.get("quantized", False)),
+        "short": bool(body.get("short", False)),
+    }
+
+
+async def _json_body(request) -> Dict[str, Any]:
+    try:
+        body = await request.json()
+    except json.JSONDecodeError:
+        raise web.HTTPBadRequest(text="body must be JSON")
+    if not isinstance(body, dict):
+        raise web.HTTPBadRequest(text="body must be a JSON object")
+    return body
+
+
+# =========================
+# Handlers
+# =========================
+async def handle_ask(request):
+    body = await _json_body(request)
+    question = _text_field(body, "question")
+    db, embedder = request.app["db"], request.app["embedder"]
+    opts, hybrid = _search_opts(body), bool(body.get("hybrid", False))
+    timings: Dict[str, float] = {}
+
+    with METRICS.time("total", timings):
+        with METRICS.time("structured", timings):
+            result = await db.run(svs.route_question, question, opts["board_id"])
+        if not result["answers"]:
+            exact = None
+            if hybrid:
+                with METRICS.time("exact", timings):
+                    exact = await db.run(svs.exact_hits, question, opts["board_id"])
+            if not (exact and any(exact.values())):
+                with METRICS.time("embed", timings):
+                    await embedder.warm(question)
+            with METRICS.time("search", timings):
+                result.update(await db.call(svs.semantic_search, question, hybrid=hybrid, exact=exact, **opts))
+
+    result["timings_ms"] = timings
+    return web.json_response(result, dumps=_dumps)
+
+
+async def handle_search(request):
+    table = request.match_info["table"]
+    if table not in svs.VSEARCH:
+        raise web.HTTPNotFound(text=f"unknown table {table}")
+    body = await _json_body(request)
+    text = _text_field(body, "text")
+    db, embedder = request.app["db"], request.app["embedder"]
+    k = body.get("k", 10)
+    if isinstance(k, bool) or not isinstance(k, int) or k < 1:
+        raise web.HTTPBadRequest(text="'k' must be a positive integer")
+    k = min(k, MAX_K)
+    opts, hybrid = _search_opts(body), bool(body.get("hybrid", False))
+    timings: Dict[str, float] = {}
+
+    with METRICS.time("total", timings):
+        exact = []
+        if hybrid:
+            with METRICS.time("exact", timings):
+                exact = await db.run(svs.exact_search, table, text, 1, opts["board_id"])
+        if not exact:
+            with METRICS.time("embed", timings):
+                await embedder.warm(text, [table])
+        with METRICS.time("search", timings):
+            if hybrid:
+                rows = await db.run(svs.hybrid_search, table, text, k, **opts)
+            else:
+                rows = await db.run(svs.VSEARCH[table], text, k, **opts)
+
+    return web.json_response({"table": table, "text": text, "results": rows, "timings_ms": timings},
+                             dumps=_dumps)
+
+
+async def handle_metrics(request):
+    return web.json_response({
+        "stages": METRICS.snapshot(),
+        "query_cache": {"hits": svs.QUERY_CACHE.hits, "misses": svs.QUERY_CACHE.misses},
+    })
+
+
+def _ping(conn) -> None:
+    with conn.cursor() as cur:
+        cur.execute("SELECT 1;")
+
+
+async def handle_health(request):
+    await request.app["db"].run(_ping)
+    return web.json_response({"status": "ok"})
+
+
+def build_app() -> "web.Application":
+    app = web.Application()
+    app["db"] = AsyncDB()
+    app["embedder"] = AsyncEmbedder()
+
+    async def on_startup(app):
+        # Open the pool up front so the first request doesn't pay for it
+        await app["db"].call(svs.get_pool)
+
+    async def on_cleanup(app):
+        app["db"].close()
+
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
+    app.router.add_post("/ask", handle_ask)
+    app.router.add_post("/search/{table}", handle_search)
+    app.router.add_get("/metrics", handle_metrics)
+    app.router.add_get("/health", handle_health)
+    return app
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Async HTTP circuit QA service")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8080)
+    args = parser.parse_args()
+
+    if not AIOHTTP_AVAILABLE:
+        raise SystemExit("aiohttp not installed (pip install aiohttp)")
+    web.run_app(build_app(), host=args.host, port=args.port)
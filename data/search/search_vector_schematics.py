@@ -6,177 +6,881 @@ Natural-language circuit QA over Postgres + pgvector.
 - Optionally searches 1536-d components (if you ingested them)
 - Answers questions like:
     "Is there a filter attached to pin 5?"
+    "What is connected to pin 5 of J5?"
     "What is the voltage attached to the pull up resistor J5?"
     "USB D+ protection and power lines"
 
 Env:
   OPENAI_API_KEY, DATABASE_URL (or PGHOST/PGPORT/PGUSER/PGPASSWORD/PGDATABASE)
+  COMPONENTS_EMBEDDING_BACKEND, NETS_EMBEDDING_BACKEND, GROUPS_EMBEDDING_BACKEND
+    (optional; e.g. "st:all-MiniLM-L6-v2" for local search; must match what was ingested)
+  HNSW_EF_SEARCH, IVFFLAT_PROBES (optional ANN recall/latency knobs)
+  EXACT_BOARD_ROWS (board-filtered searches on pgvector < 0.8 scan boards up to this size exactly; 20000)
+  QUERY_CACHE_SIZE, QUERY_CACHE_TTL (query-embedding LRU; defaults 1024 entries / 3600 s)
+  SCHEMA_CACHE_TTL (seconds schema / board-size lookups are reused; default 30)
+  PG_POOL_MIN, PG_POOL_MAX (connection pool bounds; defaults 1 / 10)
+  SEARCH_FANOUT_WORKERS (threads shared by the concurrent nets / groups / components searches; default PG_POOL_MAX)
+  USE_NETLIST_GRAPH, NETLIST_GRAPH_REFRESH, NETLIST_GRAPH_CACHE_SIZE (in-memory per-board graph;
+    defaults on / 30 s / 64 boards)
 
-Indexes (already suggested elsewhere):
+Indexes (built by ingest_vectors.py):
   CREATE INDEX ... USING hnsw ((embedding::halfvec(3072)) halfvec_cosine_ops); -- nets, functional_groups
   CREATE INDEX ... USING hnsw ((embedding::halfvec(1536)) halfvec_cosine_ops); -- components (if 1536)
+  With --storage halfvec/binary the native embedding_half / embedding_bin columns are indexed
+  and queried instead; --rerank re-orders candidates by the full-precision vectors.
+  With --short-dims N, --short retrieves candidates on embedding_short (HNSW) and re-ranks.
+  --hybrid adds full-text (search_tsv GIN) / pg_trgm matching fused by reciprocal rank; questions
+  naming an existing ref, MPN or net are answered from exact matches without an embedding call.
+  circuit_facts (PRIMARY KEY (board_id, kind, subject)) holds the filter / pull-up / pull-down /
+  decoupling / divider heuristics precomputed per board (circuit_facts.py); with --board those
+  questions are one keyed lookup.
 
 python search_vector_schematics.py --ask "What is the Voltage 3.3V or 5V?"
+python search_vector_schematics.py --ask "USB D+ protection" --board "Winterbloom/Starfish/v2"
+python search_vector_schematics.py --ask "U403 SDA" --hybrid
+python search_vector_schematics.py --batch questions.jsonl --out answers.jsonl --board "Winterbloom/Starfish/v2"
 """
 
 import os
 import re
+import sys
 import json
 import math
-from typing import Any, Dict, List, Tuple, Optional
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Tuple, Optional
 
 import psycopg2
 import psycopg2.extras
-from pgvector.psycopg2 import register_vector
-from openai import OpenAI
+import psycopg2.pool
 from psycopg2.extras import Json
-from dotenv import load_dotenv
+
+# openai, pgvector and dotenv are imported on first use: importing this module stays fast,
+# needs no API key and never touches the network (see bench_import.py)
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+# Shared embedding backends live in data/vectorize
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "vectorize"))
+from embedding_backends import EmbeddingBackend, get_backend
+from netlist_graph import GRAPHS, NetlistGraph, RAIL_VALUES
+import circuit_facts
+from circuit_facts import PULLUP_RAIL_VALUES
 
 # =========================
 # Config / Connections
 # =========================
-load_dotenv("../../env.dev")
+# ../../env.dev (API key, DATABASE_URL / PG*, tuning knobs) is loaded on the first client,
+# connection, backend or search; the knobs below are read from the environment right after
+# it, so values set in env.dev apply. Until then they hold their defaults.
+_ENV_LOADED = False
+_ENV_LOCK = threading.Lock()
+
+def load_env() -> None:
+    global _ENV_LOADED
+    if _ENV_LOADED:
+        return
+    with _ENV_LOCK:
+        if not _ENV_LOADED:
+            from dotenv import load_dotenv
+            load_dotenv("../../env.dev")
+            _read_settings()
+            _ENV_LOADED = True
 
-def get_openai_client() -> OpenAI:
+def _env_int(name: str) -> Optional[int]:
+    return int(os.getenv(name)) if os.getenv(name) else None
+
+def _read_settings() -> None:
+    """Tuning knobs from the environment (called once, after env.dev is loaded)."""
+    global PG_POOL_MIN, PG_POOL_MAX, _POOL_SLOTS, HNSW_EF_SEARCH, IVFFLAT_PROBES
+    global SEARCH_FANOUT_WORKERS, USE_NETLIST_GRAPH, EXACT_BOARD_ROWS
+    PG_POOL_MIN = int(os.getenv("PG_POOL_MIN", "1"))
+    PG_POOL_MAX = int(os.getenv("PG_POOL_MAX", "10"))
+    _POOL_SLOTS = threading.BoundedSemaphore(PG_POOL_MAX)
+    for table, var, default in TABLE_BACKEND_ENV:
+        # Explicit assignments (e.g. bench_search.py's stub backend) win over the environment
+        TABLE_BACKENDS.setdefault(table, os.getenv(var, default))
+    QUERY_CACHE.maxsize = int(os.getenv("QUERY_CACHE_SIZE", "1024"))
+    QUERY_CACHE.ttl = float(os.getenv("QUERY_CACHE_TTL", "3600"))
+    SCHEMA_CACHE.ttl = float(os.getenv("SCHEMA_CACHE_TTL", "30"))
+    HNSW_EF_SEARCH = _env_int("HNSW_EF_SEARCH")
+    IVFFLAT_PROBES = _env_int("IVFFLAT_PROBES")
+    EXACT_BOARD_ROWS = int(os.getenv("EXACT_BOARD_ROWS", "20000"))
+    SEARCH_FANOUT_WORKERS = int(os.getenv("SEARCH_FANOUT_WORKERS", str(PG_POOL_MAX)))
+    USE_NETLIST_GRAPH = os.getenv("USE_NETLIST_GRAPH", "1").lower() not in ("0", "false", "no")
+    GRAPHS.refresh = float(os.getenv("NETLIST_GRAPH_REFRESH", str(GRAPHS.refresh)))
+    GRAPHS.maxsize = int(os.getenv("NETLIST_GRAPH_CACHE_SIZE", str(GRAPHS.maxsize)))
+
+def get_openai_client() -> "OpenAI":
+    load_env()
+    from openai import OpenAI
     api_key = os.getenv("OPENAI_API_KEY")
     if not api_key:
         raise RuntimeError("OPENAI_API_KEY not set")
     return OpenAI(api_key=api_key)
 
-CLIENT = get_openai_client()
+CLIENT: Optional["OpenAI"] = None
 
-def connect() -> psycopg2.extensions.connection:
+def get_client() -> "OpenAI":
+    """Process-wide OpenAI client, created on first use."""
+    global CLIENT
+    if CLIENT is None:
+        CLIENT = get_openai_client()
+    return CLIENT
+
+PG_POOL_MIN = 1
+PG_POOL_MAX = 10
+
+class PreparedConnection(psycopg2.extensions.connection):
+    """Connection that remembers which server-side prepared statements it holds."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared: Dict[str, str] = {}
+
+def _connect_kwargs() -> Dict[str, Any]:
+    load_env()
     db_url = os.getenv("DATABASE_URL")
-    conn = psycopg2.connect(db_url) if db_url else psycopg2.connect(
-        host=os.getenv("PGHOST", "localhost"),
-        port=int(os.getenv("PGPORT", "5432")),
-        user=os.getenv("PGUSER", "postgres"),
-        password=os.getenv("PGPASSWORD", ""),
-        dbname=os.getenv("PGDATABASE", "postgres"),
-    )
+    if db_url:
+        return {"dsn": db_url}
+    return {
+        "host": os.getenv("PGHOST", "localhost"),
+        "port": int(os.getenv("PGPORT", "5432")),
+        "user": os.getenv("PGUSER", "postgres"),
+        "password": os.getenv("PGPASSWORD", ""),
+        "dbname": os.getenv("PGDATABASE", "postgres"),
+    }
+
+def _configure(conn) -> None:
+    """One-time per-connection setup (adapters are registered once, not per request)."""
     conn.autocommit = True
+    from pgvector.psycopg2 import register_vector
     psycopg2.extras.register_uuid(conn_or_curs=conn)
     register_vector(conn)
+
+def connect() -> psycopg2.extensions.connection:
+    """Standalone connection (scripts / one-off use); services should use pooled()."""
+    conn = psycopg2.connect(connection_factory=PreparedConnection, **_connect_kwargs())
+    _configure(conn)
     return conn
 
+_POOL: Optional[psycopg2.pool.ThreadedConnectionPool] = None
+_POOL_LOCK = threading.Lock()
+# ThreadedConnectionPool raises when exhausted; callers wait for a free slot instead
+_POOL_SLOTS = threading.BoundedSemaphore(PG_POOL_MAX)
+
+def get_pool() -> psycopg2.pool.ThreadedConnectionPool:
+    """Process-wide thread-safe pool, created on first use."""
+    global _POOL
+    load_env()  # PG_POOL_MIN / PG_POOL_MAX
+    with _POOL_LOCK:
+        if _POOL is None or _POOL.closed:
+            _POOL = psycopg2.pool.ThreadedConnectionPool(
+                PG_POOL_MIN, PG_POOL_MAX, connection_factory=PreparedConnection, **_connect_kwargs()
+            )
+        return _POOL
+
+@contextmanager
+def pooled():
+    """
+    Borrow a configured connection from the pool (blocking while all PG_POOL_MAX are in use);
+    broken connections are discarded on return.
+    """
+    pool = get_pool()
+    with _POOL_SLOTS:
+        conn = pool.getconn()
+        try:
+            if not getattr(conn, "_configured", False):
+                _configure(conn)
+                conn._configured = True
+            yield conn
+        finally:
+            pool.putconn(conn, close=bool(conn.closed))
+
+_PLACEHOLDER_RE = re.compile(r"%%|%s")
+
+def execute_prepared(cur, sql: str, args: Tuple = (), settings: Optional[Dict[str, str]] = None) -> None:
+    """
+    Execute `sql` (psycopg2 %s placeholders) as a server-side prepared statement, preparing
+    it once per connection. Falls back to a plain execute on non-PreparedConnection conns.
+    `settings` (GUC -> value) are applied with SET LOCAL in the same round trip: on an
+    autocommit connection the statements run as one implicit transaction, so they revert
+    when the query finishes.
+    """
+    prefix = "".join(f"SET LOCAL {name} = {value}; " for name, value in (settings or {}).items())
+    prepared = getattr(cur.connection, "prepared", None)
+    if prepared is None:
+        cur.execute(prefix + sql, args)
+        return
+    name = "q_" + hashlib.sha1(sql.encode()).hexdigest()[:16]
+    if name not in prepared:
+        n = iter(range(1, len(args) + 1))
+        body = _PLACEHOLDER_RE.sub(lambda m: "%" if m.group(0) == "%%" else f"${next(n)}", sql)
+        cur.execute(f"PREPARE {name} AS {body.strip().rstrip(';')}")
+        prepared[name] = sql
+    if args:
+        cur.execute(f"{prefix}EXECUTE {name} ({', '.join(['%s'] * len(args))});", args)
+    else:
+        cur.execute(f"{prefix}EXECUTE {name};")
+
 # =========================
 # Embedding helpers
 # =========================
 def embed_3072(text: str) -> List[float]:
     """OpenAI 3072-d embedding (nets / functional_groups)."""
-    r = CLIENT.embeddings.create(model="text-embedding-3-large", input=[text])
+    r = get_client().embeddings.create(model="text-embedding-3-large", input=[text])
     vec = r.data[0].embedding
     return list(vec)
 
 def embed_1536(text: str) -> List[float]:
     """OpenAI 1536-d embedding (components table if you ingested with small model)."""
-    r = CLIENT.embeddings.create(model="text-embedding-3-small", input=[text])
+    r = get_client().embeddings.create(model="text-embedding-3-small", input=[text])
     vec = r.data[0].embedding
     return list(vec)
 
+# Per-table query backend; must match the backend the table was ingested with.
+# Filled from the environment by load_env().
+TABLE_BACKEND_ENV = (
+    ("components", "COMPONENTS_EMBEDDING_BACKEND", "openai:text-embedding-3-small"),
+    ("nets", "NETS_EMBEDDING_BACKEND", "openai:text-embedding-3-large"),
+    ("functional_groups", "GROUPS_EMBEDDING_BACKEND", "openai:text-embedding-3-large"),
+)
+TABLE_BACKENDS: Dict[str, str] = {}
+
+def backend_for(table: str) -> EmbeddingBackend:
+    # Backends build their client / load their model on first embed, not here
+    load_env()
+    return get_backend(TABLE_BACKENDS[table])
+
+class TTLCache:
+    """Thread-safe LRU of at most `maxsize` entries; entries expire after `ttl` s."""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 3600.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Tuple, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Tuple) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and time.monotonic() - entry[0] < self.ttl:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: Tuple, value: Any) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+class QueryEmbeddingCache(TTLCache):
+    """Query embeddings keyed by (backend name, text)."""
+
+# Sized from QUERY_CACHE_SIZE / QUERY_CACHE_TTL by load_env()
+QUERY_CACHE = QueryEmbeddingCache()
+
+# Schema and board lookups (columns, extensions, row counts, ...) that pick query plans. They
+# expire after SCHEMA_CACHE_TTL s so a long-running process notices re-ingests, storage
+# migrations and --drop-full-vectors; per-board keys are bounded by maxsize.
+SCHEMA_CACHE = TTLCache(maxsize=4096, ttl=30.0)
+
+def schema_cached(key: Tuple, load: Callable[[], Any]) -> Any:
+    """SCHEMA_CACHE[key], computed with load() when missing or expired (None is cached too)."""
+    entry = SCHEMA_CACHE.get(key)
+    if entry is None:
+        entry = (load(),)
+        SCHEMA_CACHE.put(key, entry)
+    return entry[0]
+
+def embed_with(backend: EmbeddingBackend, text: str) -> List[float]:
+    """Embed one query with `backend`, going through QUERY_CACHE."""
+    key = (backend.name, text)
+    vec = QUERY_CACHE.get(key)
+    if vec is None:
+        vec = backend.embed([text])[0]
+        QUERY_CACHE.put(key, vec)
+    return vec
+
+def embed_for(table: str, text: str) -> List[float]:
+    """Query embedding for `table` using its configured backend (local models stay loaded)."""
+    return embed_with(backend_for(table), text)
+
 # Optional: unit-normalize if you want consistency across stores
 def normalize(v: List[float]) -> List[float]:
     n = math.sqrt(sum(x*x for x in v))
     return [x / n for x in v] if n else v
 
 # =========================
-# Vector search primitives (cosine)
+# Board scoping
 # =========================
-def vsearch_nets(conn, text: str, k: int = 10) -> List[Tuple]:
-    vec = embed_3072(text)
-    with conn.cursor() as cur:
-        cur.execute(
-            """
-            SELECT id, name, net_type, connected_components
-            FROM nets
-            ORDER BY (embedding::halfvec(3072)) <=> ((%s)::vector)::halfvec(3072)
+def board_filter(board_id: Optional[str], col: str = "board_id") -> Tuple[str, Tuple]:
+    """SQL predicate + params restricting `col` to one board; no-op when board_id is None."""
+    if board_id is None:
+        return "TRUE", ()
+    return f"{col} = %s", (board_id,)
+
+# =========================
+# ANN query parameters
+# =========================
+# Session defaults (None = server default); per-call overrides via vsearch_*(..., ef_search=, probes=)
+HNSW_EF_SEARCH: Optional[int] = None
+IVFFLAT_PROBES: Optional[int] = None
+
+def ann_params(ef_search: Optional[int] = None, probes: Optional[int] = None) -> Dict[str, str]:
+    """
+    hnsw.ef_search (HNSW recall/latency) and ivfflat.probes (IVFFlat lists scanned) for one
+    query, as settings for execute_prepared(): applied with SET LOCAL in the query's own
+    round trip, so nothing needs restoring afterwards.
+    """
+    load_env()
+    ef_search = ef_search or HNSW_EF_SEARCH
+    probes = probes or IVFFLAT_PROBES
+    return {name: str(int(val)) for name, val in (("hnsw.ef_search", ef_search), ("ivfflat.probes", probes))
+            if val}
+
+# A board filter is applied on top of the global ANN index, which only hands out
+# ef_search / probes candidates before filtering. Boards up to this many rows are searched
+# exactly on pgvector < 0.8 (no iterative scans); larger ones get the candidate pool raised.
+EXACT_BOARD_ROWS = 20000
+FILTERED_EF_SEARCH = 1000  # pgvector's maximum
+FILTERED_PROBES = 100
+
+def pgvector_version(conn) -> Tuple[int, ...]:
+    """Installed pgvector version, e.g. (0, 8, 0) (cached)."""
+    def load():
+        with conn.cursor() as cur:
+            cur.execute("SELECT extversion FROM pg_extension WHERE extname = 'vector';")
+            row = cur.fetchone()
+        return tuple(int(p) for p in row[0].split(".") if p.isdigit()) if row else ()
+    return schema_cached(("pgvector_version",), load)
+
+def board_rows(conn, table: str, board_id: str) -> int:
+    """Rows of one board in `table` (board_id btree; cached)."""
+    def load():
+        with conn.cursor() as cur:
+            cur.execute(f"SELECT count(*) FROM {table} WHERE board_id = %s;", (board_id,))
+            return cur.fetchone()[0]
+    return schema_cached(("board_rows", table, board_id), load)
+
+def board_scan_params(conn, table: str, board_id: Optional[str],
+                      settings: Dict[str, str]) -> Dict[str, str]:
+    """
+    Settings that keep a board-filtered ANN query from coming back short: iterative index
+    scans (pgvector >= 0.8), else an exact scan of small boards or a larger candidate pool.
+    Custom plans let the planner see the board (per-board partial indexes, --board-index)
+    and honour the per-query settings instead of reusing a cached generic plan.
+    """
+    if board_id is None:
+        return settings
+    out = dict(settings, plan_cache_mode="force_custom_plan")
+    if pgvector_version(conn) >= (0, 8):
+        out["hnsw.iterative_scan"] = "strict_order"
+        out["ivfflat.iterative_scan"] = "relaxed_order"  # re-sorted by the caller
+    elif board_rows(conn, table, board_id) <= EXACT_BOARD_ROWS:
+        # ANN indexes only support plain index scans; the board_id btree stays usable as a bitmap scan
+        out["enable_indexscan"] = "off"
+    else:
+        out["hnsw.ef_search"] = str(max(int(settings.get("hnsw.ef_search", 0)), FILTERED_EF_SEARCH))
+        out["ivfflat.probes"] = str(max(int(settings.get("ivfflat.probes", 0)), FILTERED_PROBES))
+    return out
+
+# =========================
+# Vector storage detection
+# =========================
+# Candidate pool multiplier for two-stage (binary -> halfvec, or halfvec -> full) search
+RERANK_FACTOR = 4
+
+def vector_columns(conn, table: str) -> List[str]:
+    """Which of embedding / embedding_half / embedding_bin / embedding_short exist on `table` (cached)."""
+    def load():
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT column_name FROM information_schema.columns
+                WHERE table_schema = current_schema() AND table_name = %s
+                  AND column_name IN ('embedding', 'embedding_half', 'embedding_bin', 'embedding_short');
+                """,
+                (table,),
+            )
+            return [r[0] for r in cur.fetchall()]
+    return schema_cached(("vector_columns", table), load)
+
+def column_dims(conn, table: str, column: str) -> Optional[int]:
+    """Declared dimension (typmod) of a vector column, or None (cached)."""
+    def load():
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT atttypmod FROM pg_attribute
+                WHERE attrelid = to_regclass(%s) AND attname = %s AND NOT attisdropped;
+                """,
+                (table, column),
+            )
+            row = cur.fetchone()
+            return row[0] if row and row[0] > 0 else None
+    return schema_cached(("column_dims", table, column), load)
+
+def has_full_vectors(conn, table: str) -> bool:
+    """
+    Whether any row still has a full-precision embedding (cached). --drop-full-vectors keeps
+    the column but NULLs it, so re-ranking must check the values, not just the column.
+    """
+    def load():
+        if "embedding" not in vector_columns(conn, table):
+            return False
+        with conn.cursor() as cur:
+            cur.execute(f"SELECT EXISTS (SELECT 1 FROM {table} WHERE embedding IS NOT NULL);")
+            return cur.fetchone()[0]
+    return schema_cached(("full_vectors", table), load)
+
+def short_vector_dims(conn, table: str) -> Optional[int]:
+    """Dimension of the Matryoshka-truncated embedding_short column, or None."""
+    return column_dims(conn, table, "embedding_short")
+
+def shorten(vec: List[float], dims: int) -> List[float]:
+    """Matryoshka truncation to the first `dims` components, re-normalized (as at ingest)."""
+    return normalize(list(vec[:dims]))
+
+def _vsearch(conn, table: str, select_cols: str, vec: List[float], dims: int, k: int,
+             board_id: Optional[str], ef_search: Optional[int], probes: Optional[int],
+             rerank: bool, quantized: bool, short: bool = False) -> List[Tuple]:
+    """
+    Cosine search over `table`, using the native halfvec column when the table has one
+    (otherwise the halfvec expression over the full column). quantized=True pre-filters on
+    the binary column by Hamming distance; short=True pre-filters on the truncated
+    Matryoshka vectors and always re-ranks; rerank=True re-orders candidates by the
+    full-precision vectors. Two-stage modes take RERANK_FACTOR * k candidates.
+    Without full vectors (dropped at ingest), re-ranking uses the halfvec distance; rows
+    whose full vector was cleared fall back to it individually.
+    """
+    cols = vector_columns(conn, table)
+    half_col = "embedding_half" if "embedding_half" in cols else f"(embedding::halfvec({dims}))"
+    half_dist = f"{half_col} <=> ((%s)::vector)::halfvec({dims})"
+    full_dist = f"COALESCE(embedding <=> (%s)::vector, {half_dist})"
+    bin_dist = f"embedding_bin <~> binary_quantize((%s)::vector)::bit({dims})"
+    short_dims = short_vector_dims(conn, table) if short and "embedding_short" in cols else None
+    quantized = quantized and "embedding_bin" in cols
+    rerank = (rerank or bool(short_dims)) and has_full_vectors(conn, table)
+
+    where, params = board_filter(board_id)
+    first_vec = vec
+    if short_dims:
+        first, second = "embedding_short <=> (%s)::vector", (full_dist if rerank else half_dist)
+        first_vec = shorten(vec, short_dims)
+    elif quantized:
+        first, second = bin_dist, (full_dist if rerank else half_dist)
+    elif rerank:
+        first, second = half_dist, full_dist
+    elif board_id is not None:
+        # Iterative IVFFlat scans return candidates in relaxed order; re-sort the k rows
+        first, second = half_dist, half_dist
+    else:
+        first, second = half_dist, None
+
+    if second is None:
+        sql = f"""
+            SELECT {select_cols}
+            FROM {table}
+            WHERE {where}
+            ORDER BY {first}
             LIMIT %s;
-            """,
-            (vec, k),
-        )
+        """
+        args = (*params, vec, k)
+    else:
+        sql = f"""
+            WITH candidates AS (
+                SELECT *
+                FROM {table}
+                WHERE {where}
+                ORDER BY {first}
+                LIMIT %s
+            )
+            SELECT {select_cols}
+            FROM candidates
+            ORDER BY {second}
+            LIMIT %s;
+        """
+        second_vecs = (vec, vec) if second == full_dist else (vec,)
+        n_candidates = k if second == first else k * RERANK_FACTOR
+        args = (*params, first_vec, n_candidates, *second_vecs, k)
+
+    settings = board_scan_params(conn, table, board_id, ann_params(ef_search, probes))
+    with conn.cursor() as cur:
+        execute_prepared(cur, sql, args, settings)
         return cur.fetchall()
 
-def vsearch_groups(conn, text: str, k: int = 10) -> List[Tuple]:
-    vec = embed_3072(text)
+# =========================
+# Vector search primitives (cosine)
+# =========================
+# Columns returned per table by vsearch_* / lexical_search / hybrid_search (id first)
+SEARCH_COLUMNS = {
+    "nets": "id, name, net_type, connected_components",
+    "functional_groups": "id, name, description, components, function",
+    "components": "id, reference, value, description, mpn",
+}
+
+def vsearch_nets(conn, text: str, k: int = 10, board_id: Optional[str] = None,
+                 ef_search: Optional[int] = None, probes: Optional[int] = None,
+                 rerank: bool = False, quantized: bool = False, short: bool = False,
+                 vec: Optional[List[float]] = None) -> List[Tuple]:
+    vec = vec if vec is not None else embed_for("nets", text)
+    dims = column_dims(conn, "nets", "embedding") or len(vec)
+    return _vsearch(conn, "nets", SEARCH_COLUMNS["nets"], vec, dims, k,
+                    board_id, ef_search, probes, rerank, quantized, short)
+
+def vsearch_groups(conn, text: str, k: int = 10, board_id: Optional[str] = None,
+                   ef_search: Optional[int] = None, probes: Optional[int] = None,
+                   rerank: bool = False, quantized: bool = False, short: bool = False,
+                   vec: Optional[List[float]] = None) -> List[Tuple]:
+    vec = vec if vec is not None else embed_for("functional_groups", text)
+    dims = column_dims(conn, "functional_groups", "embedding") or len(vec)
+    return _vsearch(conn, "functional_groups", SEARCH_COLUMNS["functional_groups"], vec, dims, k,
+                    board_id, ef_search, probes, rerank, quantized, short)
+
+def vsearch_components(conn, text: str, k: int = 10, board_id: Optional[str] = None,
+                       ef_search: Optional[int] = None, probes: Optional[int] = None,
+                       rerank: bool = False, quantized: bool = False, short: bool = False,
+                       vec: Optional[List[float]] = None) -> List[Tuple]:
+    """Only if you ingested components with 1536-d vectors."""
+    vec = vec if vec is not None else embed_for("components", text)
+    dims = column_dims(conn, "components", "embedding") or len(vec)
+    return _vsearch(conn, "components", SEARCH_COLUMNS["components"], vec, dims, k,
+                    board_id, ef_search, probes, rerank, quantized, short)
+
+VSEARCH = {"nets": vsearch_nets, "functional_groups": vsearch_groups, "components": vsearch_components}
+
+# =========================
+# Lexical + hybrid retrieval
+# =========================
+# Full-text fields / identifier columns per table; must match ingest_vectors.py
+LEXICAL_FIELDS = {
+    "components": ["reference", "value", "mpn", "description"],
+    "nets": ["name", "net_type"],
+    "functional_groups": ["name", "function", "description"],
+}
+IDENTIFIER_FIELDS = {
+    "components": ["reference", "mpn", "value"],
+    "nets": ["name"],
+    "functional_groups": ["name"],
+}
+# Columns an exact (case-insensitive) match short-circuits on: refs, MPNs, net names
+EXACT_FIELDS = {"components": ["reference", "mpn"], "nets": ["name"], "functional_groups": []}
+# Reciprocal rank fusion constant (score = sum 1 / (RRF_K + rank))
+RRF_K = 60
+
+TERM_RE = re.compile(r"[+\-]?[A-Za-z0-9][\w.+\-/]*")
+LEXICAL_STOPWORDS = frozenset(
+    "a an and any are as at be by does for from has have how i in is it its me of on or "
+    "the there this to what when where which who why with".split()
+)
+
+def query_terms(text: str) -> List[str]:
+    """Search terms of a question: word-ish tokens (keeping +3V3, D+, SN74LVC1G125) minus stopwords."""
+    terms = [t.rstrip(".,;:") for t in TERM_RE.findall(text)]
+    return list(dict.fromkeys(t for t in terms if t and t.lower() not in LEXICAL_STOPWORDS))
+
+def identifier_terms(text: str) -> List[str]:
+    """Terms that look like refs / MPNs / net names (digits, a leading sign, or ALL CAPS), upper-cased."""
+    return [t.upper() for t in query_terms(text)
+            if any(ch.isdigit() for ch in t) or t[0] in "+-" or (len(t) > 1 and t.isupper())]
+
+def _has(conn, kind: str, name: str) -> bool:
+    """Cached check for an installed extension ("ext"), a table ("table") or a column ("column", "table.column")."""
+    def load():
+        with conn.cursor() as cur:
+            if kind == "ext":
+                cur.execute("SELECT 1 FROM pg_extension WHERE extname = %s;", (name,))
+            elif kind == "table":
+                cur.execute("SELECT 1 WHERE to_regclass(%s) IS NOT NULL;", (name,))
+            else:
+                table, column = name.split(".")
+                cur.execute(
+                    """
+                    SELECT 1 FROM information_schema.columns
+                    WHERE table_schema = current_schema() AND table_name = %s AND column_name = %s;
+                    """,
+                    (table, column),
+                )
+            return cur.fetchone() is not None
+    return schema_cached(("has", kind, name), load)
+
+def exact_search(conn, table: str, text: str, k: int = 10, board_id: Optional[str] = None) -> List[Tuple]:
+    """Rows whose ref / MPN / net name equals an identifier in `text` (case-insensitive, indexed)."""
+    terms, fields = identifier_terms(text), EXACT_FIELDS[table]
+    if not terms or not fields:
+        return []
+    where, params = board_filter(board_id)
+    match = " OR ".join(f"upper({f}) = ANY(%s)" for f in fields)
     with conn.cursor() as cur:
-        cur.execute(
-            """
-            SELECT id, name, description, components, function
-            FROM functional_groups
-            ORDER BY (embedding::halfvec(3072)) <=> ((%s)::vector)::halfvec(3072)
+        execute_prepared(
+            cur,
+            f"""
+            SELECT {SEARCH_COLUMNS[table]}
+            FROM {table}
+            WHERE ({match}) AND {where}
+            ORDER BY {fields[0]}
             LIMIT %s;
             """,
-            (vec, k),
+            (*([terms] * len(fields)), *params, k),
         )
         return cur.fetchall()
 
-def vsearch_components(conn, text: str, k: int = 10) -> List[Tuple]:
-    """Only if you ingested components with 1536-d vectors."""
-    vec = embed_1536(text)
+def lexical_search(conn, table: str, text: str, k: int = 10, board_id: Optional[str] = None) -> List[Tuple]:
+    """
+    Full-text match (any term, 'simple' config, ranked by ts_rank_cd) over LEXICAL_FIELDS, plus
+    trigram similarity on identifier columns when pg_trgm is installed (typos, partial MPNs).
+    """
+    terms = query_terms(text)
+    if not terms:
+        return []
+    if _has(conn, "column", f"{table}.search_tsv"):
+        tsv = "search_tsv"
+    else:
+        doc = " || ' ' || ".join(f"coalesce({f}, '')" for f in LEXICAL_FIELDS[table])
+        tsv = f"to_tsvector('simple'::regconfig, {doc})"
+    # websearch syntax never errors; a leading '-' would mean NOT, so drop it
+    tsquery = " or ".join(t.lstrip("-") for t in terms)
+    match, score, args = f"{tsv} @@ q", f"ts_rank_cd({tsv}, q)", []
+    if _has(conn, "ext", "pg_trgm"):
+        idents = IDENTIFIER_FIELDS[table]
+        match += "".join(f" OR {f} %% ANY(%s::text[])" for f in idents)
+        score = f"{score} + GREATEST(" + ", ".join(
+            f"(SELECT max(similarity({f}, t)) FROM unnest(%s::text[]) t)" for f in idents) + ")"
+        args = [terms] * len(idents)
+    where, params = board_filter(board_id)
     with conn.cursor() as cur:
-        cur.execute(
-            """
-            SELECT id, reference, value, description, mpn
-            FROM components
-            ORDER BY (embedding::halfvec(1536)) <=> ((%s)::vector)::halfvec(1536)
+        execute_prepared(
+            cur,
+            f"""
+            SELECT {SEARCH_COLUMNS[table]}
+            FROM {table}, websearch_to_tsquery('simple', %s) q
+            WHERE ({match}) AND {where}
+            ORDER BY {score} DESC
             LIMIT %s;
             """,
-            (vec, k),
+            (tsquery, *args, *params, *args, k),
         )
         return cur.fetchall()
 
+def rrf_fuse(rankings: List[List[Tuple]], k: int) -> List[Tuple]:
+    """Reciprocal rank fusion of ranked row lists, rows identified by their first column (id)."""
+    scores: Dict[Any, float] = {}
+    rows: Dict[Any, Tuple] = {}
+    for ranking in rankings:
+        for rank, row in enumerate(ranking):
+            scores[row[0]] = scores.get(row[0], 0.0) + 1.0 / (RRF_K + rank + 1)
+            rows.setdefault(row[0], row)
+    return [rows[i] for i in sorted(scores, key=scores.get, reverse=True)[:k]]
+
+def hybrid_search(conn, table: str, text: str, k: int = 10, board_id: Optional[str] = None,
+                  vec: Optional[List[float]] = None, **vopts) -> List[Tuple]:
+    """
+    Lexical + vector retrieval fused by reciprocal rank. Exact ref / MPN / net-name hits come
+    first and, when present, the vector query (and its embedding call) is skipped.
+    """
+    exact = exact_search(conn, table, text, k, board_id)
+    lexical = lexical_search(conn, table, text, k * RERANK_FACTOR, board_id)
+    if exact:
+        return rrf_fuse([exact, lexical], k) if len(exact) < k else exact[:k]
+    vector = VSEARCH[table](conn, text, k=k * RERANK_FACTOR, board_id=board_id, vec=vec, **vopts)
+    return rrf_fuse([lexical, vector], k)
+
+# =========================
+# Semantic fan-out
+# =========================
+# Each search borrows its own pooled connection: a psycopg2 connection runs one query at a time.
+# Shared by all concurrent questions, so sized to the connection pool rather than to one question.
+SEARCH_FANOUT_WORKERS = 10
+_FANOUT: Optional[ThreadPoolExecutor] = None
+_FANOUT_LOCK = threading.Lock()
+
+def fanout() -> ThreadPoolExecutor:
+    """Process-wide search fan-out pool (SEARCH_FANOUT_WORKERS threads), created on first use."""
+    global _FANOUT
+    load_env()
+    with _FANOUT_LOCK:
+        if _FANOUT is None:
+            _FANOUT = ThreadPoolExecutor(max_workers=SEARCH_FANOUT_WORKERS, thread_name_prefix="vsearch")
+        return _FANOUT
+
+SEMANTIC_SEARCHES = (
+    # result key, table, search fn, k, optional (errors -> [])
+    ("semantic_nets", "nets", vsearch_nets, 8, False),
+    ("semantic_groups", "functional_groups", vsearch_groups, 5, False),
+    # Only if the components table has embeddings
+    ("semantic_components", "components", vsearch_components, 8, True),
+)
+
+def exact_hits(conn, question: str, board_id: Optional[str] = None) -> Dict[str, List[Tuple]]:
+    """exact_search results per table for the semantic fan-out (non-empty => no embedding needed)."""
+    return {table: exact_search(conn, table, question, k, board_id) for _, table, _, k, _ in SEMANTIC_SEARCHES}
+
+def semantic_search(question: str, hybrid: bool = False, exact: Optional[Dict[str, List[Tuple]]] = None,
+                    **opts) -> Dict[str, List[Tuple]]:
+    """
+    Run the nets / groups / components searches for one question concurrently.
+    The question is embedded once per distinct backend (nets and groups share one by default),
+    then each ANN query runs on a worker connection. hybrid=True fuses in lexical matches and,
+    if the question names an existing ref / MPN / net, answers lexically with no embedding call.
+    `exact`: exact_hits() already run by the caller for this question (hybrid only).
+    """
+    if hybrid:
+        board_id = opts.get("board_id")
+        if exact is None:
+            with pooled() as conn:
+                exact = exact_hits(conn, question, board_id)
+        if any(exact.values()):
+            # The question names an existing ref / MPN / net: lexical only, no embedding call
+            def run(table, fn, k):
+                with pooled() as conn:
+                    return rrf_fuse([exact[table], lexical_search(conn, table, question, k, board_id)], k)
+            return _collect([(key, optional, fanout().submit(run, table, fn, k))
+                             for key, table, fn, k, optional in SEMANTIC_SEARCHES])
+
+    backends = {table: backend_for(table) for _, table, _, _, _ in SEMANTIC_SEARCHES}
+    distinct = {b.name: b for b in backends.values()}
+    vec_futures = {name: fanout().submit(embed_with, b, question) for name, b in distinct.items()}
+
+    def run(table, fn, k):
+        vec = vec_futures[backends[table].name].result()
+        with pooled() as conn:
+            if hybrid:
+                return hybrid_search(conn, table, question, k=k, vec=vec, **opts)
+            return fn(conn, question, k=k, vec=vec, **opts)
+
+    return _collect([(key, optional, fanout().submit(run, table, fn, k))
+                     for key, table, fn, k, optional in SEMANTIC_SEARCHES])
+
+def _collect(futures) -> Dict[str, List[Tuple]]:
+    out: Dict[str, List[Tuple]] = {}
+    for key, optional, fut in futures:
+        try:
+            out[key] = fut.result()
+        except Exception:
+            if not optional:
+                raise
+            out[key] = []
+    return out
+
 # =========================
 # Structured graph helpers
 # =========================
-def nets_for_component(conn, ref: str) -> List[Tuple[str]]:
+# Joins always stay within one board: refs like R1 / nets like GND repeat across boards.
+# With a board_id, traversals use the cached in-memory NetlistGraph; SQL is the fallback
+# (no board, graph disabled, or graph load failed).
+USE_NETLIST_GRAPH = True  # read by load_env()
+
+def has_net_members(conn) -> bool:
+    """Whether ingest created the normalized net_members table (cached)."""
+    return _has(conn, "table", "net_members")
+
+def on_net(conn, ref_sql: str, net: str = "n") -> str:
+    """
+    SQL predicate "component `ref_sql` is on net alias `net`": an indexed net_members lookup,
+    or GIN-indexed array containment on databases ingested before net_members existed.
+    """
+    if has_net_members(conn):
+        return f"EXISTS (SELECT 1 FROM net_members m WHERE m.net_id = {net}.id AND m.component_ref = {ref_sql})"
+    return f"{net}.connected_components @> ARRAY[{ref_sql}]::text[]"
+
+def board_graph(conn, board_id: Optional[str]) -> Optional[NetlistGraph]:
+    load_env()
+    if not USE_NETLIST_GRAPH or board_id is None:
+        return None
+    try:
+        return GRAPHS.get(conn, board_id)
+    except psycopg2.Error:
+        return None
+
+def nets_for_component(conn, ref: str, board_id: Optional[str] = None) -> List[Tuple[str]]:
+    graph = board_graph(conn, board_id)
+    if graph is not None:
+        return graph.nets_for_component(ref)
+    where, params = board_filter(board_id, "n.board_id")
     with conn.cursor() as cur:
-        cur.execute(
-            "SELECT name FROM nets WHERE %s = ANY(connected_components);",
-            (ref,),
+        execute_prepared(
+            cur,
+            f"SELECT n.name FROM nets n WHERE {on_net(conn, '%s')} AND {where};",
+            (ref, *params),
         )
         return [r[0] for r in cur.fetchall()]
 
-def components_on_net(conn, net_name: str) -> List[Dict[str, Any]]:
+def components_on_net(conn, net_name: str, board_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    graph = board_graph(conn, board_id)
+    if graph is not None:
+        return graph.components_on_net(net_name)
+    where, params = board_filter(board_id, "n.board_id")
     with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-        cur.execute(
-            """
+        execute_prepared(
+            cur,
+            f"""
             SELECT c.reference, c.value, c.description, c.mpn, c.footprint, c.library_id, c.rating
             FROM components c
-            JOIN nets n ON c.reference = ANY(n.connected_components)
-            WHERE n.name = %s
+            JOIN nets n ON {on_net(conn, 'c.reference')}
+                       AND c.board_id IS NOT DISTINCT FROM n.board_id
+            WHERE n.name = %s AND {where}
             ORDER BY c.reference;
             """,
-            (net_name,),
+            (net_name, *params),
         )
         return list(cur.fetchall())
 
-def groups_touching_net(conn, net_name: str) -> List[Tuple]:
+def groups_touching_net(conn, net_name: str, board_id: Optional[str] = None) -> List[Tuple]:
+    graph = board_graph(conn, board_id)
+    if graph is not None:
+        return graph.groups_touching_net(net_name)
+    where, params = board_filter(board_id, "n.board_id")
     with conn.cursor() as cur:
-        cur.execute(
-            """
+        execute_prepared(
+            cur,
+            f"""
             SELECT fg.id, fg.name, fg.function, fg.components
             FROM functional_groups fg
             JOIN nets n ON n.connected_components && fg.components
-            WHERE n.name = %s;
+                       AND fg.board_id IS NOT DISTINCT FROM n.board_id
+            WHERE n.name = %s AND {where};
             """,
-            (net_name,),
+            (net_name, *params),
         )
         return cur.fetchall()
 
-def nets_for_resistor(conn, resistor_ref: str) -> List[str]:
-    return nets_for_component(conn, resistor_ref)
+def nets_for_resistor(conn, resistor_ref: str, board_id: Optional[str] = None) -> List[str]:
+    return nets_for_component(conn, resistor_ref, board_id)
 
-def rails_on_net(conn, net_name: str) -> List[Tuple[str, str]]:
+def rails_on_net(conn, net_name: str, board_id: Optional[str] = None) -> List[Tuple[str, str]]:
     """Return (reference, value) for power rails present on the net (e.g., +3V3, +5V, GND)."""
+    graph = board_graph(conn, board_id)
+    if graph is not None:
+        return graph.rails_on_net(net_name)
+    where, params = board_filter(board_id, "n.board_id")
     with conn.cursor() as cur:
-        cur.execute(
-            """
+        execute_prepared(
+            cur,
+            f"""
             SELECT c.reference, c.value
             FROM components c
-            JOIN nets n ON c.reference = ANY(n.connected_components)
-            WHERE n.name = %s AND c.value IN ('+3V3', '+5V', 'GND');
+            JOIN nets n ON {on_net(conn, 'c.reference')}
+                       AND c.board_id IS NOT DISTINCT FROM n.board_id
+            WHERE n.name = %s AND c.value IN ('+3V3', '+5V', 'GND') AND {where};
             """,
-            (net_name,),
+            (net_name, *params),
         )
         return cur.fetchall()
 
@@ -184,105 +888,394 @@ def rails_on_net(conn, net_name: str) -> List[Tuple[str, str]]:
 # Heuristics XXX This needs a ton of work don't for get to figure this out pins/connections/base functions, floats, through holes, etc. Quite massive
 # =========================
 REF_RE = re.compile(r"\b([A-Z]{1,3}\d{1,4})\b")  # e.g., J5, R405, U403
-PIN_RE = re.compile(r"\bpin\s+(\d{1,3})\b", re.IGNORECASE)
+# "pin 5", "pin #5", "pin SDA", "pin PA5": a number, or an upper-case pin name
+PIN_RE = re.compile(r"(?i:\bpin)\s*#?\s*(\d{1,3}|[A-Z][A-Z0-9_+\-]{1,15})(?![\w+\-])")
+
+# Boards ingested with circuit facts answer the heuristics with one keyed lookup. Otherwise each
+# heuristic is one graph pass or one set-based query: constant round trips regardless of net fan-out.
+def circuit_fact(conn, kind: str, subject: str, board_id: Optional[str]) -> Optional[Dict[str, Any]]:
+    """Precomputed fact of `subject` (ref / net) from circuit_facts; None without a board or row."""
+    if board_id is None or not _has(conn, "table", "circuit_facts"):
+        return None
+    with conn.cursor() as cur:
+        execute_prepared(
+            cur,
+            "SELECT fact FROM circuit_facts WHERE board_id = %s AND kind = %s AND subject = %s;",
+            (board_id, kind, subject),
+        )
+        row = cur.fetchone()
+    return row[0] if row else None
+
+def board_facts(conn, kind: str, board_id: Optional[str]) -> Optional[List[Dict[str, Any]]]:
+    """All facts of one kind for a board (e.g. every divider), ordered by subject; None if not precomputed."""
+    if board_id is None or not _has(conn, "table", "circuit_facts"):
+        return None
+    with conn.cursor() as cur:
+        execute_prepared(
+            cur,
+            "SELECT fact FROM circuit_facts WHERE board_id = %s AND kind = %s ORDER BY subject;",
+            (board_id, kind),
+        )
+        facts = [r[0] for r in cur.fetchall()]
+        if not facts:
+            execute_prepared(cur, "SELECT 1 FROM circuit_facts WHERE board_id = %s LIMIT 1;", (board_id,))
+            if cur.fetchone() is None:
+                return None
+    return facts
+
+
+def _filter_rows(conn, ref: str, board_id: Optional[str]) -> List[Tuple[str, List[str], List[Tuple[str, str]]]]:
+    """(net, component refs, rails) for every net touching `ref`, ordered by net name."""
+    graph = board_graph(conn, board_id)
+    if graph is not None:
+        return circuit_facts.filter_rows(graph, ref)
+
+    where, params = board_filter(board_id, "n.board_id")
+    with conn.cursor() as cur:
+        execute_prepared(
+            cur,
+            f"""
+            SELECT n.name,
+                   COALESCE(array_agg(c.reference ORDER BY c.reference)
+                            FILTER (WHERE c.reference IS NOT NULL), '{{}}') AS refs,
+                   COALESCE(json_agg(json_build_array(c.reference, c.value) ORDER BY c.reference)
+                            FILTER (WHERE c.value = ANY(%s)), '[]') AS rails
+            FROM nets n
+            LEFT JOIN components c ON {on_net(conn, 'c.reference')}
+                                  AND c.board_id IS NOT DISTINCT FROM n.board_id
+            WHERE {on_net(conn, '%s')} AND {where}
+            GROUP BY n.id, n.name
+            ORDER BY n.name;
+            """,
+            (list(RAIL_VALUES), ref, *params),
+        )
+        return [(net, list(refs), [tuple(r) for r in rails]) for net, refs, rails in cur.fetchall()]
+
+def _pullup_rows(conn, ref: str, board_id: Optional[str]) -> List[Tuple[str, List[str], List[Tuple[str, str]]]]:
+    """(resistor, resistor nets, +3V3/+5V rails on those nets) for resistors sharing a net with `ref`."""
+    graph = board_graph(conn, board_id)
+    if graph is not None:
+        return circuit_facts.pullup_rows(graph, ref)
+
+    where, params = board_filter(board_id, "n.board_id")
+    with conn.cursor() as cur:
+        execute_prepared(
+            cur,
+            f"""
+            WITH resistors AS (
+                SELECT n.name AS via_net, c.reference, c.board_id
+                FROM nets n
+                JOIN components c ON {on_net(conn, 'c.reference')}
+                                 AND c.board_id IS NOT DISTINCT FROM n.board_id
+                WHERE {on_net(conn, '%s')} AND {where}
+                  AND c.reference LIKE 'R%%'
+            )
+            SELECT r.reference, rn.nets, rr.rails
+            FROM resistors r
+            CROSS JOIN LATERAL (
+                SELECT COALESCE(array_agg(n2.name ORDER BY n2.name), '{{}}') AS nets
+                FROM nets n2
+                WHERE {on_net(conn, 'r.reference', 'n2')}
+                  AND n2.board_id IS NOT DISTINCT FROM r.board_id
+            ) rn
+            CROSS JOIN LATERAL (
+                SELECT COALESCE(json_agg(json_build_array(c2.reference, c2.value)
+                                         ORDER BY n2.name, c2.reference), '[]') AS rails
+                FROM nets n2
+                JOIN components c2 ON {on_net(conn, 'c2.reference', 'n2')}
+                                  AND c2.board_id IS NOT DISTINCT FROM n2.board_id
+                WHERE {on_net(conn, 'r.reference', 'n2')}
+                  AND n2.board_id IS NOT DISTINCT FROM r.board_id
+                  AND c2.value = ANY(%s)
+            ) rr
+            ORDER BY r.via_net, r.reference;
+            """,
+            (ref, *params, list(PULLUP_RAIL_VALUES)),
+        )
+        return [(r_ref, list(r_nets), [tuple(r) for r in rails]) for r_ref, r_nets, rails in cur.fetchall()]
 
-def detect_filter_near_component(conn, ref: str) -> Dict[str, Any]:
+def pin_connectivity(conn, ref: str, pin: str, board_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Resolve pin `pin` (number or name) of `ref` to its net and everything else on that net,
+    as one indexed net_members lookup (needs pins ingested with ingest_vectors.py --netlist).
+    """
+    nets: List[Dict[str, Any]] = []
+    if has_net_members(conn):
+        # Databases ingested before pin names existed match by pin number only
+        named = _has(conn, "column", "net_members.pin_name")
+        by_name = "OR upper(p.pin_name) = upper(%s)" if named else ""
+        where, params = board_filter(board_id, "p.board_id")
+        with conn.cursor() as cur:
+            execute_prepared(
+                cur,
+                f"""
+                SELECT n.name, n.net_type, p.pin,
+                       COALESCE(json_agg(json_build_array(o.component_ref, o.pin,
+                                                          {'o.pin_name' if named else 'NULL'}, c.value)
+                                         ORDER BY o.component_ref, o.pin)
+                                FILTER (WHERE o.component_ref IS NOT NULL), '[]')
+                FROM net_members p
+                JOIN nets n ON n.id = p.net_id
+                LEFT JOIN net_members o ON o.net_id = p.net_id
+                                       AND (o.component_ref, o.pin) <> (p.component_ref, p.pin)
+                LEFT JOIN LATERAL (
+                    SELECT c.value FROM components c
+                    WHERE c.reference = o.component_ref AND c.board_id IS NOT DISTINCT FROM p.board_id
+                    LIMIT 1
+                ) c ON TRUE
+                WHERE p.component_ref = %s AND (p.pin = %s {by_name}) AND {where}
+                GROUP BY n.id, n.name, n.net_type, p.pin
+                ORDER BY n.name;
+                """,
+                (ref, pin, *((pin,) if named else ()), *params),
+            )
+            for net, net_type, pin_number, members in cur.fetchall():
+                connected = [{"ref": r, "pin": p or None, "pin_name": name, "value": value}
+                             for r, p, name, value in members]
+                nets.append({
+                    "net": net,
+                    "net_type": net_type,
+                    "pin": pin_number,
+                    "connected": connected,
+                    "rails": [(c["ref"], c["value"]) for c in connected if c["value"] in RAIL_VALUES],
+                })
+    return {"component": ref, "pin": pin, "nets": nets}
+
+def detect_filter_near_component(conn, ref: str, board_id: Optional[str] = None) -> Dict[str, Any]:
     """
     Heuristic: if any net touching 'ref' also contains both a resistor (R*) and a capacitor (C*),
     and a GND rail is present, report a likely RC shunt/noise filter.
     (We cannot confirm series vs. shunt without pin-level connectivity.)
     """
-    nets = nets_for_component(conn, ref)
-    findings = []
-    for net in nets:
-        comps = components_on_net(conn, net)
-        refs = [c["reference"] for c in comps]
-        has_r = any(r.startswith("R") for r in refs)
-        has_c = any(c.startswith("C") for c in refs)
-        gnd = rails_on_net(conn, net)
-        has_gnd = any(v == "GND" for _, v in gnd)
-        if (has_r and has_c) or (has_c and has_gnd):
-            findings.append({
-                "net": net,
-                "components": refs,
-                "rails": gnd,
-                "note": "Likely RC filter (heuristic)"
-            })
-    return {"ref": ref, "nets_checked": nets, "filter_hits": findings}
-
-def infer_pullup_voltage_for_component(conn, ref: str) -> Dict[str, Any]:
+    fact = circuit_fact(conn, "rc_filter", ref, board_id)
+    if fact is not None:
+        return fact
+    return circuit_facts.filter_answer(ref, _filter_rows(conn, ref, board_id))
+
+def infer_pullup_voltage_for_component(conn, ref: str, board_id: Optional[str] = None) -> Dict[str, Any]:
     """
     Heuristic: for the target component 'ref' (e.g., J5), find resistors on the same nets.
     Then inspect all nets those resistors touch; if any includes +3V3/+5V, treat as pull-up voltage.
     """
-    candidate_voltages = set()
-    nets = nets_for_component(conn, ref)
-    details = []
-
-    for net in nets:
-        comps = components_on_net(conn, net)
-        resistors = [c for c in comps if c["reference"].startswith("R")]
-        for r in resistors:
-            r_ref = r["reference"]
-            r_nets = nets_for_resistor(conn, r_ref)
-            v_rails = []
-            for rn in r_nets:
-                for (rail_ref, rail_val) in rails_on_net(conn, rn):
-                    if rail_val in {"+3V3", "+5V"}:
-                        candidate_voltages.add(rail_val)
-                        v_rails.append((rail_ref, rail_val))
-            details.append({"resistor": r_ref, "resistor_nets": r_nets, "rails": v_rails})
+    fact = circuit_fact(conn, "pullup", ref, board_id)
+    if fact is not None:
+        return fact
+    return circuit_facts.pullup_answer(ref, _pullup_rows(conn, ref, board_id))
 
-    return {
-        "component": ref,
-        "candidate_pullup_voltages": sorted(candidate_voltages),
-        "evidence": details,
-    }
+def graph_fact(conn, kind: str, ref: str, board_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    Pull-up / pull-down resistors ("pull") or decoupling capacitors ("decoupling") of `ref`:
+    the precomputed fact, else computed from the board graph; None without a board.
+    """
+    fact = circuit_fact(conn, kind, ref, board_id)
+    if fact is not None:
+        return fact
+    graph = board_graph(conn, board_id)
+    if graph is None:
+        return None
+    return {"pull": circuit_facts.pull_resistors, "decoupling": circuit_facts.decoupling}[kind](graph, ref)
+
+def find_dividers(conn, board_id: Optional[str] = None, refs: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+    """Resistor dividers of the board (optionally only those built from `refs`); None without a board."""
+    facts = board_facts(conn, "divider", board_id)
+    if facts is not None:
+        found = [d for fact in facts for d in fact["dividers"]]
+    else:
+        graph = board_graph(conn, board_id)
+        if graph is None:
+            return None
+        found = circuit_facts.dividers(graph)
+    if refs:
+        found = [d for d in found if d["upper"] in refs or d["lower"] in refs]
+    return {"dividers": found}
 
 # =========================
 # NL intent router
 # =========================
-def answer_question(conn, question: str) -> Dict[str, Any]:
+def route_question(conn, question: str, board_id: Optional[str] = None) -> Dict[str, Any]:
     """
-    Minimal NL router:
-      - extract component refs (e.g., J5, U403, R405)
-      - extract pin numbers (if any)
-      - keyword dispatch: 'filter', 'pull up', 'voltage'
-      - fallback to semantic searches
+    Structured part of answer_question: refs / pin extraction and keyword-dispatched heuristics.
+    An empty "answers" list means the caller should fall back to semantic search.
     """
-    refs = REF_RE.findall(question)
     pin = PIN_RE.findall(question)
-    pin_num = pin[0] if pin else None  # captured string, not used structurally (no pin map available)
+    pin_num = pin[0] if pin else None
+    # A pin name like "PA5" also looks like a ref
+    refs = [r for r in REF_RE.findall(question) if r != pin_num]
 
     q_lower = question.lower()
     wants_filter = "filter" in q_lower
     wants_voltage = "voltage" in q_lower or "pull up" in q_lower or "pull-up" in q_lower
+    wants_pulldown = any(w in q_lower for w in ("pull down", "pull-down", "pulldown"))
+    wants_decoupling = "decoupling" in q_lower or "bypass" in q_lower
+    wants_divider = "divider" in q_lower
 
-    result: Dict[str, Any] = {"question": question, "refs": refs, "pin": pin_num, "answers": []}
+    result: Dict[str, Any] = {"question": question, "board_id": board_id, "refs": refs, "pin": pin_num, "answers": []}
+
+    if pin_num and refs:
+        # "pin 5 of J5": resolve the pin to its net and neighbors; refs without that pin add nothing
+        for ref in refs:
+            hit = pin_connectivity(conn, ref, pin_num, board_id)
+            if hit["nets"]:
+                result["answers"].append(hit)
 
     if wants_filter and refs:
         # Check for filter presence near the referenced component
         for ref in refs:
-            result["answers"].append(detect_filter_near_component(conn, ref))
+            result["answers"].append(detect_filter_near_component(conn, ref, board_id))
 
     if wants_voltage and refs:
         # Infer pull-up voltages involving resistors connected to the referenced component
         for ref in refs:
-            result["answers"].append(infer_pullup_voltage_for_component(conn, ref))
+            result["answers"].append(infer_pullup_voltage_for_component(conn, ref, board_id))
+
+    for kind, wanted in (("pull", wants_pulldown), ("decoupling", wants_decoupling)):
+        if wanted:
+            for ref in refs:
+                fact = graph_fact(conn, kind, ref, board_id)
+                if fact is not None:
+                    result["answers"].append(fact)
+
+    if wants_divider:
+        found = find_dividers(conn, board_id, refs)
+        if found is not None:
+            result["answers"].append(found)
+    return result
+
+def answer_question(conn, question: str, board_id: Optional[str] = None,
+                    rerank: bool = False, quantized: bool = False, short: bool = False,
+                    hybrid: bool = False) -> Dict[str, Any]:
+    """
+    Minimal NL router:
+      - extract component refs (e.g., J5, U403, R405)
+      - extract pin numbers / names (if any); "pin N of REF" resolves through net_members
+      - keyword dispatch: 'filter', 'pull up', 'voltage', 'pull down', 'decoupling', 'divider'
+        (precomputed circuit_facts when the board has them)
+      - fallback to semantic searches (hybrid=True: lexical + vector, exact refs skip embedding)
+    All lookups are restricted to `board_id` when given. Everything runs on `conn`: the caller
+    already holds a pool slot, so borrowing more for a fan-out could wait on itself.
+    """
+    result = route_question(conn, question, board_id)
 
     # If we still have nothing concrete, do semantic retrieval to guide the user
     if not result["answers"]:
-        result["semantic_nets"] = vsearch_nets(conn, question, k=8)
-        result["semantic_groups"] = vsearch_groups(conn, question, k=5)
-        # If components table has embeddings:
-        try:
-            result["semantic_components"] = vsearch_components(conn, question, k=8)
-        except Exception:
-            result["semantic_components"] = []
+        lexical_only = hybrid and any(exact_hits(conn, question, board_id).values())
+        vecs = {} if lexical_only else embed_batch({table: [question] for _, table, _, _, _ in SEMANTIC_SEARCHES})
+        result.update(_semantic_on(conn, question, vecs, hybrid, lexical_only, board_id=board_id,
+                                   rerank=rerank, quantized=quantized, short=short))
 
     # Attach helpful context if a single net is mentioned in results
     return result
 
+# =========================
+# Batch question answering
+# =========================
+def load_questions(path: str) -> List[Dict[str, Any]]:
+    """
+    Questions file: JSONL ({"question", "id"?, "board_id"?} per line) or plain text, one
+    question per line. Blank lines and '#' comments are skipped.
+    """
+    items = []
+    with open(path, "r") as f:
+        for n, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            item = json.loads(line) if line.startswith("{") else {"question": line}
+            item.setdefault("id", n)
+            items.append(item)
+    return items
+
+def embed_batch(texts_by_table: Dict[str, List[str]]) -> Dict[Tuple[str, str], List[float]]:
+    """
+    Embed every (table, text) pair with one batched request per distinct backend (split only
+    past the backend's max_batch); results also seed QUERY_CACHE.
+    """
+    by_backend: Dict[str, Tuple[EmbeddingBackend, Dict[str, None]]] = {}
+    for table, texts in texts_by_table.items():
+        backend = backend_for(table)
+        by_backend.setdefault(backend.name, (backend, {}))[1].update(dict.fromkeys(texts))
+
+    vecs: Dict[Tuple[str, str], List[float]] = {}
+    for name, (backend, texts) in by_backend.items():
+        found = {t: QUERY_CACHE.get((name, t)) for t in texts}
+        missing = [t for t, vec in found.items() if vec is None]
+        for i in range(0, len(missing), backend.max_batch):
+            chunk = missing[i:i + backend.max_batch]
+            for text, vec in zip(chunk, backend.embed(chunk)):
+                found[text] = vec
+                QUERY_CACHE.put((name, text), vec)
+        vecs.update(((name, t), vec) for t, vec in found.items())
+    return {(table, text): vecs[(backend_for(table).name, text)]
+            for table, texts in texts_by_table.items() for text in texts}
+
+def _semantic_on(conn, question: str, vecs: Dict[Tuple[str, str], List[float]],
+                 hybrid: bool, lexical_only: bool, **opts) -> Dict[str, List[Tuple]]:
+    """semantic_search for one question on a single connection, with precomputed vectors."""
+    out: Dict[str, List[Tuple]] = {}
+    for key, table, fn, k, optional in SEMANTIC_SEARCHES:
+        try:
+            if lexical_only:
+                out[key] = rrf_fuse([exact_search(conn, table, question, k, opts.get("board_id")),
+                                     lexical_search(conn, table, question, k, opts.get("board_id"))], k)
+            elif hybrid:
+                out[key] = hybrid_search(conn, table, question, k=k, vec=vecs[(table, question)], **opts)
+            else:
+                out[key] = fn(conn, question, k=k, vec=vecs[(table, question)], **opts)
+        except Exception:
+            if not optional:
+                raise
+            out[key] = []
+    return out
+
+def answer_questions(conn, items: List[Dict[str, Any]], board_id: Optional[str] = None,
+                     rerank: bool = False, quantized: bool = False, short: bool = False,
+                     hybrid: bool = False) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Batch answer_question over one connection: route every question, embed all semantic
+    fallbacks in one batched request per model, then run the ANN queries. Returns the
+    answers (with per-question timings_ms) and batch-level stats.
+    """
+    t_start = time.perf_counter()
+    results, timings = [], []
+    for item in items:
+        t0 = time.perf_counter()
+        result = route_question(conn, item["question"], item.get("board_id", board_id))
+        results.append(result)
+        timings.append({"structured": (time.perf_counter() - t0) * 1000.0})
+
+    # Semantic fallbacks; hybrid questions naming an existing ref / MPN / net skip embedding
+    fallback, lexical_only = [], set()
+    for i, result in enumerate(results):
+        if result["answers"]:
+            continue
+        fallback.append(i)
+        if hybrid and any(exact_hits(conn, result["question"], result["board_id"]).values()):
+            lexical_only.add(i)
+    to_embed = sorted({results[i]["question"] for i in fallback if i not in lexical_only})
+
+    t0 = time.perf_counter()
+    vecs = embed_batch({table: to_embed for _, table, _, _, _ in SEMANTIC_SEARCHES}) if to_embed else {}
+    embed_ms = (time.perf_counter() - t0) * 1000.0
+
+    for i in fallback:
+        t0 = time.perf_counter()
+        results[i].update(_semantic_on(conn, results[i]["question"], vecs, hybrid, i in lexical_only,
+                                       board_id=results[i]["board_id"], rerank=rerank,
+                                       quantized=quantized, short=short))
+        timings[i]["search"] = (time.perf_counter() - t0) * 1000.0
+
+    for item, result, timing in zip(items, results, timings):
+        result["id"] = item["id"]
+        result["timings_ms"] = {stage: round(ms, 3) for stage, ms in timing.items()}
+    stats = {
+        "questions": len(items),
+        "semantic": len(fallback),
+        "embedded_texts": len(to_embed),
+        "embed_ms": round(embed_ms, 3),
+        "total_ms": round((time.perf_counter() - t_start) * 1000.0, 3),
+    }
+    return results, stats
+
 # =========================
 # CLI python search_vector_schematics.py --ask "Is there a filter attached to pin 5 of J5?" 
 # python search_vector_schematics.py --ask "What is the Voltage 3.3V or 5V?"
@@ -292,9 +1285,35 @@ if __name__ == "__main__":
     from pprint import pprint
 
     parser = argparse.ArgumentParser(description="Natural-language circuit QA")
-    parser.add_argument("--ask", required=True, help="Question in natural language")
+    mode = parser.add_mutually_exclusive_group(required=True)
+    mode.add_argument("--ask", help="Question in natural language")
+    mode.add_argument("--batch", help="Questions file (JSONL or one per line); answers written as JSONL")
+    parser.add_argument("--out", default=None, help="JSONL output path for --batch (default: stdout)")
+    parser.add_argument("--board", default=None, help="Restrict the search to one board_id")
+    parser.add_argument("--rerank", action="store_true", help="Re-rank candidates with full-precision vectors")
+    parser.add_argument("--quantized", action="store_true", help="Pre-filter candidates on binary-quantized vectors")
+    parser.add_argument("--short", action="store_true", help="Two-stage: truncated-vector ANN, full-vector re-rank")
+    parser.add_argument("--hybrid", action="store_true", help="Fuse full-text/trigram and vector results (RRF)")
     args = parser.parse_args()
 
-    conn = connect()
-    out = answer_question(conn, args.ask)
-    pprint(out, width=110)
+    if args.batch:
+        items = load_questions(args.batch)
+        with pooled() as conn:
+            answers, stats = answer_questions(conn, items, board_id=args.board, rerank=args.rerank,
+                                              quantized=args.quantized, short=args.short, hybrid=args.hybrid)
+        sink = open(args.out, "w") if args.out else sys.stdout
+        try:
+            for answer in answers:
+                sink.write(json.dumps(answer, default=str) + "\n")
+        finally:
+            if args.out:
+                sink.close()
+        print(f"Answered {stats['questions']} questions ({stats['semantic']} semantic, "
+              f"{stats['embedded_texts']} embedded in {stats['embed_ms']:.0f} ms) "
+              f"in {stats['total_ms']:.0f} ms", file=sys.stderr)
+    else:
+        with pooled() as conn:
+            out = answer_question(conn, args.ask, board_id=args.board,
+                                  rerank=args.rerank, quantized=args.quantized, short=args.short,
+                                  hybrid=args.hybrid)
+        pprint(out, width=110)
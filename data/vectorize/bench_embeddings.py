@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+CPU throughput benchmark for EmbeddingGenerator (sentence-transformers path).
+
+Compares the old per-slice encode loop against the length-sorted single-pass encode across
+batch sizes, torch thread counts and output dtype, and reports texts/s. Texts come from the
+datasheet .txt files of --input-dir (chunked like the vectorizer), or are synthetic with
+varied lengths.
+
+With --backends, compares PyTorch against ONNX Runtime (fp32 / int8) instead: texts/s and
+cosine agreement of each backend's embeddings with the PyTorch ones.
+
+python bench_embeddings.py --batch-sizes 16 32 64 --threads 1 4
+python bench_embeddings.py --input-dir ../datasheets --texts 2000 --fp16
+python bench_embeddings.py --backends torch onnx onnx-int8 --threads 4
+"""
+
+import time
+import random
+import argparse
+import statistics
+from pathlib import Path
+from typing import List
+
+import numpy as np
+
+from embedding_generator import EmbeddingGenerator, TextChunker
+
+WORDS = ("voltage current supply regulator output input pin ground capacitor resistor "
+         "maximum minimum typical temperature frequency clock enable reset package "
+         "thermal shutdown dropout quiescent bandwidth noise offset gain").split()
+
+
+def synthetic_texts(n: int, seed: int = 0) -> List[str]:
+    """Datasheet-like texts from 5 to 400 words, skewed short like real chunks."""
+    rng = random.Random(seed)
+    return [" ".join(rng.choices(WORDS, k=min(400, 5 + int(rng.expovariate(1 / 80)))))
+            for _ in range(n)]
+
+
+def datasheet_texts(input_dir: str, n: int, chunk_size: int) -> List[str]:
+    chunker = TextChunker(chunk_size=chunk_size)
+    texts = []
+    for path in sorted(Path(input_dir).glob("*.txt")):
+        text = path.read_text(encoding="utf-8", errors="ignore")
+        texts.extend(chunk.text for chunk in chunker.semantic_chunking(text, {"source_file": path.name}))
+        if len(texts) >= n:
+            break
+    return texts[:n]
+
+
+def legacy_encode(model, texts: List[str], batch_size: int) -> np.ndarray:
+    """The previous implementation: one encode() per slice, then np.array over the rows."""
+    embeddings = []
+    for i in range(0, len(texts), batch_size):
+        embeddings.extend(model.encode(texts[i:i + batch_size], show_progress_bar=False))
+    return np.array(embeddings)
+
+
+def throughput(fn, n_texts: int, runs: int) -> float:
+    times = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return n_texts / statistics.median(times)
+
+
+def compare_backends(args, texts: List[str]):
+    """texts/s per backend and cosine agreement with the PyTorch embeddings."""
+    batch_size = args.batch_sizes[0]
+    threads = args.threads[0] or None
+    reference = None
+    print(f"{'backend':>10} {'texts/s':>9} {'speedup':>7} {'cos mean':>9} {'cos min':>8}")
+    for backend in ["torch"] + [b for b in args.backends if b != "torch"]:
+        model_name = args.model if backend == "torch" else f"{backend}:{args.model}"
+        embedder = EmbeddingGenerator(model_name=model_name, device="cpu", num_threads=threads,
+                                      onnx_quantization=args.onnx_quantization)
+        embedder.generate_embeddings(texts[:8])  # warm-up (and int8 export on first use)
+        rate = throughput(lambda: embedder.generate_embeddings(texts, batch_size), len(texts), args.runs)
+        # Unit-normalized, so the row-wise dot product is the cosine
+        emb = embedder.generate_embeddings(texts, batch_size).astype(np.float32)
+        if reference is None:
+            reference, base_rate = emb, rate
+        cos = np.einsum("ij,ij->i", emb, reference)
+        print(f"{backend:>10} {rate:9.1f} {rate / base_rate:6.2f}x {cos.mean():9.5f} {cos.min():8.5f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark embedding throughput on CPU")
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--input-dir", default=None, help="Datasheet .txt files (default: synthetic texts)")
+    parser.add_argument("--texts", type=int, default=1000)
+    parser.add_argument("--chunk-size", type=int, default=512)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[16, 32, 64, 128])
+    parser.add_argument("--threads", type=int, nargs="+", default=[0], help="Torch threads (0: torch default)")
+    parser.add_argument("--fp16", action="store_true", help="Also measure float16 output")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--skip-legacy", action="store_true")
+    parser.add_argument("--backends", nargs="+", default=None, choices=["torch", "onnx", "onnx-int8"],
+                        help="Compare backends (first --batch-sizes / --threads value) instead")
+    parser.add_argument("--onnx-quantization", default="avx2", choices=["avx2", "avx512", "avx512_vnni", "arm64"])
+    args = parser.parse_args()
+
+    texts = (datasheet_texts(args.input_dir, args.texts, args.chunk_size) if args.input_dir
+             else synthetic_texts(args.texts))
+    lengths = [len(t) for t in texts]
+    print(f"{len(texts)} texts, {statistics.mean(lengths):.0f} chars mean, {max(lengths)} max")
+    if args.backends:
+        compare_backends(args, texts)
+        return
+
+    dtypes = ["float32"] + (["float16"] if args.fp16 else [])
+    print(f"{'threads':>7} {'batch':>5} {'dtype':>7} {'legacy/s':>9} {'sorted/s':>9} {'speedup':>7}")
+    for threads in args.threads:
+        embedder = EmbeddingGenerator(model_name=args.model, device="cpu", num_threads=threads or None)
+        embedder.generate_embeddings(texts[:8])  # warm-up
+        for batch_size in args.batch_sizes:
+            legacy = None
+            if not args.skip_legacy:
+                legacy = throughput(lambda: legacy_encode(embedder.model, texts, batch_size),
+                                    len(texts), args.runs)
+            for dtype in dtypes:
+                embedder.dtype = np.dtype(dtype)
+                new = throughput(lambda: embedder.generate_embeddings(texts, batch_size),
+                                 len(texts), args.runs)
+                speedup = f"{new / legacy:6.2f}x" if legacy else "-"
+                legacy_col = f"{legacy:9.1f}" if legacy else f"{'-':>9}"
+                print(f"{threads or 'auto':>7} {batch_size:>5} {dtype:>7} {legacy_col} {new:9.1f} {speedup:>7}")
+            embedder.dtype = np.dtype("float32")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Pluggable embedding backends shared by ingest (data-ingest/ingest_vectors.py) and
+search (search/search_vector_schematics.py).
+
+Backends are selected by a spec string, per table:
+  openai:text-embedding-3-large    OpenAI API (default for nets / functional_groups)
+  openai:text-embedding-3-small    OpenAI API (default for components)
+  st:all-MiniLM-L6-v2              local sentence-transformers on CPU/GPU
+  onnx:all-MiniLM-L6-v2            local sentence-transformers, ONNX Runtime backend
+
+Local models are loaded once per process and reused by every caller, so ingest and
+search run with no external calls and predictable latency.
+"""
+
+import os
+import threading
+from abc import ABC, abstractmethod
+from importlib.util import find_spec
+from typing import Any, Dict, List, Optional
+
+# Availability is checked without importing: openai and especially sentence-transformers
+# (torch) are slow to import, so they load on first use of a backend that needs them.
+OPENAI_AVAILABLE = find_spec("openai") is not None
+SENTENCE_TRANSFORMERS_AVAILABLE = find_spec("sentence_transformers") is not None
+
+# Output dims of the OpenAI models we use (the API doesn't report them up front)
+OPENAI_MODEL_DIMS = {
+    "text-embedding-3-large": 3072,
+    "text-embedding-3-small": 1536,
+    "text-embedding-ada-002": 1536,
+}
+
+
+class EmbeddingBackend(ABC):
+    """Turns a batch of texts into vectors. Callers batch; backends may sub-batch."""
+
+    # Stable identifier; used as the embedding-cache key and in content hashes
+    name: str
+    # Max texts per embed() call the backend is happy with
+    max_batch: int = 2048
+
+    @property
+    @abstractmethod
+    def dims(self) -> int:
+        """Output dimension."""
+
+    @abstractmethod
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """Embed `texts`, returning plain list[float] vectors in input order."""
+
+
+class OpenAIBackend(EmbeddingBackend):
+    """OpenAI embeddings API; one request per embed() call."""
+
+    def __init__(self, model: str, client: Optional[Any] = None):
+        self.model = model
+        self.name = model  # bare model name keeps existing cache keys valid
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is None:
+            if not OPENAI_AVAILABLE:
+                raise RuntimeError("openai package not installed (pip install openai>=1.0.0)")
+            api_key = os.getenv("OPENAI_API_KEY")
+            if not api_key:
+                raise RuntimeError("OPENAI_API_KEY not set")
+            from openai import OpenAI
+            self._client = OpenAI(api_key=api_key)
+        return self._client
+
+    @property
+    def dims(self) -> int:
+        if self.model not in OPENAI_MODEL_DIMS:
+            raise ValueError(f"Unknown output dims for OpenAI model {self.model}")
+        return OPENAI_MODEL_DIMS[self.model]
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        resp = self.client.embeddings.create(model=self.model, input=texts)
+
+        vecs = []
+        # New SDK: resp.data = list[openai.types.Embedding]
+        for item in getattr(resp, "data", []):
+            vec = getattr(item, "embedding", None)
+            if vec is None:
+                # Legacy shape: dict-like
+                try:
+                    vec = item["embedding"]
+                except Exception:
+                    raise TypeError(f"Unexpected embedding payload item type: {type(item)}")
+
+            # Ensure it's a plain python list[float]
+            if hasattr(vec, "tolist"):
+                vec = vec.tolist()
+            vec = list(vec)
+
+            if not vec or not isinstance(vec[0], (int, float)):
+                raise TypeError(f"Embedding is not numeric list: {type(vec)} first={type(vec[0])}")
+            vecs.append(vec)
+
+        return vecs
+
+
+_MODELS: Dict[tuple, Any] = {}
+_MODELS_LOCK = threading.Lock()
+
+
+def load_sentence_transformer(model_name: str, backend: str = "torch", device: Optional[str] = None):
+    """Load a SentenceTransformer once per process (keyed by name/backend/device)."""
+    if not SENTENCE_TRANSFORMERS_AVAILABLE:
+        raise RuntimeError("sentence-transformers not installed (pip install sentence-transformers)")
+    key = (model_name, backend, device)
+    with _MODELS_LOCK:
+        if key not in _MODELS:
+            from sentence_transformers import SentenceTransformer
+            kwargs: Dict[str, Any] = {"device": device}
+            if backend != "torch":
+                # ONNX / OpenVINO backends need sentence-transformers >= 3.2
+                kwargs["backend"] = backend
+            _MODELS[key] = SentenceTransformer(model_name, **kwargs)
+        return _MODELS[key]
+
+
+class SentenceTransformerBackend(EmbeddingBackend):
+    """Local sentence-transformers model (PyTorch or ONNX Runtime), unit-normalized output."""
+
+    max_batch = 1024
+
+    def __init__(self, model_name: str, backend: str = "torch",
+                 device: Optional[str] = None, batch_size: int = 64):
+        self.model_name = model_name
+        self.backend = backend
+        self.device = device
+        self.batch_size = batch_size
+        prefix = "st" if backend == "torch" else backend
+        self.name = f"{prefix}:{model_name}"
+
+    @property
+    def model(self):
+        return load_sentence_transformer(self.model_name, self.backend, self.device)
+
+    @property
+    def dims(self) -> int:
+        return int(self.model.get_sentence_embedding_dimension())
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        arr = self.model.encode(
+            texts,
+            batch_size=self.batch_size,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            show_progress_bar=False,
+        )
+        return arr.astype("float32").tolist()
+
+
+_BACKENDS: Dict[str, EmbeddingBackend] = {}
+
+
+def register_backend(spec: str, backend: EmbeddingBackend) -> None:
+    """Make get_backend(spec) return `backend` (custom or stub backends, e.g. benchmarks)."""
+    _BACKENDS[spec] = backend
+
+
+def get_backend(spec: str, client: Optional[Any] = None) -> EmbeddingBackend:
+    """
+    Resolve a backend spec ("openai:<model>", "st:<model>", "onnx:<model>").
+    A bare model name is treated as OpenAI. Instances are cached per spec.
+    """
+    if spec in _BACKENDS:
+        return _BACKENDS[spec]
+    kind, _, model = spec.partition(":")
+    if not model:
+        kind, model = "openai", spec
+    if kind == "openai":
+        backend: EmbeddingBackend = OpenAIBackend(model, client=client)
+    elif kind in ("st", "sentence-transformers"):
+        backend = SentenceTransformerBackend(model)
+    elif kind in ("onnx", "openvino"):
+        backend = SentenceTransformerBackend(model, backend=kind)
+    else:
+        raise ValueError(f"Unknown embedding backend: {spec}")
+    _BACKENDS[spec] = backend
+    return backend
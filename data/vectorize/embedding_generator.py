@@ -11,381 +11,352 @@ This module provides functions to:
 """
 
 import argparse
+import hashlib
 import json
 import logging
-import re
-import uuid
-from datetime import datetime
+import multiprocessing
+import os
+import queue
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
 from pathlib import Path
-from typing import List, Dict, Any, Optional, Tuple, Union
-from dataclasses import dataclass, asdict
+from typing import TYPE_CHECKING, List, Dict, Any, Optional, Tuple, Union
 from abc import ABC, abstractmethod
 
 # Core dependencies
 import numpy as np
-import pandas as pd
 
-# Embedding models
-from sentence_transformers import SentenceTransformer
-import openai
-
-# Vector databases
-import chromadb
-from chromadb.config import Settings
+# Embedding models, vector DB and pandas are imported where used: chunking workers start
+# with a fresh interpreter (see batch_process_datasheets) and must not pay for torch / chromadb.
+from importlib.util import find_spec
+ONNXRUNTIME_AVAILABLE = find_spec("onnxruntime") is not None
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
 
 # Text processing
-import nltk
-from nltk.tokenize import sent_tokenize, word_tokenize
-import spacy
-
-# Download required NLTK data (run once)
-try:
-    nltk.download('punkt', quiet=True)
-    nltk.download('stopwords', quiet=True)
-except:
-    pass
+from text_chunker import TextChunk, TextChunker, chunk_datasheet, datasheet_metadata, init_chunk_worker
 
-@dataclass
-class TextChunk:
-    """Represents a chunk of text with metadata"""
-    id: str
-    text: str
-    chunk_type: str  # 'specifications', 'description', 'parameters', etc.
-    source_file: str
-    page_number: Optional[int] = None
-    section: Optional[str] = None
-    subsection: Optional[str] = None
-    component_name: Optional[str] = None
-    manufacturer: Optional[str] = None
-    chunk_index: int = 0
-    metadata: Dict[str, Any] = None
-    
-    def __post_init__(self):
-        if self.metadata is None:
-            self.metadata = {}
-        if not self.id:
-            self.id = str(uuid.uuid4())
-
-class TextChunker:
-    """Handles different strategies for chunking datasheet text"""
-    
-    def __init__(self, chunk_size: int = 512, overlap: int = 50):
-        self.chunk_size = chunk_size
-        self.overlap = overlap
-        self.setup_nlp()
-    
-    def setup_nlp(self):
-        """Setup NLP tools"""
-        try:
-            self.nlp = spacy.load("en_core_web_sm")
-        except OSError:
-            print("Warning: spaCy English model not found. Install with: python -m spacy download en_core_web_sm")
-            self.nlp = None
-    
-    def semantic_chunking(self, text: str, metadata: Dict[str, Any]) -> List[TextChunk]:
-        """
-        Chunk text based on semantic boundaries (sections, specifications, etc.)
-        Ideal for RAG applications
-        """
-        chunks = []
-        
-        # Split by common datasheet sections
-        section_patterns = [
-            r'(?i)(specifications?|spec)\s*:?\s*\n',
-            r'(?i)(electrical\s+characteristics?)\s*:?\s*\n',
-            r'(?i)(mechanical\s+data)\s*:?\s*\n',
-            r'(?i)(pin\s+configuration)\s*:?\s*\n',
-            r'(?i)(functional\s+description)\s*:?\s*\n',
-            r'(?i)(operating\s+conditions?)\s*:?\s*\n',
-            r'(?i)(absolute\s+maximum\s+ratings?)\s*:?\s*\n',
-            r'(?i)(package\s+information)\s*:?\s*\n',
-            r'(?i)(application\s+information)\s*:?\s*\n',
-            r'(?i)(typical\s+applications?)\s*:?\s*\n'
-        ]
-        
-        # Find section boundaries
-        sections = []
-        for i, pattern in enumerate(section_patterns):
-            matches = list(re.finditer(pattern, text))
-            for match in matches:
-                sections.append({
-                    'start': match.start(),
-                    'end': match.end(),
-                    'title': match.group(1),
-                    'type': self._classify_section_type(match.group(1))
-                })
-        
-        # Sort sections by position
-        sections.sort(key=lambda x: x['start'])
-        
-        # Create chunks from sections
-        for i, section in enumerate(sections):
-            # Determine section end
-            if i < len(sections) - 1:
-                section_end = sections[i + 1]['start']
-            else:
-                section_end = len(text)
-            
-            section_text = text[section['end']:section_end].strip()
-            
-            if len(section_text) > 50:  # Only create chunks for substantial content
-                # Further split long sections
-                if len(section_text) > self.chunk_size * 2:
-                    sub_chunks = self._split_long_text(section_text, self.chunk_size, self.overlap)
-                    for j, sub_chunk in enumerate(sub_chunks):
-                        chunk = TextChunk(
-                            id=f"{metadata.get('source_file', 'unknown')}_{section['type']}_{j}",
-                            text=sub_chunk,
-                            chunk_type=section['type'],
-                            source_file=metadata.get('source_file', ''),
-                            section=section['title'],
-                            chunk_index=j,
-                            metadata=metadata.copy()
-                        )
-                        chunks.append(chunk)
-                else:
-                    chunk = TextChunk(
-                        id=f"{metadata.get('source_file', 'unknown')}_{section['type']}",
-                        text=section_text,
-                        chunk_type=section['type'],
-                        source_file=metadata.get('source_file', ''),
-                        section=section['title'],
-                        metadata=metadata.copy()
-                    )
-                    chunks.append(chunk)
-        
-        # Handle text before first section
-        if sections:
-            intro_text = text[:sections[0]['start']].strip()
-            if len(intro_text) > 100:
-                chunk = TextChunk(
-                    id=f"{metadata.get('source_file', 'unknown')}_intro",
-                    text=intro_text,
-                    chunk_type='description',
-                    source_file=metadata.get('source_file', ''),
-                    section='Introduction',
-                    metadata=metadata.copy()
-                )
-                chunks.append(chunk)
-        
-        return chunks
-    
-    def sliding_window_chunking(self, text: str, metadata: Dict[str, Any]) -> List[TextChunk]:
-        """
-        Create overlapping chunks using sliding window approach
-        Good for training data generation
-        """
-        chunks = []
-        words = word_tokenize(text)
-        
-        for i in range(0, len(words), self.chunk_size - self.overlap):
-            chunk_words = words[i:i + self.chunk_size]
-            chunk_text = ' '.join(chunk_words)
-            
-            if len(chunk_text.strip()) > 50:  # Skip very short chunks
-                chunk = TextChunk(
-                    id=f"{metadata.get('source_file', 'unknown')}_slide_{i}",
-                    text=chunk_text,
-                    chunk_type='sliding_window',
-                    source_file=metadata.get('source_file', ''),
-                    chunk_index=i // (self.chunk_size - self.overlap),
-                    metadata=metadata.copy()
-                )
-                chunks.append(chunk)
-        
-        return chunks
+class EmbeddingDiskCache:
+    """
+    On-disk embedding cache (SQLite), keyed by model + SHA-256 of the text.
+    Re-running over the same datasheets only embeds new or changed chunks.
+    """
     
-    def sentence_boundary_chunking(self, text: str, metadata: Dict[str, Any]) -> List[TextChunk]:
-        """
-        Chunk text respecting sentence boundaries
-        Best for maintaining context integrity
-        """
-        chunks = []
-        sentences = sent_tokenize(text)
-        
-        current_chunk = []
-        current_length = 0
-        chunk_index = 0
-        
-        for sentence in sentences:
-            sentence_length = len(word_tokenize(sentence))
-            
-            if current_length + sentence_length > self.chunk_size and current_chunk:
-                # Create chunk from current sentences
-                chunk_text = ' '.join(current_chunk)
-                chunk = TextChunk(
-                    id=f"{metadata.get('source_file', 'unknown')}_sent_{chunk_index}",
-                    text=chunk_text,
-                    chunk_type='sentence_boundary',
-                    source_file=metadata.get('source_file', ''),
-                    chunk_index=chunk_index,
-                    metadata=metadata.copy()
-                )
-                chunks.append(chunk)
-                
-                # Start new chunk with overlap
-                if self.overlap > 0 and len(current_chunk) > 1:
-                    # Keep last few sentences for overlap
-                    overlap_sentences = current_chunk[-2:]
-                    current_chunk = overlap_sentences + [sentence]
-                    current_length = sum(len(word_tokenize(s)) for s in current_chunk)
-                else:
-                    current_chunk = [sentence]
-                    current_length = sentence_length
-                
-                chunk_index += 1
-            else:
-                current_chunk.append(sentence)
-                current_length += sentence_length
-        
-        # Handle remaining sentences
-        if current_chunk:
-            chunk_text = ' '.join(current_chunk)
-            chunk = TextChunk(
-                id=f"{metadata.get('source_file', 'unknown')}_sent_{chunk_index}",
-                text=chunk_text,
-                chunk_type='sentence_boundary',
-                source_file=metadata.get('source_file', ''),
-                chunk_index=chunk_index,
-                metadata=metadata.copy()
+    def __init__(self, path: Union[str, Path]):
+        self.path = str(path)
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                embedding BLOB NOT NULL,
+                PRIMARY KEY (model, text_hash)
             )
-            chunks.append(chunk)
-        
-        return chunks
-    
-    def parameter_extraction_chunking(self, text: str, metadata: Dict[str, Any]) -> List[TextChunk]:
-        """
-        Extract and chunk parameter-specific information
-        Optimized for technical specifications
-        """
-        chunks = []
-        
-        # Patterns for extracting parameters
-        parameter_patterns = [
-            # Voltage patterns
-            r'(?i)(voltage|vcc|vdd|supply)\s*[:\-=]\s*([0-9.]+\s*[mv]?v?)',
-            # Current patterns  
-            r'(?i)(current|icc|idd)\s*[:\-=]\s*([0-9.]+\s*[μmuna]?a)',
-            # Temperature patterns
-            r'(?i)(temperature|temp)\s*[:\-=]\s*([-0-9.]+\s*[°]?c)',
-            # Frequency patterns
-            r'(?i)(frequency|freq|clock)\s*[:\-=]\s*([0-9.]+\s*[kmg]?hz)',
-            # Dimension patterns
-            r'(?i)(size|dimension|width|height|length)\s*[:\-=]\s*([0-9.]+\s*[μmcin]+)',
-            # Package patterns
-            r'(?i)(package|housing)\s*[:\-=]\s*([a-z0-9\-]+)',
-        ]
-        
-        # Extract parameter sections
-        parameters = []
-        for pattern in parameter_patterns:
-            matches = re.finditer(pattern, text, re.MULTILINE)
-            for match in matches:
-                param_context = self._extract_context(text, match.start(), match.end())
-                parameters.append({
-                    'type': match.group(1).lower(),
-                    'value': match.group(2),
-                    'context': param_context,
-                    'position': match.start()
-                })
-        
-        # Group related parameters
-        for i, param in enumerate(parameters):
-            chunk = TextChunk(
-                id=f"{metadata.get('source_file', 'unknown')}_param_{i}",
-                text=param['context'],
-                chunk_type='parameter',
-                source_file=metadata.get('source_file', ''),
-                subsection=param['type'],
-                metadata={**metadata, 'parameter_type': param['type'], 'parameter_value': param['value']}
+        """)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    @staticmethod
+    def text_hash(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+    
+    def get_many(self, model: str, hashes: List[str]) -> Dict[str, np.ndarray]:
+        found = {}
+        with self.lock:
+            # Stay under SQLite's bound-parameter limit
+            for i in range(0, len(hashes), 500):
+                part = hashes[i:i + 500]
+                rows = self.conn.execute(
+                    f"SELECT text_hash, embedding FROM embeddings WHERE model = ? "
+                    f"AND text_hash IN ({','.join('?' * len(part))})",
+                    [model, *part],
+                ).fetchall()
+                found.update((h, np.frombuffer(blob, dtype=np.float32)) for h, blob in rows)
+            self.hits += len(found)
+            self.misses += len(hashes) - len(found)
+        return found
+    
+    def put_many(self, model: str, items: Dict[str, np.ndarray]):
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, embedding) VALUES (?, ?, ?)",
+                [(model, h, np.asarray(v, dtype=np.float32).tobytes()) for h, v in items.items()],
             )
-            chunks.append(chunk)
-        
-        return chunks
-    
-    def _classify_section_type(self, section_title: str) -> str:
-        """Classify section type based on title"""
-        section_title = section_title.lower()
-        
-        if any(word in section_title for word in ['spec', 'electrical', 'parameter']):
-            return 'specifications'
-        elif any(word in section_title for word in ['mechanical', 'package', 'dimension']):
-            return 'mechanical'
-        elif any(word in section_title for word in ['pin', 'connection']):
-            return 'pinout'
-        elif any(word in section_title for word in ['functional', 'operation', 'description']):
-            return 'description'
-        elif any(word in section_title for word in ['application', 'typical', 'example']):
-            return 'application'
-        else:
-            return 'general'
-    
-    def _split_long_text(self, text: str, max_size: int, overlap: int) -> List[str]:
-        """Split long text into smaller chunks"""
-        words = word_tokenize(text)
-        chunks = []
-        
-        for i in range(0, len(words), max_size - overlap):
-            chunk_words = words[i:i + max_size]
-            chunks.append(' '.join(chunk_words))
-        
-        return chunks
     
-    def _extract_context(self, text: str, start: int, end: int, context_size: int = 200) -> str:
-        """Extract context around a match"""
-        context_start = max(0, start - context_size)
-        context_end = min(len(text), end + context_size)
-        return text[context_start:context_end]
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        return {"hits": hits, "misses": misses,
+                "hit_rate": round(hits / total, 4) if total else 0.0}
 
 class EmbeddingGenerator:
     """Generates embeddings using various models"""
     
-    def __init__(self, model_name: str = "all-MiniLM-L6-v2", openai_api_key: Optional[str] = None):
+    # Batches per encode() call; bounds peak memory on large corpora
+    ENCODE_CHUNK_BATCHES = 64
+    
+    # OpenAI: model for a bare "openai" model name, and per-request limits
+    DEFAULT_OPENAI_MODEL = "text-embedding-ada-002"
+    OPENAI_MAX_INPUTS = 2048
+    OPENAI_MAX_REQUEST_TOKENS = 300_000
+    OPENAI_MAX_INPUT_TOKENS = 8191
+    CHARS_PER_TOKEN = 4  # rough estimate for English datasheet text
+    
+    # "onnx:<model>" runs the model on ONNX Runtime, "onnx-int8:<model>" dynamically
+    # quantized to int8 (exported once, then loaded from onnx_dir)
+    ONNX_PREFIXES = ("onnx:", "onnx-int8:")
+    
+    def __init__(self, model_name: str = "all-MiniLM-L6-v2", openai_api_key: Optional[str] = None,
+                 batch_size: int = 32,
+                 device: Optional[str] = None,
+                 normalize: bool = True,
+                 dtype: str = "float32",
+                 num_threads: Optional[int] = None,
+                 openai_dimensions: Optional[int] = None,
+                 openai_batch_size: int = 512,
+                 concurrency: int = 4,
+                 max_retries: int = 6,
+                 cache_path: Optional[Union[str, Path]] = None,
+                 onnx_quantization: str = "avx2",
+                 onnx_dir: Union[str, Path] = "./onnx_models"):
+        """
+        model_name:        sentence-transformers model, or "openai[:<model>]"
+        batch_size:        texts per forward pass (sentence-transformers)
+        device:            "cpu", "cuda", ... (default: sentence-transformers' choice)
+        normalize:         unit-length embeddings (cosine == dot product)
+        dtype:             "float32" or "float16" output array
+        num_threads:       torch intra-op threads for CPU inference (default: torch's choice)
+        openai_dimensions: shortened output size (text-embedding-3-* only)
+        openai_batch_size: max texts per OpenAI request
+        concurrency:       OpenAI requests in flight
+        max_retries:       retries per request on rate limits / transient errors
+        cache_path:        SQLite file caching embeddings across runs (default: no cache)
+        onnx_quantization: int8 config for onnx-int8: "avx2", "avx512", "avx512_vnni" or "arm64"
+        onnx_dir:          where quantized ONNX exports are kept
+        """
+        if np.dtype(dtype) not in (np.float32, np.float16):
+            raise ValueError(f"dtype must be float32 or float16, not {dtype}")
         self.model_name = model_name
         self.openai_api_key = openai_api_key
+        self.batch_size = batch_size
+        self.device = device
+        self.normalize = normalize
+        self.dtype = np.dtype(dtype)
+        self.num_threads = num_threads
+        self.openai_model = model_name.partition(":")[2] or self.DEFAULT_OPENAI_MODEL
+        self.openai_dimensions = openai_dimensions
+        self.openai_batch_size = max(1, min(openai_batch_size, self.OPENAI_MAX_INPUTS))
+        self.concurrency = max(1, concurrency)
+        self.max_retries = max_retries
+        self.cache = EmbeddingDiskCache(cache_path) if cache_path else None
+        self.onnx_quantization = onnx_quantization
+        self.onnx_dir = Path(onnx_dir)
+        self.logger = logging.getLogger('datasheet_vectorizer')
         self.model = None
+        self.client = None
         self._setup_model()
     
+    @property
+    def is_openai(self) -> bool:
+        return self.model_name.startswith("openai")
+    
+    @property
+    def onnx_mode(self) -> Optional[str]:
+        """"onnx" / "onnx-int8" for ONNX Runtime models, else None."""
+        for prefix in self.ONNX_PREFIXES:
+            if self.model_name.startswith(prefix):
+                return prefix[:-1]
+        return None
+
+    def inference_threads(self) -> int:
+        """CPU threads one encode call keeps busy (0 when inference runs elsewhere)."""
+        if self.is_openai or (self.model is not None and self.model.device.type != "cpu"):
+            return 0
+        if self.num_threads:
+            return self.num_threads
+        if self.onnx_mode:
+            return os.cpu_count() or 1  # ONNX Runtime's default
+        import torch
+        return torch.get_num_threads()
+
+    @property
+    def cache_model_key(self) -> str:
+        """Cache key for the model; embeddings differ per model, backend and output format."""
+        if self.is_openai:
+            dims = f"@{self.openai_dimensions}" if self.openai_dimensions else ""
+            return f"openai:{self.openai_model}{dims}"
+        backend = self.onnx_mode or "torch"
+        if backend == "onnx-int8":
+            backend = f"{backend}-{self.onnx_quantization}"
+        base_model = self.model_name.partition(":")[2] if self.onnx_mode else self.model_name
+        return f"st:{backend}:{base_model}:{'norm' if self.normalize else 'raw'}:{self.dtype.name}"
+    
     def _setup_model(self):
         """Initialize the embedding model"""
-        if self.model_name.startswith("openai"):
+        if self.is_openai:
             if not self.openai_api_key:
                 raise ValueError("OpenAI API key required for OpenAI models")
-            openai.api_key = self.openai_api_key
+            # Retries are ours (with backoff across the worker pool), not the SDK's
+            import openai
+            self.client = openai.OpenAI(api_key=self.openai_api_key, max_retries=0)
+        elif self.onnx_mode:
+            self.model = self._load_onnx_model()
         else:
             # Use sentence-transformers
-            self.model = SentenceTransformer(self.model_name)
+            if self.num_threads:
+                import torch
+                torch.set_num_threads(self.num_threads)
+            from sentence_transformers import SentenceTransformer
+            self.model = SentenceTransformer(self.model_name, device=self.device)
     
-    def generate_embeddings(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+    def _load_onnx_model(self) -> "SentenceTransformer":
+        """
+        Same sentence-transformers model on ONNX Runtime (CPU). For onnx-int8 the exported
+        model is dynamically quantized once and saved under onnx_dir.
+        """
+        if not ONNXRUNTIME_AVAILABLE:
+            raise RuntimeError("onnxruntime not installed (pip install sentence-transformers[onnx])")
+        from sentence_transformers import SentenceTransformer
+        base_model = self.model_name.partition(":")[2]
+        model_kwargs: Dict[str, Any] = {"provider": "CPUExecutionProvider"}
+        if self.num_threads:
+            import onnxruntime
+            session_options = onnxruntime.SessionOptions()
+            session_options.intra_op_num_threads = self.num_threads
+            model_kwargs["session_options"] = session_options
+        
+        if self.onnx_mode == "onnx":
+            return SentenceTransformer(base_model, backend="onnx", device="cpu", model_kwargs=model_kwargs)
+        
+        local_dir = self.onnx_dir / base_model.replace("/", "__")
+        # Explicit suffix: sentence-transformers otherwise names the file after the config's
+        # weights dtype (model_quint8_avx2.onnx for "avx2")
+        file_suffix = f"qint8_{self.onnx_quantization}"
+        file_name = f"onnx/model_{file_suffix}.onnx"
+        if not (local_dir / file_name).exists():
+            from sentence_transformers import export_dynamic_quantized_onnx_model
+            exported = SentenceTransformer(base_model, backend="onnx", device="cpu")
+            exported.save(str(local_dir))
+            export_dynamic_quantized_onnx_model(exported, self.onnx_quantization, str(local_dir),
+                                                file_suffix=file_suffix)
+        model_kwargs["file_name"] = file_name
+        return SentenceTransformer(str(local_dir), backend="onnx", device="cpu", model_kwargs=model_kwargs)
+    
+    def generate_embeddings(self, texts: List[str], batch_size: Optional[int] = None) -> np.ndarray:
         """Generate embeddings for a list of texts"""
-        if self.model_name.startswith("openai"):
+        if not self.cache or not texts:
+            return self._generate_uncached(texts, batch_size)
+        
+        # Embed each distinct, uncached text once
+        model = self.cache_model_key
+        hashes = [self.cache.text_hash(t) for t in texts]
+        unique = dict(zip(hashes, texts))
+        known = self.cache.get_many(model, list(unique))
+        pending = [h for h in unique if h not in known]
+        if pending:
+            fresh = self._generate_uncached([unique[h] for h in pending], batch_size)
+            fresh_by_hash = dict(zip(pending, fresh))
+            self.cache.put_many(model, fresh_by_hash)
+            known.update(fresh_by_hash)
+        
+        return np.stack([known[h] for h in hashes]).astype(self.dtype, copy=False)
+    
+    def _generate_uncached(self, texts: List[str], batch_size: Optional[int] = None) -> np.ndarray:
+        if self.is_openai:
             return self._generate_openai_embeddings(texts)
         else:
-            return self._generate_sentence_transformer_embeddings(texts, batch_size)
+            return self._generate_sentence_transformer_embeddings(texts, batch_size or self.batch_size)
     
     def _generate_sentence_transformer_embeddings(self, texts: List[str], batch_size: int) -> np.ndarray:
-        """Generate embeddings using sentence-transformers"""
-        embeddings = []
-        
-        for i in range(0, len(texts), batch_size):
-            batch = texts[i:i + batch_size]
-            batch_embeddings = self.model.encode(batch, show_progress_bar=True)
-            embeddings.extend(batch_embeddings)
+        """
+        Generate embeddings using sentence-transformers.
+        Texts are encoded longest first, so each batch pads to similar lengths, and written
+        straight into a preallocated (len(texts), dims) array in input order.
+        """
+        dims = self.model.get_sentence_embedding_dimension() or 0
+        out = np.empty((len(texts), dims), dtype=self.dtype)
+        order = np.argsort([-len(t) for t in texts], kind="stable")
+        chunk = batch_size * self.ENCODE_CHUNK_BATCHES
+        
+        for lo in range(0, len(texts), chunk):
+            idx = order[lo:lo + chunk]
+            batch_embeddings = self.model.encode(
+                [texts[i] for i in idx],
+                batch_size=batch_size,
+                convert_to_numpy=True,
+                normalize_embeddings=self.normalize,
+                show_progress_bar=False,
+            )
+            if out.shape[1] != batch_embeddings.shape[1]:
+                # Model didn't report its dimension up front
+                out = np.empty((len(texts), batch_embeddings.shape[1]), dtype=self.dtype)
+            out[idx] = batch_embeddings
         
-        return np.array(embeddings)
+        return out
+    
+    def _openai_batches(self, texts: List[str]) -> List[List[int]]:
+        """
+        Pack text indices into requests within the per-request input and (estimated)
+        token limits. A single text over the limit gets a request of its own.
+        """
+        batches, current, current_tokens = [], [], 0
+        for i, text in enumerate(texts):
+            n = min(len(text) // self.CHARS_PER_TOKEN + 1, self.OPENAI_MAX_INPUT_TOKENS)
+            if current and (current_tokens + n > self.OPENAI_MAX_REQUEST_TOKENS
+                            or len(current) >= self.openai_batch_size):
+                batches.append(current)
+                current, current_tokens = [], 0
+            current.append(i)
+            current_tokens += n
+        if current:
+            batches.append(current)
+        return batches
+    
+    def _openai_request(self, batch: List[str]) -> List[List[float]]:
+        """One embeddings request, retried with exponential backoff on transient errors."""
+        import openai
+        kwargs: Dict[str, Any] = {"model": self.openai_model, "input": batch}
+        if self.openai_dimensions:
+            kwargs["dimensions"] = self.openai_dimensions
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.client.embeddings.create(**kwargs)
+                # Items carry their input index; don't rely on response order
+                return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+            except (openai.RateLimitError, openai.APIConnectionError,
+                    openai.APITimeoutError, openai.InternalServerError) as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = min(60.0, 2 ** attempt) + random.uniform(0, 1)
+                self.logger.warning(f"OpenAI embeddings request failed ({e.__class__.__name__}), "
+                                    f"retrying in {delay:.1f}s")
+                time.sleep(delay)
     
     def _generate_openai_embeddings(self, texts: List[str]) -> np.ndarray:
-        """Generate embeddings using OpenAI API"""
-        embeddings = []
+        """
+        Generate embeddings using OpenAI API: many texts per request, up to
+        `concurrency` requests in flight, results in input order.
+        """
+        batches = self._openai_batches(texts)
+        out = None
         
-        for text in texts:
-            response = openai.Embedding.create(
-                input=text,
-                model="text-embedding-ada-002"
-            )
-            embeddings.append(response['data'][0]['embedding'])
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            results = pool.map(lambda batch: self._openai_request([texts[i] for i in batch]), batches)
+            for batch, vectors in zip(batches, results):
+                vectors = np.asarray(vectors, dtype=np.float32)
+                if out is None:
+                    out = np.empty((len(texts), vectors.shape[1]), dtype=self.dtype)
+                out[batch] = vectors
         
-        return np.array(embeddings)
+        if out is None:
+            out = np.empty((0, self.openai_dimensions or 0), dtype=self.dtype)
+        return out
 
 class VectorDatabase(ABC):
     """Abstract base class for vector databases"""
@@ -410,6 +381,7 @@ class ChromaDBDatabase(VectorDatabase):
     
     def __init__(self, collection_name: str = "datasheets", persist_directory: str = "./chroma_db"):
         self.collection_name = collection_name
+        import chromadb
         self.client = chromadb.PersistentClient(path=persist_directory)
         
         # Create or get collection
@@ -500,16 +472,7 @@ class DatasheetVectorizer:
         
         self.logger.info(f"Processing datasheet: {metadata.get('source_file', 'unknown')}")
         
-        if chunking_strategy == "semantic":
-            chunks = self.chunker.semantic_chunking(text, metadata)
-        elif chunking_strategy == "sliding_window":
-            chunks = self.chunker.sliding_window_chunking(text, metadata)
-        elif chunking_strategy == "sentence_boundary":
-            chunks = self.chunker.sentence_boundary_chunking(text, metadata)
-        elif chunking_strategy == "parameter_extraction":
-            chunks = self.chunker.parameter_extraction_chunking(text, metadata)
-        else:
-            raise ValueError(f"Unknown chunking strategy: {chunking_strategy}")
+        chunks = self.chunker.chunk(text, metadata, chunking_strategy)
         
         self.logger.info(f"Created {len(chunks)} chunks using {chunking_strategy} strategy")
         return chunks
@@ -586,6 +549,7 @@ def prepare_training_data(chunks: List[TextChunk],
                 'section': chunk.section or '',
                 'metadata_json': json.dumps(chunk.metadata)
             })
+        import pandas as pd
         return pd.DataFrame(df_data)
     
     elif output_format == "pairs":
@@ -621,14 +585,29 @@ def create_rag_dataset(vector_db: VectorDatabase,
 
 def batch_process_datasheets(datasheet_dir: Path, 
                            vectorizer: DatasheetVectorizer,
-                           chunking_strategy: str = "semantic") -> Dict[str, List[TextChunk]]:
+                           chunking_strategy: str = "semantic",
+                           chunk_workers: Optional[int] = None,
+                           embed_workers: int = 1,
+                           queue_size: int = 64,
+                           embed_batch: int = 1024,
+                           write_batch: int = 2048) -> Dict[str, List[TextChunk]]:
     """
     Process multiple datasheet text files in batch
     
+    Pipelined: a process pool chunks files, a bounded queue feeds embedding threads that
+    share the vectorizer's one model (coalescing small files into larger encode calls),
+    and a single writer batches inserts into the vector DB. Chunking, inference and
+    storage overlap, and the queue bounds memory when chunking outpaces embedding.
+    
     Args:
         datasheet_dir: Directory containing extracted text files
         vectorizer: Configured DatasheetVectorizer instance
         chunking_strategy: Strategy to use for chunking
+        chunk_workers: Chunking processes (default: CPUs not used for inference; 0: serial)
+        embed_workers: Embedding threads sharing the model
+        queue_size: Chunked files waiting for embedding (and chunking tasks in flight)
+        embed_batch: Target texts per embedding call
+        write_batch: Chunks per vector DB insert
     
     Returns:
         Dictionary mapping filenames to their chunks
@@ -636,25 +615,128 @@ def batch_process_datasheets(datasheet_dir: Path,
     
     results = {}
     text_files = list(datasheet_dir.glob("*.txt"))
-    
-    for text_file in text_files:
-        try:
-            with open(text_file, 'r', encoding='utf-8') as f:
-                text = f.read()
-            
-            metadata = {
-                'source_file': text_file.name,
-                'file_path': str(text_file),
-                'processing_date': datetime.now().isoformat()
-            }
-            
-            chunks = vectorizer.process_and_store(text, metadata, chunking_strategy)
-            results[text_file.name] = chunks
-            
-        except Exception as e:
-            vectorizer.logger.error(f"Error processing {text_file}: {e}")
-            continue
-    
+    logger = vectorizer.logger
+    
+    if chunk_workers is None:
+        cpus = os.cpu_count() or 1
+        embedder = vectorizer.embedder
+        if embedder.inference_threads() and not embedder.num_threads and not embedder.onnx_mode:
+            # torch defaults to every core; leave half of them to the chunking processes
+            import torch
+            torch.set_num_threads(max(1, cpus // (2 * embed_workers)))
+        chunk_workers = max(1, cpus - embedder.inference_threads() * embed_workers)
+    if chunk_workers == 0:
+        for text_file in text_files:
+            try:
+                with open(text_file, 'r', encoding='utf-8') as f:
+                    text = f.read()
+                chunks = vectorizer.process_and_store(text, datasheet_metadata(text_file), chunking_strategy)
+                results[text_file.name] = chunks
+            except Exception as e:
+                logger.error(f"Error processing {text_file}: {e}")
+                continue
+        return results
+    
+    done = object()  # end-of-stream sentinel
+    embed_q: "queue.Queue" = queue.Queue(maxsize=queue_size)
+    write_q: "queue.Queue" = queue.Queue(maxsize=max(2, embed_workers * 2))
+    
+    def embed_loop():
+        finished = False
+        while not finished:
+            # Coalesce queued files into one encode call of up to embed_batch texts
+            files = [embed_q.get()]
+            if files[0] is done:
+                break
+            n_texts = len(files[0][1])
+            while n_texts < embed_batch:
+                try:
+                    item = embed_q.get_nowait()
+                except queue.Empty:
+                    break
+                if item is done:
+                    finished = True
+                    break
+                files.append(item)
+                n_texts += len(item[1])
+            chunks = [chunk for _, file_chunks in files for chunk in file_chunks]
+            try:
+                embeddings = vectorizer.embedder.generate_embeddings([chunk.text for chunk in chunks])
+            except Exception as e:
+                logger.error(f"Error embedding {', '.join(name for name, _ in files)}: {e}")
+                continue
+            write_q.put((files, embeddings))
+    
+    def write_loop():
+        pending: List[Tuple[List[Tuple[str, List[TextChunk]]], np.ndarray]] = []
+        n_pending = 0
+        
+        def flush():
+            files = [f for batch_files, _ in pending for f in batch_files]
+            try:
+                vectorizer.store_vectors([c for _, file_chunks in files for c in file_chunks],
+                                         np.concatenate([emb for _, emb in pending]))
+                results.update(files)
+            except Exception as e:
+                logger.error(f"Error storing {', '.join(name for name, _ in files)}: {e}")
+        
+        while True:
+            item = write_q.get()
+            if item is done:
+                break
+            pending.append(item)
+            n_pending += len(item[1])
+            if n_pending >= write_batch:
+                flush()
+                pending, n_pending = [], 0
+        if pending:
+            flush()
+    
+    # Chunking workers must not be forked from this process once the embedding threads and
+    # torch's thread pools are running (a fork can inherit their locks held), so they come
+    # from a fork server, or are spawned where there is none, and the pool exists first.
+    start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    chunker = vectorizer.chunker
+    pool = ProcessPoolExecutor(max_workers=chunk_workers, mp_context=multiprocessing.get_context(start_method),
+                               initializer=init_chunk_worker, initargs=(chunker.chunk_size, chunker.overlap))
+    
+    embedders = [threading.Thread(target=embed_loop, name=f"embed-{i}", daemon=True) for i in range(embed_workers)]
+    writer = threading.Thread(target=write_loop, name="writer", daemon=True)
+    for t in embedders + [writer]:
+        t.start()
+    
+    logger.info(f"Processing {len(text_files)} datasheets: {chunk_workers} chunking processes, "
+                f"{embed_workers} embedding thread(s)")
+    with pool:
+        files = iter(text_files)
+        in_flight = {}
+        while True:
+            # Keep at most queue_size chunking tasks outstanding
+            for text_file in files:
+                in_flight[pool.submit(chunk_datasheet, text_file, chunking_strategy)] = text_file
+                if len(in_flight) >= queue_size:
+                    break
+            if not in_flight:
+                break
+            finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                text_file = in_flight.pop(future)
+                try:
+                    chunks = future.result()
+                except Exception as e:
+                    logger.error(f"Error processing {text_file}: {e}")
+                    continue
+                if chunks:
+                    embed_q.put((text_file.name, chunks))  # blocks while embedding is behind
+                else:
+                    results[text_file.name] = chunks
+    
+    for _ in embedders:
+        embed_q.put(done)
+    for t in embedders:
+        t.join()
+    write_q.put(done)
+    writer.join()
     return results
 
 def main():
@@ -662,21 +744,45 @@ def main():
     parser = argparse.ArgumentParser(description="Vectorize datasheet text")
     parser.add_argument("--input-dir", type=Path, required=True, help="Directory with extracted text files")
     parser.add_argument("--output-dir", type=Path, default=Path("./vectors"), help="Output directory for vector DB")
-    parser.add_argument("--model", default="all-MiniLM-L6-v2", help="Embedding model to use")
+    parser.add_argument("--model", default="all-MiniLM-L6-v2", help="Embedding model: sentence-transformers name, onnx:<name>, onnx-int8:<name> or openai[:<model>]")
+    parser.add_argument("--chunk-workers", type=int, default=None, help="Chunking processes (default: CPUs - embed workers; 0: serial)")
+    parser.add_argument("--embed-workers", type=int, default=1, help="Embedding threads sharing the model")
+    parser.add_argument("--onnx-quantization", default="avx2", choices=["avx2", "avx512", "avx512_vnni", "arm64"],
+                        help="int8 quantization config for onnx-int8 models")
     parser.add_argument("--chunk-strategy", default="semantic", choices=["semantic", "sliding_window", "sentence_boundary", "parameter_extraction"])
     parser.add_argument("--chunk-size", type=int, default=512, help="Chunk size in tokens")
     parser.add_argument("--batch-size", type=int, default=32, help="Batch size for embedding generation")
+    parser.add_argument("--device", default=None, help="Device for sentence-transformers (cpu, cuda, ...)")
+    parser.add_argument("--threads", type=int, default=None, help="Torch CPU threads")
+    parser.add_argument("--fp16", action="store_true", help="Keep embeddings as float16")
+    parser.add_argument("--no-normalize", action="store_true", help="Don't L2-normalize embeddings")
+    parser.add_argument("--openai-dimensions", type=int, default=None, help="Shortened OpenAI output size (text-embedding-3-*)")
+    parser.add_argument("--concurrency", type=int, default=4, help="OpenAI requests in flight")
+    parser.add_argument("--embedding-cache", type=Path, default=None, help="SQLite file caching embeddings across runs")
     
     args = parser.parse_args()
     
     # Setup components
     chunker = TextChunker(chunk_size=args.chunk_size)
-    embedder = EmbeddingGenerator(model_name=args.model)
+    embedder = EmbeddingGenerator(model_name=args.model,
+                                  openai_api_key=os.getenv("OPENAI_API_KEY"),
+                                  batch_size=args.batch_size,
+                                  device=args.device,
+                                  normalize=not args.no_normalize,
+                                  dtype="float16" if args.fp16 else "float32",
+                                  num_threads=args.threads,
+                                  openai_dimensions=args.openai_dimensions,
+                                  concurrency=args.concurrency,
+                                  cache_path=args.embedding_cache,
+                                  onnx_quantization=args.onnx_quantization,
+                                  onnx_dir=args.output_dir / "onnx_models")
     vector_db = ChromaDBDatabase(persist_directory=str(args.output_dir))
     vectorizer = DatasheetVectorizer(chunker, embedder, vector_db)
     
     # Process datasheets
-    results = batch_process_datasheets(args.input_dir, vectorizer, args.chunk_strategy)
+    results = batch_process_datasheets(args.input_dir, vectorizer, args.chunk_strategy,
+                                       chunk_workers=args.chunk_workers,
+                                       embed_workers=args.embed_workers)
     
     # Generate training data
     all_chunks = []
@@ -693,6 +799,8 @@ def main():
     training_csv.to_csv(args.output_dir / "training_data.csv", index=False)
     
     print(f"Processed {len(all_chunks)} chunks from {len(results)} datasheets")
+    if embedder.cache:
+        print(f"Embedding cache: {embedder.cache.stats()}")
     print(f"Vector database and training data saved to {args.output_dir}")
 
 if __name__ == "__main__":
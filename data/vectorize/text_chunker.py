@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+"""
+Datasheet text chunking, split from embedding_generator.py so it can run without the
+embedding / vector DB stack: the chunking processes of batch_process_datasheets import
+only this module (re / nltk; spaCy on first use of TextChunker.nlp), not torch or chromadb.
+"""
+
+import re
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import nltk
+from nltk.tokenize import sent_tokenize, word_tokenize
+
+NLTK_RESOURCES = (("tokenizers/punkt", "punkt"), ("corpora/stopwords", "stopwords"))
+_NLTK_CHECKED = False
+
+def ensure_nltk_data():
+    """Download the NLTK data we use if it is missing (a local lookup when present)"""
+    global _NLTK_CHECKED
+    if _NLTK_CHECKED:
+        return
+    for resource, package in NLTK_RESOURCES:
+        try:
+            nltk.data.find(resource)
+        except LookupError:
+            try:
+                nltk.download(package, quiet=True)
+            except Exception:
+                pass
+    _NLTK_CHECKED = True
+
+@dataclass
+class TextChunk:
+    """Represents a chunk of text with metadata"""
+    id: str
+    text: str
+    chunk_type: str  # 'specifications', 'description', 'parameters', etc.
+    source_file: str
+    page_number: Optional[int] = None
+    section: Optional[str] = None
+    subsection: Optional[str] = None
+    component_name: Optional[str] = None
+    manufacturer: Optional[str] = None
+    chunk_index: int = 0
+    metadata: Dict[str, Any] = None
+    
+    def __post_init__(self):
+        if self.metadata is None:
+            self.metadata = {}
+        if not self.id:
+            self.id = str(uuid.uuid4())
+
+class TextChunker:
+    """Handles different strategies for chunking datasheet text"""
+    
+    def __init__(self, chunk_size: int = 512, overlap: int = 50):
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+        self.setup_nlp()
+    
+    def setup_nlp(self):
+        """Setup NLP tools (the spaCy model loads on first use of .nlp)"""
+        ensure_nltk_data()
+        self._nlp = None
+        self._nlp_loaded = False
+    
+    @property
+    def nlp(self):
+        if not self._nlp_loaded:
+            self._nlp_loaded = True
+            import spacy
+            try:
+                self._nlp = spacy.load("en_core_web_sm")
+            except OSError:
+                print("Warning: spaCy English model not found. Install with: python -m spacy download en_core_web_sm")
+        return self._nlp
+    
+    def semantic_chunking(self, text: str, metadata: Dict[str, Any]) -> List[TextChunk]:
+        """
+        Chunk text based on semantic boundaries (sections, specifications, etc.)
+        Ideal for RAG applications
+        """
+        chunks = []
+        
+        # Split by common datasheet sections
+        section_patterns = [
+            r'(?i)(specifications?|spec)\s*:?\s*\n',
+            r'(?i)(electrical\s+characteristics?)\s*:?\s*\n',
+            r'(?i)(mechanical\s+data)\s*:?\s*\n',
+            r'(?i)(pin\s+configuration)\s*:?\s*\n',
+            r'(?i)(functional\s+description)\s*:?\s*\n',
+            r'(?i)(operating\s+conditions?)\s*:?\s*\n',
+            r'(?i)(absolute\s+maximum\s+ratings?)\s*:?\s*\n',
+            r'(?i)(package\s+information)\s*:?\s*\n',
+            r'(?i)(application\s+information)\s*:?\s*\n',
+            r'(?i)(typical\s+applications?)\s*:?\s*\n'
+        ]
+        
+        # Find section boundaries
+        sections = []
+        for i, pattern in enumerate(section_patterns):
+            matches = list(re.finditer(pattern, text))
+            for match in matches:
+                sections.append({
+                    'start': match.start(),
+                    'end': match.end(),
+                    'title': match.group(1),
+                    'type': self._classify_section_type(match.group(1))
+                })
+        
+        # Sort sections by position
+        sections.sort(key=lambda x: x['start'])
+        
+        # Create chunks from sections
+        for i, section in enumerate(sections):
+            # Determine section end
+            if i < len(sections) - 1:
+                section_end = sections[i + 1]['start']
+            else:
+                section_end = len(text)
+            
+            section_text = text[section['end']:section_end].strip()
+            
+            if len(section_text) > 50:  # Only create chunks for substantial content
+                # Further split long sections
+                if len(section_text) > self.chunk_size * 2:
+                    sub_chunks = self._split_long_text(section_text, self.chunk_size, self.overlap)
+                    for j, sub_chunk in enumerate(sub_chunks):
+                        chunk = TextChunk(
+                            id=f"{metadata.get('source_file', 'unknown')}_{section['type']}_{j}",
+                            text=sub_chunk,
+                            chunk_type=section['type'],
+                            source_file=metadata.get('source_file', ''),
+                            section=section['title'],
+                            chunk_index=j,
+                            metadata=metadata.copy()
+                        )
+                        chunks.append(chunk)
+                else:
+                    chunk = TextChunk(
+                        id=f"{metadata.get('source_file', 'unknown')}_{section['type']}",
+                        text=section_text,
+                        chunk_type=section['type'],
+                        source_file=metadata.get('source_file', ''),
+                        section=section['title'],
+                        metadata=metadata.copy()
+                    )
+                    chunks.append(chunk)
+        
+        # Handle text before first section
+        if sections:
+            intro_text = text[:sections[0]['start']].strip()
+            if len(intro_text) > 100:
+                chunk = TextChunk(
+                    id=f"{metadata.get('source_file', 'unknown')}_intro",
+                    text=intro_text,
+                    chunk_type='description',
+                    source_file=metadata.get('source_file', ''),
+                    section='Introduction',
+                    metadata=metadata.copy()
+                )
+                chunks.append(chunk)
+        
+        return chunks
+    
+    def sliding_window_chunking(self, text: str, metadata: Dict[str, Any]) -> List[TextChunk]:
+        """
+        Create overlapping chunks using sliding window approach
+        Good for training data generation
+        """
+        chunks = []
+        words = word_tokenize(text)
+        
+        for i in range(0, len(words), self.chunk_size - self.overlap):
+            chunk_words = words[i:i + self.chunk_size]
+            chunk_text = ' '.join(chunk_words)
+            
+            if len(chunk_text.strip()) > 50:  # Skip very short chunks
+                chunk = TextChunk(
+                    id=f"{metadata.get('source_file', 'unknown')}_slide_{i}",
+                    text=chunk_text,
+                    chunk_type='sliding_window',
+                    source_file=metadata.get('source_file', ''),
+                    chunk_index=i // (self.chunk_size - self.overlap),
+                    metadata=metadata.copy()
+                )
+                chunks.append(chunk)
+        
+        return chunks
+    
+    def sentence_boundary_chunking(self, text: str, metadata: Dict[str, Any]) -> List[TextChunk]:
+        """
+        Chunk text respecting sentence boundaries
+        Best for maintaining context integrity
+        """
+        chunks = []
+        sentences = sent_tokenize(text)
+        
+        current_chunk = []
+        current_length = 0
+        chunk_index = 0
+        
+        for sentence in sentences:
+            sentence_length = len(word_tokenize(sentence))
+            
+            if current_length + sentence_length > self.chunk_size and current_chunk:
+                # Create chunk from current sentences
+                chunk_text = ' '.join(current_chunk)
+                chunk = TextChunk(
+                    id=f"{metadata.get('source_file', 'unknown')}_sent_{chunk_index}",
+                    text=chunk_text,
+                    chunk_type='sentence_boundary',
+                    source_file=metadata.get('source_file', ''),
+                    chunk_index=chunk_index,
+                    metadata=metadata.copy()
+                )
+                chunks.append(chunk)
+                
+                # Start new chunk with overlap
+                if self.overlap > 0 and len(current_chunk) > 1:
+                    # Keep last few sentences for overlap
+                    overlap_sentences = current_chunk[-2:]
+                    current_chunk = overlap_sentences + [sentence]
+                    current_length = sum(len(word_tokenize(s)) for s in current_chunk)
+                else:
+                    current_chunk = [sentence]
+                    current_length = sentence_length
+                
+                chunk_index += 1
+            else:
+                current_chunk.append(sentence)
+                current_length += sentence_length
+        
+        # Handle remaining sentences
+        if current_chunk:
+            chunk_text = ' '.join(current_chunk)
+            chunk = TextChunk(
+                id=f"{metadata.get('source_file', 'unknown')}_sent_{chunk_index}",
+                text=chunk_text,
+                chunk_type='sentence_boundary',
+                source_file=metadata.get('source_file', ''),
+                chunk_index=chunk_index,
+                metadata=metadata.copy()
+            )
+            chunks.append(chunk)
+        
+        return chunks
+    
+    def parameter_extraction_chunking(self, text: str, metadata: Dict[str, Any]) -> List[TextChunk]:
+        """
+        Extract and chunk parameter-specific information
+        Optimized for technical specifications
+        """
+        chunks = []
+        
+        # Patterns for extracting parameters
+        parameter_patterns = [
+            # Voltage patterns
+            r'(?i)(voltage|vcc|vdd|supply)\s*[:\-=]\s*([0-9.]+\s*[mv]?v?)',
+            # Current patterns  
+            r'(?i)(current|icc|idd)\s*[:\-=]\s*([0-9.]+\s*[μmuna]?a)',
+            # Temperature patterns
+            r'(?i)(temperature|temp)\s*[:\-=]\s*([-0-9.]+\s*[°]?c)',
+            # Frequency patterns
+            r'(?i)(frequency|freq|clock)\s*[:\-=]\s*([0-9.]+\s*[kmg]?hz)',
+            # Dimension patterns
+            r'(?i)(size|dimension|width|height|length)\s*[:\-=]\s*([0-9.]+\s*[μmcin]+)',
+            # Package patterns
+            r'(?i)(package|housing)\s*[:\-=]\s*([a-z0-9\-]+)',
+        ]
+        
+        # Extract parameter sections
+        parameters = []
+        for pattern in parameter_patterns:
+            matches = re.finditer(pattern, text, re.MULTILINE)
+            for match in matches:
+                param_context = self._extract_context(text, match.start(), match.end())
+                parameters.append({
+                    'type': match.group(1).lower(),
+                    'value': match.group(2),
+                    'context': param_context,
+                    'position': match.start()
+                })
+        
+        # Group related parameters
+        for i, param in enumerate(parameters):
+            chunk = TextChunk(
+                id=f"{metadata.get('source_file', 'unknown')}_param_{i}",
+                text=param['context'],
+                chunk_type='parameter',
+                source_file=metadata.get('source_file', ''),
+                subsection=param['type'],
+                metadata={**metadata, 'parameter_type': param['type'], 'parameter_value': param['value']}
+            )
+            chunks.append(chunk)
+        
+        return chunks
+    
+    def chunk(self, text: str, metadata: Dict[str, Any], strategy: str = "semantic") -> List[TextChunk]:
+        """Chunk text with the named strategy"""
+        if strategy == "semantic":
+            return self.semantic_chunking(text, metadata)
+        elif strategy == "sliding_window":
+            return self.sliding_window_chunking(text, metadata)
+        elif strategy == "sentence_boundary":
+            return self.sentence_boundary_chunking(text, metadata)
+        elif strategy == "parameter_extraction":
+            return self.parameter_extraction_chunking(text, metadata)
+        else:
+            raise ValueError(f"Unknown chunking strategy: {strategy}")
+    
+    def _classify_section_type(self, section_title: str) -> str:
+        """Classify section type based on title"""
+        section_title = section_title.lower()
+        
+        if any(word in section_title for word in ['spec', 'electrical', 'parameter']):
+            return 'specifications'
+        elif any(word in section_title for word in ['mechanical', 'package', 'dimension']):
+            return 'mechanical'
+        elif any(word in section_title for word in ['pin', 'connection']):
+            return 'pinout'
+        elif any(word in section_title for word in ['functional', 'operation', 'description']):
+            return 'description'
+        elif any(word in section_title for word in ['application', 'typical', 'example']):
+            return 'application'
+        else:
+            return 'general'
+    
+    def _split_long_text(self, text: str, max_size: int, overlap: int) -> List[str]:
+        """Split long text into smaller chunks"""
+        words = word_tokenize(text)
+        chunks = []
+        
+        for i in range(0, len(words), max_size - overlap):
+            chunk_words = words[i:i + max_size]
+            chunks.append(' '.join(chunk_words))
+        
+        return chunks
+    
+    def _extract_context(self, text: str, start: int, end: int, context_size: int = 200) -> str:
+        """Extract context around a match"""
+        context_start = max(0, start - context_size)
+        context_end = min(len(text), end + context_size)
+        return text[context_start:context_end]
+
+def datasheet_metadata(text_file: Path) -> Dict[str, Any]:
+    return {
+        'source_file': text_file.name,
+        'file_path': str(text_file),
+        'processing_date': datetime.now().isoformat()
+    }
+
+# Per-process chunker of the chunking workers
+_WORKER_CHUNKER: Optional[TextChunker] = None
+
+def init_chunk_worker(chunk_size: int, overlap: int):
+    global _WORKER_CHUNKER
+    _WORKER_CHUNKER = TextChunker(chunk_size=chunk_size, overlap=overlap)
+
+def chunk_datasheet(text_file: Path, chunking_strategy: str) -> List[TextChunk]:
+    with open(text_file, 'r', encoding='utf-8') as f:
+        text = f.read()
+    return _WORKER_CHUNKER.chunk(text, datasheet_metadata(text_file), chunking_strategy)